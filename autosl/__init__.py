@@ -0,0 +1,3 @@
+"""
+Non-GUI building blocks for Binance Auto SL/TP (caches, streams, helpers).
+"""
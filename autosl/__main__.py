@@ -0,0 +1,7 @@
+import time
+T_START = time.perf_counter()  # startup timing reference (--timing)
+import sys
+
+from .cli import main
+
+sys.exit(main(t_start=T_START))
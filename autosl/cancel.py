@@ -0,0 +1,97 @@
+"""
+Bulk SL/TP cancellation: one cancel-all-open-orders call per symbol when
+every open order there is SL/TP, single cancels otherwise, fanned out over
+symbols with bounded parallelism. The bulk call is only safe on a fresh
+get_open_orders result; with a local (possibly stale) view pass bulk=False.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable
+
+SL_TP_TYPES = frozenset({"STOP_LOSS", "STOP_LOSS_LIMIT", "TAKE_PROFIT", "TAKE_PROFIT_LIMIT"})
+MAX_PARALLEL = 4
+
+
+@dataclass
+class CancelReport:
+    # {"symbol", "orderId", "type"} per canceled order
+    canceled: list[dict] = field(default_factory=list)
+    # (symbol, orderId or None for a bulk cancel, exception)
+    errors: list[tuple[str, int | None, Exception]] = field(default_factory=list)
+    bulk_symbols: list[str] = field(default_factory=list)
+
+    @property
+    def count(self) -> int:
+        return len(self.canceled)
+
+
+def _cancel_one(client, order: dict) -> list[dict]:
+    client.cancel_order(symbol=order["symbol"], orderId=order["orderId"])
+    return [order]
+
+
+def _cancel_symbol(client, symbol: str, orders: list[dict]) -> list[dict]:
+    client.cancel_all_open_orders(symbol=symbol)
+    return orders
+
+
+def cancel_sl_tp(client, open_orders: list[dict], max_parallel: int = MAX_PARALLEL,
+                 log: Callable[[str], None] | None = None, bulk: bool = True) -> CancelReport:
+    """
+    Cancel every SL/TP order in open_orders (as returned by get_open_orders).
+    Other order types are left untouched.
+    """
+    log = log or (lambda msg: None)
+    by_symbol: dict[str, list[dict]] = {}
+    for o in open_orders:
+        by_symbol.setdefault(o.get("symbol"), []).append(o)
+
+    tasks = []  # (symbol, orderId or None, fn, args)
+    for symbol, orders in by_symbol.items():
+        sl_orders = [o for o in orders if o.get("type") in SL_TP_TYPES]
+        if not sl_orders:
+            continue
+        if bulk and len(sl_orders) > 1 and len(sl_orders) == len(orders):
+            tasks.append((symbol, None, _cancel_symbol, (client, symbol, sl_orders)))
+        else:
+            for o in sl_orders:
+                tasks.append((symbol, o["orderId"], _cancel_one, (client, o)))
+
+    report = CancelReport()
+    while tasks:
+        tasks = _run_tasks(tasks, max_parallel, report, log)
+    return report
+
+
+def _run_tasks(tasks: list, max_parallel: int, report: CancelReport,
+               log: Callable[[str], None]) -> list:
+    """
+    Run cancel tasks in parallel, fill the report, return fallback tasks.
+    """
+    def run(task):
+        symbol, order_id, fn, args = task
+        try:
+            return task, fn(*args), None
+        except Exception as e:
+            return task, None, e
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_parallel, len(tasks)))) as pool:
+        results = list(pool.map(run, tasks))
+
+    retry = []
+    for (symbol, order_id, fn, args), canceled, error in results:
+        if error is None:
+            report.canceled.extend(
+                {"symbol": o.get("symbol"), "orderId": o["orderId"], "type": o.get("type")}
+                for o in canceled
+            )
+            if order_id is None:
+                report.bulk_symbols.append(symbol)
+        elif order_id is None:
+            # bulk cancel refused -> fall back to single cancels
+            log(f"[INFO] cancel_all_open_orders {symbol} failed ({error}), canceling one by one.")
+            client, _, orders = args
+            retry.extend((symbol, o["orderId"], _cancel_one, (client, o)) for o in orders)
+        else:
+            report.errors.append((symbol, order_id, error))
+    return retry
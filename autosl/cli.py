@@ -0,0 +1,442 @@
+"""
+Headless entry point (no Tk): one-shot trading commands and a daemon that
+keeps the streams and the HTTPS pool warm.
+
+    python -m autosl buy-sl BNBUSDT --pct 10 --trigger 0.5 --limit 0.6
+    python -m autosl add-sl BNBUSDT --trigger 1 --limit 1.2 [--entry]
+    python -m autosl cancel-sl            # every symbol
+    python -m autosl protect-all --trigger 1 --limit 1.2
+    python -m autosl trail BNBUSDT --trigger 1 --limit 1.2
+    python -m autosl daemon
+    python -m autosl sweep data/BNBUSDT-1m-*.csv --save
+    python -m autosl paper-replay data/BNBUSDT-aggTrades-*.csv --trigger 1 --limit 1.2 --trail
+    python -m autosl journal --since 2024-01-01 --by month
+
+BINANCE_AUTOSL_PAPER=USDT=10000 runs any command against the in-process
+paper exchange (live prices, simulated orders; useful with daemon / trail).
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+from .client import build_client, build_paper_client
+from .config import PAPER_BALANCES, app_path
+from .cost_basis import CostBasisBook
+from .engine import (API_ERRORS, ConfirmationRequired, EngineError, NothingToDo, TradingEngine,
+                     check_sl_percents, fmt_decimal, parse_positive)
+from .journal import GROUPINGS, TradeJournal
+from .journal import default_path as journal_path
+from .metrics import ClientMetrics, serve_metrics
+from .scheduler import RequestScheduler
+from .startup import StartupTimer
+from .symbols import SymbolInfoCache
+from .user_stream import BalanceBook
+
+STATUS_INTERVAL = 60.0
+
+
+def log(msg: str) -> None:
+    print(f"{time.strftime('%H:%M:%S')} {msg}", flush=True)
+
+
+class Context:
+    """
+    What every command needs; streams and the connection manager only for
+    the daemon.
+    """
+
+    def __init__(self, startup: StartupTimer):
+        self.metrics = ClientMetrics()
+        self.scheduler = RequestScheduler(log=log)
+        self.paper = None
+        if PAPER_BALANCES:
+            try:
+                self.client, self.paper = build_paper_client(PAPER_BALANCES, self.scheduler, log=log)
+            except ValueError as e:
+                raise EngineError(str(e)) from None
+            log(f"[INFO] PAPER trading: {PAPER_BALANCES}")
+        else:
+            api_key = os.getenv("BINANCE_API_KEY")
+            api_secret = os.getenv("BINANCE_API_SECRET")
+            if not api_key or not api_secret:
+                raise EngineError("BINANCE_API_KEY and BINANCE_API_SECRET must be set.")
+            self.client = build_client(api_key, api_secret, self.metrics, self.scheduler)
+        startup.mark("client")
+        # warm start from the disk cache: no exchangeInfo round trip
+        self.symbols = SymbolInfoCache(self.client, log=log)
+        warm = self.symbols.load()
+        self.symbols.ensure_loaded()
+        startup.mark("symbols", "disk cache" if warm else "exchange info")
+        self.scheduler.configure(self.symbols.rate_limits)
+        self.symbols.add_listener(lambda: self.scheduler.configure(self.symbols.rate_limits))
+        self.balances = BalanceBook()
+        self.journal = TradeJournal(journal_path(paper=self.paper is not None), log=log)
+        self.cost_basis = CostBasisBook(self.client, self.symbols, persist=self.paper is None, log=log)
+        self.cost_basis.load()
+        self.engine = TradingEngine(self.client, self.symbols, self.balances,
+                                    scheduler=self.scheduler, log=log, journal=self.journal,
+                                    cost_basis=self.cost_basis)
+
+
+def _qty(ctx: Context, args) -> str:
+    if args.qty is not None:
+        return args.qty
+    pct = parse_positive(args.pct, "percentage")
+    if pct > 100:
+        raise EngineError("Percent must be between 0 and 100.")
+    usdt_to_spend, qty, base_asset = ctx.engine.calc_qty_from_percent(args.symbol, pct)
+    log(f"[INFO] % buy: {pct}% USDT -> {usdt_to_spend:.2f} USDT -> {fmt_decimal(qty)} {base_asset}")
+    return fmt_decimal(qty)
+
+
+def cmd_buy(ctx: Context, args) -> None:
+    ctx.engine.buy_spot(args.symbol, _qty(ctx, args))
+
+
+def cmd_buy_sl(ctx: Context, args) -> None:
+    ctx.engine.buy_spot_with_sl(args.symbol, _qty(ctx, args), args.trigger, args.limit,
+                                confirmed=args.yes)
+
+
+def cmd_sell_all(ctx: Context, args) -> None:
+    ctx.engine.sell_all(args.symbol)
+
+
+def cmd_add_sl(ctx: Context, args) -> None:
+    ctx.engine.add_sl_for_free(args.symbol, args.trigger, args.limit, confirmed=args.yes,
+                               anchor=args.anchor)
+
+
+def cmd_cancel_sl(ctx: Context, args) -> None:
+    if args.symbol:
+        ctx.engine.cancel_sl_orders(args.symbol)
+    else:
+        ctx.engine.cancel_all_sl_orders()
+
+
+def cmd_protect_all(ctx: Context, args) -> None:
+    report = ctx.engine.protect_all(args.trigger, args.limit, confirmed=args.yes)
+    if report.errors:
+        raise EngineError(f"{len(report.errors)} SL order(s) failed.")
+
+
+def cmd_trail(ctx: Context, args) -> None:
+    """
+    SL for the free balance, then trail it (runs as the daemon).
+    """
+    res = ctx.engine.add_sl_for_free(args.symbol, args.trigger, args.limit, confirmed=args.yes)
+    cmd_daemon(ctx, args, setup=lambda trailing: trailing.protect_result(res, args.trigger, args.limit))
+
+
+def cmd_daemon(ctx: Context, args, setup=None) -> None:
+    """
+    Keep streams, balances, valuation and trailing stops live and log a
+    status line until interrupted.
+    """
+    from .connection import ConnectionManager
+    from .market_stream import MarketStream
+    from .paper import attach_streams
+    from .trailing import TrailingStopManager
+    from .user_stream import UserDataStream
+    from .valuation import PortfolioValuation, follow_account
+
+    connection = ConnectionManager(ctx.client, log=log)
+    ctx.client.param_hook = connection.apply_recv_window
+    market_stream = MarketStream(log=log)
+    user_stream = UserDataStream(ctx.client, ctx.balances, log=log)
+    valuation = PortfolioValuation("USDT")
+    follow_account(valuation, ctx.balances, market_stream, user_stream, ctx.symbols,
+                   ctx.client, log=log)
+    trailing = TrailingStopManager(ctx.client, ctx.symbols, log=log,
+                                   path=app_path("trailing.paper.json") if ctx.paper else None,
+                                   journal=ctx.journal)
+    user_stream.add_handler("executionReport", ctx.journal.on_execution_report)
+    user_stream.add_handler("executionReport", trailing.on_execution_report)
+    user_stream.add_handler("executionReport", ctx.cost_basis.on_execution_report)
+    user_stream.add_resync_listener(ctx.cost_basis.request_sync)
+    # positions of the trailed symbols stay current (entry price for the next SL)
+    trailing.add_listener(ctx.cost_basis.track)
+    trailing.add_listener(lambda symbols: market_stream.watch_prices("trailing", symbols))
+    market_stream.add_price_listener(lambda tick: trailing.on_price(tick.symbol, tick.price))
+    trailing.load()
+    if setup is not None:
+        setup(trailing)
+
+    metrics_port = os.getenv("BINANCE_AUTOSL_METRICS_PORT")
+    if metrics_port:
+        serve_metrics(ctx.metrics, int(metrics_port))
+        log(f"[INFO] Prometheus metrics on http://127.0.0.1:{metrics_port}/metrics")
+
+    connection.start()
+    trailing.start()
+    ctx.cost_basis.start()
+    market_stream.start()
+    if ctx.paper is not None:
+        attach_streams(ctx.paper, market_stream, user_stream)
+    else:
+        user_stream.start()
+    log("[INFO] Daemon running (Ctrl+C to stop).")
+    try:
+        while True:
+            time.sleep(args.status_interval)
+            if ctx.balances.synced:
+                log(f"[INFO] free: {ctx.balances.free('USDT'):.2f} USDT, "
+                    f"total: {valuation.total:.2f} USDT, trailing: {len(trailing.positions())}")
+    except KeyboardInterrupt:
+        log("[INFO] Stopping.")
+    finally:
+        trailing.stop()
+        ctx.cost_basis.stop()
+        user_stream.stop()
+        market_stream.stop()
+        connection.stop()
+
+
+def cmd_sweep(ctx: Context | None, args) -> None:
+    """
+    Evaluate SL trigger / limit pairs on historical data (offline, no API
+    keys); --save makes the suggestions the GUI defaults.
+    """
+    from .sl_defaults import SlDefaults
+    try:
+        from .sweep import SweepParams, parse_grid, pooled, report_lines, run_sweep, write_grid_csv
+    except ImportError:
+        raise EngineError("The sweep needs numpy (pip install numpy).") from None
+
+    paths = []
+    for pattern in args.files:  # PowerShell does not expand wildcards
+        paths += sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+    try:
+        params = SweepParams(parse_grid(args.triggers), parse_grid(args.gaps), args.horizon,
+                             args.fill_window, args.stride, args.bar_ms)
+        if params.triggers[0] <= 0 or params.gaps[0] < 0 or params.triggers[-1] + params.gaps[-1] >= 100:
+            raise ValueError("Triggers must be > 0, gaps >= 0 and trigger + gap < 100.")
+        if min(args.horizon, args.stride, args.bar_ms) < 1 or args.fill_window < 0:
+            raise ValueError("horizon, stride and bar size must be >= 1, fill window >= 0.")
+        if not paths:
+            raise ValueError("No input files.")
+        t0 = time.perf_counter()
+        results = run_sweep(paths, params, workers=args.workers, log=log)
+    except (OSError, ValueError) as e:
+        raise EngineError(str(e)) from None
+    total = pooled(results)
+    if not total.entries:
+        raise EngineError(f"Not enough bars for a horizon of {args.horizon} + {args.fill_window}.")
+    log(f"[PERF] sweep: {total.entries} entries x {len(params.triggers) * len(params.gaps)} pairs "
+        f"in {time.perf_counter() - t0:.1f} s")
+
+    suggestions = {stats.symbol: stats.suggest(args.max_stopout, args.max_miss)
+                   for stats in results if stats.entries}
+    default = total.suggest(args.max_stopout, args.max_miss)
+    for line in report_lines(total, args.max_miss):
+        print(line)
+    for s in [*suggestions.values(), default]:
+        note = "" if s.within_targets else " (targets not reached in the grid)"
+        log(f"[INFO] {s.symbol}: trigger {s.trigger:g} %, limit {s.limit:g} % -> stop-out "
+            f"{s.stopout_rate:.1%}, miss {s.miss_rate:.2%}, slippage {s.slippage:.3f} %{note}")
+    if args.out:
+        write_grid_csv(args.out, results)
+        log(f"[OK] Grid written to {args.out}")
+    if args.save:
+        store = SlDefaults(log=log)
+        store.save(default.to_json(), {sym: s.to_json() for sym, s in suggestions.items()},
+                   {**params.to_json(), "max_stopout": args.max_stopout, "max_miss": args.max_miss,
+                    "files": len(paths)})
+        log(f"[OK] SL defaults saved to {store.path}")
+
+
+def cmd_paper_replay(ctx: Context | None, args) -> None:
+    """
+    Recorded trades through the paper exchange with the real order flows
+    (offline, no API keys; exchange info from the disk cache if present).
+    """
+    import itertools
+
+    from .paper import PaperExchange, PaperReplay, load_exchange_info, parse_balances, read_trades
+
+    paths = []
+    for pattern in args.files:
+        paths += sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+    if not paths:
+        raise EngineError("No input files.")
+    symbol = args.symbol or os.path.basename(paths[0]).split("-")[0].upper()
+    trigger_pct = parse_positive(args.trigger, "SL trigger %")
+    limit_pct = parse_positive(args.limit, "SL limit %")
+    check_sl_percents(trigger_pct, limit_pct, args.yes)
+    try:
+        exchange = PaperExchange(load_exchange_info(), parse_balances(args.balances),
+                                 touch_fills=args.touch_fills, log=log)
+        replay = PaperReplay(exchange, symbol, trigger_pct, limit_pct, parse_positive(args.pct, "percentage"),
+                             every_s=args.every, miss_after_s=args.miss_after, trail=args.trail,
+                             log=log if args.verbose else None)
+        report = replay.run(itertools.chain.from_iterable(read_trades(p) for p in paths))
+    except (OSError, ValueError) as e:
+        raise EngineError(str(e)) from None
+    for line in report.lines():
+        log(line)
+
+
+def cmd_journal(ctx: Context | None, args) -> None:
+    """
+    Fill-to-SL latency and slippage statistics from the trade journal
+    (offline, no API keys).
+    """
+    import sqlite3
+
+    from .journal import report_lines
+
+    path = args.db or journal_path(paper=args.paper)
+    if not os.path.exists(path):
+        raise EngineError(f"No trade journal at {path} yet.")
+    for day in (args.since, args.until):
+        if day is not None:
+            try:
+                time.strptime(day, "%Y-%m-%d")
+            except ValueError:
+                raise EngineError(f"Invalid day {day} (expected YYYY-MM-DD).") from None
+    try:
+        lines = report_lines(path, args.symbol, args.since, args.until, args.by)
+    except sqlite3.Error as e:
+        raise EngineError(f"Trade journal {path}: {e}") from None
+    for line in lines:
+        print(line)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="autosl", description="Binance Auto SL/TP without GUI.")
+    parser.add_argument("--timing", action="store_true", help="log a startup timing report")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def symbol_arg(p, optional=False):
+        if optional:
+            p.add_argument("symbol", nargs="?", type=str.upper, help="only this pair (default: all)")
+        else:
+            p.add_argument("symbol", type=str.upper, help="trading pair, e.g. BNBUSDT")
+
+    def size_args(p):
+        g = p.add_mutually_exclusive_group(required=True)
+        g.add_argument("--qty", help="base asset quantity")
+        g.add_argument("--pct", help="percent of free USDT (USDT pairs only)")
+
+    def sl_args(p):
+        p.add_argument("--trigger", required=True, help="SL trigger %% below the basis price")
+        p.add_argument("--limit", required=True, help="SL limit %% below the basis price")
+        p.add_argument("-y", "--yes", action="store_true", help="accept a limit %% above the trigger %%")
+
+    p = sub.add_parser("buy", help="market buy")
+    symbol_arg(p)
+    size_args(p)
+    p.set_defaults(func=cmd_buy)
+
+    p = sub.add_parser("buy-sl", help="market buy, then stop-loss-limit")
+    symbol_arg(p)
+    size_args(p)
+    sl_args(p)
+    p.set_defaults(func=cmd_buy_sl)
+
+    p = sub.add_parser("sell-all", help="cancel SL/TP, market sell the free balance")
+    symbol_arg(p)
+    p.set_defaults(func=cmd_sell_all)
+
+    p = sub.add_parser("add-sl", help="stop-loss for the free balance (current price as basis)")
+    symbol_arg(p)
+    sl_args(p)
+    p.add_argument("--entry", dest="anchor", action="store_const", const="entry", default="price",
+                   help="percentages below the average entry price (from myTrades) instead of "
+                        "the current price")
+    p.set_defaults(func=cmd_add_sl)
+
+    p = sub.add_parser("cancel-sl", help="cancel SL/TP orders")
+    symbol_arg(p, optional=True)
+    p.set_defaults(func=cmd_cancel_sl)
+
+    p = sub.add_parser("protect-all", help="stop-loss for every free balance with a USDT pair")
+    sl_args(p)
+    p.set_defaults(func=cmd_protect_all)
+
+    def daemon_args(p):
+        p.add_argument("--status-interval", type=float, default=STATUS_INTERVAL,
+                       help="seconds between status lines")
+
+    p = sub.add_parser("trail", help="SL for the free balance, then trail it until stopped")
+    symbol_arg(p)
+    sl_args(p)
+    daemon_args(p)
+    p.set_defaults(func=cmd_trail)
+
+    p = sub.add_parser("daemon", help="keep streams, connections and trailing stops running")
+    daemon_args(p)
+    p.set_defaults(func=cmd_daemon)
+
+    p = sub.add_parser("sweep", help="evaluate SL trigger / limit pairs on historical klines or trades")
+    p.add_argument("files", nargs="+", help="Binance public data CSV / Parquet files (wildcards allowed)")
+    p.add_argument("--triggers", default="0.2:3:0.1", help="trigger %% grid, start:stop:step or a list")
+    p.add_argument("--gaps", default="0:1:0.05", help="limit %% minus trigger %% grid")
+    p.add_argument("--horizon", type=int, default=240, help="bars each entry is held")
+    p.add_argument("--fill-window", type=int, default=5, help="bars a gapped limit order may take to fill")
+    p.add_argument("--stride", type=int, default=1, help="use every n-th bar as an entry")
+    p.add_argument("--bar-ms", type=int, default=1000, help="bar size for trade files")
+    p.add_argument("--max-stopout", type=float, default=0.2, help="target stop-out rate (0..1)")
+    p.add_argument("--max-miss", type=float, default=0.02, help="target fill-miss rate (0..1)")
+    p.add_argument("--workers", type=int, help="processes (default: one per symbol, up to the CPUs)")
+    p.add_argument("--out", help="write the full grid to this CSV file")
+    p.add_argument("--save", action="store_true", help="use the suggestions as GUI defaults")
+    p.set_defaults(func=cmd_sweep, offline=True)
+
+    p = sub.add_parser("paper-replay", help="replay recorded trades through the paper exchange")
+    p.add_argument("files", nargs="+", help="Binance public aggTrades / trades CSV files (wildcards allowed)")
+    p.add_argument("--symbol", type=str.upper, help="pair (default: from the file name)")
+    sl_args(p)
+    p.add_argument("--pct", default="10", help="percent of free USDT per entry")
+    p.add_argument("--balances", default="USDT=10000", help="start balances, e.g. USDT=10000,BNB=1")
+    p.add_argument("--every", type=float, default=3600, help="seconds of data time between entries")
+    p.add_argument("--miss-after", type=float, default=60,
+                   help="seconds a triggered SL may stay unfilled before it counts as missed (sold at market)")
+    p.add_argument("--trail", action="store_true", help="trail the SL like the trail command")
+    p.add_argument("--touch-fills", action="store_true", help="fill resting limits when a trade only touches them")
+    p.add_argument("-v", "--verbose", action="store_true", help="log every order")
+    p.set_defaults(func=cmd_paper_replay, offline=True)
+
+    p = sub.add_parser("journal", help="fill-to-SL latency and slippage report from the trade journal")
+    p.add_argument("--symbol", type=str.upper, help="only this pair")
+    p.add_argument("--since", help="first day (UTC), YYYY-MM-DD")
+    p.add_argument("--until", help="last day (UTC), YYYY-MM-DD")
+    p.add_argument("--by", choices=sorted(GROUPINGS), default="symbol", help="group the statistics by")
+    p.add_argument("--paper", action="store_true", help="the paper trading journal")
+    p.add_argument("--db", help="journal file (default: ~/.binance_auto_sl/journal.sqlite3)")
+    p.set_defaults(func=cmd_journal, offline=True)
+    return parser
+
+
+def main(argv: list[str] | None = None, t_start: float | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    startup = StartupTimer(t_start, on_report=log if args.timing else None, history_file=None)
+    startup.mark("imports")
+    ctx = None
+    try:
+        ctx = None if getattr(args, "offline", False) else Context(startup)
+        if args.timing and args.command in ("daemon", "trail"):
+            startup.finish()  # the daemon never returns
+        args.func(ctx, args)
+        startup.mark(args.command)
+    except ConfirmationRequired as e:
+        log(f"[ERROR] {str(e).splitlines()[0]} Use --yes to continue anyway.")
+        return 2
+    except NothingToDo as e:
+        log(f"[INFO] {e}")
+        return 0
+    except (EngineError, *API_ERRORS) as e:
+        log(f"[ERROR] {e}")
+        return 1
+    finally:
+        if ctx is not None:
+            ctx.journal.close()
+        if args.timing:
+            startup.finish()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,35 @@
+"""
+Client factory shared by the GUI and the CLI: python-binance Client with
+latency metrics and the rate-limit scheduler in front of it.
+"""
+from binance.client import Client
+
+from .config import API_URL
+from .metrics import ClientMetrics, instrument_client
+from .scheduler import RequestScheduler, ScheduledClient
+
+
+def build_client(api_key: str, api_secret: str, metrics: ClientMetrics,
+                 scheduler: RequestScheduler) -> ScheduledClient:
+    """
+    No request is made here (ping=False); the connection manager warms the
+    pool in the background where a long-running process wants it.
+    """
+    c = Client(api_key, api_secret, ping=False)
+    if API_URL:
+        c.API_URL = API_URL
+    instrument_client(c, metrics)
+    metrics.add_header_listener(scheduler.observe_headers)
+    # every API call takes its weight from the scheduler first
+    return ScheduledClient(c, scheduler)
+
+
+def build_paper_client(balances_spec: str, scheduler: RequestScheduler, log=None):
+    """
+    (client, exchange) for paper trading: the same ScheduledClient wrapper
+    around a PaperClient, so every caller works unchanged.
+    """
+    from .paper import PaperClient, create_live_exchange, public_client
+    public = public_client()
+    exchange = create_live_exchange(balances_spec, public, log=log)
+    return ScheduledClient(PaperClient(exchange, market=public), scheduler), exchange
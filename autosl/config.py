@@ -0,0 +1,27 @@
+"""
+Shared paths and settings for Binance Auto SL/TP.
+"""
+import os
+
+# Everything the app persists between runs lives here (caches, journals, ...).
+APP_DIR = os.getenv("BINANCE_AUTOSL_HOME") or os.path.join(
+    os.path.expanduser("~"), ".binance_auto_sl"
+)
+
+
+def app_path(name: str) -> str:
+    """
+    Return the absolute path of a file inside APP_DIR (creates the directory).
+    """
+    os.makedirs(APP_DIR, exist_ok=True)
+    return os.path.join(APP_DIR, name)
+
+# Binance spot market-data WebSocket base (override to point at a local fake server)
+WS_URL = os.getenv("BINANCE_WS_URL", "wss://stream.binance.com:9443")
+
+# Binance REST base incl. "/api" (override to test against a local mock server)
+API_URL = os.getenv("BINANCE_API_URL", "")
+
+# Paper trading: "USDT=10000,BNB=1" starts a simulated account with these
+# balances (no API keys needed, orders never reach Binance)
+PAPER_BALANCES = os.getenv("BINANCE_AUTOSL_PAPER", "")
@@ -0,0 +1,178 @@
+"""
+Connection manager: keeps the HTTPS pool to the API host warm and the
+local clock aligned with the server (RTT compensated), so the first order
+after a quiet period is as fast as any other.
+"""
+import statistics
+import threading
+import time
+from typing import Callable
+
+from requests.adapters import HTTPAdapter
+
+POOL_SIZE = 8
+KEEPALIVE_INTERVAL = 20.0     # idle seconds before a keep-alive ping
+CALIBRATE_INTERVAL = 10 * 60  # server time offset refresh
+CALIBRATE_SAMPLES = 5
+COLD_AFTER_IDLE = 60.0        # an order after this much idle time counts as "cold"
+MIN_RECV_WINDOW = 5000
+MAX_RECV_WINDOW = 60000
+
+# signed python-binance methods that accept recvWindow
+SIGNED_METHODS = {
+    "order_market_buy", "order_market_sell", "create_order", "cancel_order",
+    "cancel_all_open_orders", "cancel_replace_order", "get_account",
+    "get_asset_balance", "get_open_orders", "get_my_trades", "get_order",
+}
+
+
+class ConnectionManager:
+    def __init__(self, client, log: Callable[[str], None] | None = None,
+                 pool_size: int = POOL_SIZE):
+        self.client = client
+        self._log = log or (lambda msg: None)
+        self.pool_size = pool_size
+        self.offset_ms = 0
+        self.rtt_ms = 0.0
+        self.recv_window = MIN_RECV_WINDOW
+        self._last_activity = 0.0
+        self._last_user_activity = 0.0
+        self._latencies = {"cold": [], "warm": []}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+        session = client.session
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+        original = session.request
+
+        def request(method, url, *args, **kwargs):
+            idle_before = self.idle_seconds()
+            self._note_request(url)
+            if method.upper() != "POST" or "/order" not in url.split("?")[0]:
+                return original(method, url, *args, **kwargs)
+            t0 = time.perf_counter()
+            response = original(method, url, *args, **kwargs)
+            elapsed = time.perf_counter() - t0
+            kind = self.record_order_latency(elapsed, idle_before)
+            self._log(f"[PERF] order round trip {elapsed * 1000:.0f} ms ({kind})")
+            return response
+        session.request = request
+
+    # ---- activity tracking ----
+    def _note_request(self, url: str) -> None:
+        now = time.monotonic()
+        self._last_activity = now
+        if not url.split("?")[0].endswith(("/ping", "/time")):
+            self._last_user_activity = now
+
+    def idle_seconds(self) -> float:
+        """
+        Seconds since the last request of the app itself (keep-alive pings
+        excluded), i.e. how cold the path would be without this manager.
+        """
+        if not self._last_user_activity:
+            return float("inf")
+        return time.monotonic() - self._last_user_activity
+
+    def apply_recv_window(self, method_name: str, kwargs: dict) -> None:
+        """
+        Param hook for ScheduledClient: calibrated recvWindow on signed calls.
+        """
+        if method_name in SIGNED_METHODS and "recvWindow" not in kwargs:
+            kwargs["recvWindow"] = self.recv_window
+
+    def record_order_latency(self, seconds: float, idle_before: float) -> str:
+        """
+        Classify an order round trip as cold/warm and remember it.
+        """
+        kind = "cold" if idle_before > COLD_AFTER_IDLE else "warm"
+        with self._lock:
+            samples = self._latencies[kind]
+            samples.append(seconds * 1000)
+            del samples[:-200]
+        return kind
+
+    def latency_report(self) -> str:
+        with self._lock:
+            parts = []
+            for kind in ("cold", "warm"):
+                samples = self._latencies[kind]
+                if samples:
+                    parts.append(f"{kind}: median {statistics.median(samples):.0f} ms (n={len(samples)})")
+        return ", ".join(parts) or "no orders yet"
+
+    # ---- warm-up / time ----
+    def warm_up(self) -> None:
+        """
+        Open pool_size connections (TCP + TLS done now, not on the first
+        click) and calibrate the clock.
+        """
+        self._ping_pool()
+        self.calibrate()
+
+    def _ping_pool(self) -> None:
+        # parallel pings so every pooled connection is used (and kept open)
+        threads = [threading.Thread(target=self._ping_quietly, daemon=True)
+                   for _ in range(self.pool_size)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(10)
+
+    def _ping_quietly(self) -> None:
+        try:
+            self.client.ping()
+        except Exception as e:
+            self._log(f"[ERROR] ping: {e}")
+
+    def calibrate(self) -> None:
+        """
+        offset = serverTime - local midpoint of the request, taken from the
+        sample with the smallest RTT. recvWindow follows the observed RTT.
+        """
+        samples = []
+        for _ in range(CALIBRATE_SAMPLES):
+            t0 = time.time()
+            try:
+                server_ms = int(self.client.get_server_time()["serverTime"])
+            except Exception as e:
+                self._log(f"[ERROR] get_server_time: {e}")
+                return
+            t1 = time.time()
+            samples.append(((t1 - t0) * 1000, server_ms - (t0 + t1) / 2 * 1000))
+
+        rtt, offset = min(samples)
+        worst_rtt = max(s[0] for s in samples)
+        self.rtt_ms = rtt
+        self.offset_ms = int(round(offset))
+        self.recv_window = int(min(MAX_RECV_WINDOW, max(MIN_RECV_WINDOW, 4 * worst_rtt + 1000)))
+        # python-binance adds timestamp_offset to every signed timestamp
+        self.client.timestamp_offset = self.offset_ms
+        if abs(self.offset_ms) > 500:
+            self._log(f"[INFO] Clock offset to Binance: {self.offset_ms} ms (compensated).")
+
+    # ---- background loop ----
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="connection-keepalive", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        self.warm_up()
+        last_calibration = time.monotonic()
+        while not self._stop.wait(1.0):
+            if time.monotonic() - last_calibration > CALIBRATE_INTERVAL:
+                self.calibrate()
+                last_calibration = time.monotonic()
+            elif time.monotonic() - self._last_activity > KEEPALIVE_INTERVAL:
+                # keep pooled connections from being closed by idle timeouts
+                self._ping_pool()
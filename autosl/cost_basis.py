@@ -0,0 +1,336 @@
+"""
+Position cost basis from the account's own trades (myTrades): quantity,
+average entry price and realized PnL per pair, kept incrementally.
+
+Every symbol has a trade-id cursor that is persisted with its position, so
+a sync only asks for what came after it (myTrades?fromId=cursor+1, 1000
+per page). Years of history are read once; after that a sync is one
+request that usually returns nothing. Live fills come from executionReport
+events and move the cursor without a request. After a user-stream resync
+the tracked symbols are synced from REST again, in case events were lost.
+
+Average cost method: a buy adds the quote spent (plus a fee paid in quote)
+to the cost, and a fee paid in the base asset reduces the quantity. A sell
+realizes the proceeds (minus a fee paid in quote) minus avg x qty. Fees in
+a third asset (BNB) are summed in `other_fees`, not converted. Coins that
+were never bought on this pair (deposits, other pairs) have no cost, and
+sells beyond the tracked quantity realize nothing.
+"""
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Callable, Iterable
+
+from .config import app_path
+from .symbols import SymbolFilters, SymbolInfoCache
+
+PAGE_LIMIT = 1000          # myTrades maximum
+SYNC_INTERVAL = 3600.0     # full REST pass over the tracked symbols, besides resyncs
+RETRY_MIN = 5.0            # a failed sync is retried after this, doubling ...
+RETRY_MAX = 300.0          # ... up to this
+ZERO = Decimal("0")
+
+
+@dataclass
+class Position:
+    symbol: str
+    cursor: int = -1          # id of the last applied trade, -1 = never synced
+    qty: Decimal = ZERO
+    cost: Decimal = ZERO      # quote paid for the held qty
+    realized: Decimal = ZERO
+    trades: int = 0
+    other_fees: dict[str, Decimal] = field(default_factory=dict)
+
+    @property
+    def avg_price(self) -> Decimal | None:
+        return self.cost / self.qty if self.qty > 0 else None
+
+    def unrealized(self, price: Decimal) -> Decimal:
+        return self.qty * price - self.cost
+
+    def apply(self, trade: dict, base_asset: str, quote_asset: str) -> None:
+        """
+        One myTrades record (ids must arrive in ascending order).
+        """
+        qty, quote_qty = Decimal(trade["qty"]), Decimal(trade["quoteQty"])
+        fee, fee_asset = Decimal(trade.get("commission") or "0"), trade.get("commissionAsset")
+        if trade["isBuyer"]:
+            self.cost += quote_qty + (fee if fee_asset == quote_asset else ZERO)
+            self.qty += qty - (fee if fee_asset == base_asset else ZERO)
+        else:
+            proceeds = quote_qty - (fee if fee_asset == quote_asset else ZERO)
+            sold = qty + (fee if fee_asset == base_asset else ZERO)
+            covered = min(sold, self.qty)
+            if covered > 0:
+                avg = self.cost / self.qty
+                self.realized += proceeds * covered / sold - avg * covered
+                self.cost -= avg * covered
+                self.qty -= covered
+            if self.qty <= 0:
+                self.qty, self.cost = ZERO, ZERO
+        if fee > 0 and fee_asset not in (base_asset, quote_asset):
+            self.other_fees[fee_asset] = self.other_fees.get(fee_asset, ZERO) + fee
+        self.cursor = int(trade["id"])
+        self.trades += 1
+
+    def to_json(self) -> dict:
+        return {"cursor": self.cursor, "qty": str(self.qty), "cost": str(self.cost),
+                "realized": str(self.realized), "trades": self.trades,
+                "other_fees": {a: str(v) for a, v in self.other_fees.items()}}
+
+    @classmethod
+    def from_json(cls, symbol: str, d: dict) -> "Position":
+        return cls(symbol, int(d["cursor"]), Decimal(d["qty"]), Decimal(d["cost"]),
+                   Decimal(d["realized"]), int(d.get("trades", 0)),
+                   {a: Decimal(v) for a, v in d.get("other_fees", {}).items()})
+
+
+def trade_from_event(event: dict) -> dict:
+    """
+    executionReport (x == "TRADE") -> myTrades record.
+    """
+    return {"id": int(event["t"]), "qty": event["l"], "quoteQty": event["Y"], "price": event["L"],
+            "commission": event.get("n") or "0", "commissionAsset": event.get("N"),
+            "isBuyer": event["S"] == "BUY", "time": event.get("T")}
+
+
+class CostBasisBook:
+    """
+    Positions of the symbols asked for via track(); thread-safe. Listeners
+    get the set of symbols whose position changed.
+    """
+
+    def __init__(self, client, symbols: SymbolInfoCache, path: str | None = None,
+                 persist: bool = True, log: Callable[[str], None] | None = None,
+                 page_limit: int = PAGE_LIMIT):
+        self.client = client
+        self.symbols = symbols
+        self.path = path or app_path("cost_basis.json")
+        self.persist = persist
+        self._log = log or (lambda msg: None)
+        self.page_limit = page_limit
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._positions: dict[str, Position] = {}
+        self._syncing: dict[str, list[dict]] = {}  # symbol -> stream trades held back during a sync
+        self._wanted: set[str] = set()
+        self._dirty: set[str] = set()               # wanted, REST sync due
+        self._fresh: set[str] = set()               # synced from REST, nothing missed since
+        self._listeners: list[Callable[[set[str]], None]] = []
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.requests = 0
+
+    def add_listener(self, fn: Callable[[set[str]], None]) -> None:
+        self._listeners.append(fn)
+
+    def _notify(self, symbols: set[str]) -> None:
+        for fn in self._listeners:
+            try:
+                fn(symbols)
+            except Exception as e:
+                self._log(f"[ERROR] cost basis listener: {e}")
+
+    # ---- persistence ----
+    def load(self) -> int:
+        if not self.persist:
+            return 0
+        try:
+            with open(self.path, "r", encoding="utf-8") as fh:
+                data = json.load(fh)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            self._log(f"[ERROR] Cannot read cost basis {self.path}: {e}")
+            return 0
+        with self._lock:
+            for symbol, d in data.get("positions", {}).items():
+                try:
+                    self._positions[symbol] = Position.from_json(symbol, d)
+                except (KeyError, ValueError, ArithmeticError) as e:
+                    self._log(f"[ERROR] Cost basis {symbol} skipped: {e}")
+            return len(self._positions)
+
+    def save(self) -> None:
+        if not self.persist:
+            return
+        with self._lock:
+            data = {"positions": {s: p.to_json() for s, p in self._positions.items() if p.cursor >= 0}}
+        with self._save_lock:
+            tmp = self.path + ".tmp"
+            try:
+                with open(tmp, "w", encoding="utf-8") as fh:
+                    json.dump(data, fh, indent=1)
+                os.replace(tmp, self.path)
+            except OSError as e:
+                self._log(f"[ERROR] Cannot write cost basis {self.path}: {e}")
+
+    # ---- reads ----
+    def position(self, symbol: str) -> Position | None:
+        """
+        A copy of the symbol's position, None if it was never synced.
+        """
+        with self._lock:
+            pos = self._positions.get(symbol)
+            if pos is None or pos.cursor < 0:
+                return None
+            return Position(pos.symbol, pos.cursor, pos.qty, pos.cost, pos.realized, pos.trades,
+                            dict(pos.other_fees))
+
+    def entry_price(self, symbol: str) -> Decimal | None:
+        pos = self.position(symbol)
+        return pos.avg_price if pos is not None else None
+
+    def synced(self, symbol: str) -> bool:
+        """
+        Synced from REST in this session (events alone may have gaps).
+        """
+        with self._lock:
+            return symbol in self._fresh
+
+    # ---- feeds ----
+    def on_execution_report(self, event: dict) -> None:
+        """
+        user data stream handler: fills of tracked symbols apply at once.
+        """
+        if event.get("x") != "TRADE":
+            return
+        symbol = event["s"]
+        trade = trade_from_event(event)
+        f = self._filters(symbol)
+        with self._lock:
+            held = self._syncing.get(symbol)
+            if held is not None:
+                held.append(trade)
+                return
+            pos = self._positions.get(symbol)
+            if pos is None or symbol not in self._fresh or f is None:
+                # trades before this one may be unknown: a sync fetches it with the rest
+                self._wanted.add(symbol)
+                self._dirty.add(symbol)
+                self._fresh.discard(symbol)
+                self._wake.set()
+                return
+            applied = self._apply(pos, [trade], f)
+        if applied:
+            self.save()
+            self._notify({symbol})
+
+    def _filters(self, symbol: str) -> SymbolFilters | None:
+        # from memory only: no request and no exception (e.g. exchange info
+        # not loaded yet, delisted symbol), the caller keeps the symbol dirty
+        return self.symbols.filters(symbol) if symbol in self.symbols else None
+
+    def _apply(self, pos: Position, trades: Iterable[dict], f: SymbolFilters) -> int:
+        n = 0
+        for t in sorted(trades, key=lambda t: int(t["id"])):
+            if int(t["id"]) > pos.cursor:
+                pos.apply(t, f.base_asset, f.quote_asset)
+                n += 1
+        return n
+
+    # ---- REST sync ----
+    def sync(self, symbol: str) -> int:
+        """
+        Fetch and apply the trades after the symbol's cursor; returns how
+        many were new.
+        """
+        f = self._filters(symbol)
+        with self._lock:
+            if f is None:
+                self._wanted.add(symbol)
+                self._dirty.add(symbol)
+                self._fresh.discard(symbol)
+                return 0
+            pos = self._positions.setdefault(symbol, Position(symbol))
+            if symbol in self._syncing:
+                return 0  # another thread is on it
+            self._syncing[symbol] = []
+            from_id = pos.cursor + 1
+        applied = 0
+        ok = False
+        try:
+            while True:
+                trades = self.client.get_my_trades(symbol=symbol, fromId=from_id, limit=self.page_limit)
+                self.requests += 1
+                with self._lock:
+                    applied += self._apply(pos, trades, f)
+                if len(trades) < self.page_limit:
+                    break
+                from_id = max(int(t["id"]) for t in trades) + 1
+            ok = True
+        finally:
+            with self._lock:
+                held = self._syncing.pop(symbol, [])
+                # after a failed page, held fills would move the cursor past
+                # trades not fetched yet: drop them, the retry gets them via REST
+                if ok:
+                    applied += self._apply(pos, held, f)
+                    self._dirty.discard(symbol)
+                    self._fresh.add(symbol)
+                else:
+                    self._wanted.add(symbol)
+                    self._dirty.add(symbol)
+        if applied or ok:
+            self.save()
+        if applied:
+            self._notify({symbol})
+        return applied
+
+    def track(self, symbols: Iterable[str]) -> None:
+        """
+        Keep these symbols synced (added to the set, never removed within a
+        session); new ones are synced by the background thread.
+        """
+        with self._lock:
+            new = {s for s in symbols if s} - self._wanted
+            self._wanted |= new
+            self._dirty |= new
+        if new:
+            self._wake.set()
+
+    def request_sync(self) -> None:
+        """
+        Sync every tracked symbol again (e.g. after a user-stream resync).
+        """
+        with self._lock:
+            self._dirty |= self._wanted
+            self._fresh -= self._wanted
+        self._wake.set()
+
+    def start(self, interval: float = SYNC_INTERVAL) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._wake.set()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="cost-basis", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def _run(self, interval: float) -> None:
+        retry = None  # backoff while symbols stay dirty after a pass
+        while not self._stop.is_set():
+            if not self._wake.wait(retry or interval) and retry is None:
+                self.request_sync()
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            with self._lock:
+                pending = sorted(self._dirty)
+            for symbol in pending:
+                try:
+                    n = self.sync(symbol)
+                except Exception as e:
+                    self._log(f"[ERROR] myTrades {symbol}: {e}")
+                    continue
+                if n:
+                    self._log(f"[INFO] Cost basis {symbol}: {n} new trade(s).")
+            with self._lock:
+                failed = bool(self._dirty.intersection(pending))
+            retry = (min(retry * 2, RETRY_MAX) if retry else RETRY_MIN) if failed else None
@@ -0,0 +1,703 @@
+"""
+Trading engine: market buy, buy + stop-loss, SL for free coins, sell all
+and SL/TP cancellation, with the filter / rounding logic they share.
+No UI here: actions return result objects and raise EngineError, so the
+GUI, the CLI and benchmarks drive the same code.
+"""
+import functools
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Callable
+
+from binance.exceptions import BinanceAPIException, BinanceRequestException
+
+from .cancel import CancelReport, cancel_sl_tp
+from .scheduler import PRIORITY_ORDER
+from .symbols import SymbolFilters, SymbolInfoCache
+
+API_ERRORS = (BinanceAPIException, BinanceRequestException)
+# +SL: derive the SL qty from the buy fills instead of asking for the balance
+SL_FAST_PATH = os.getenv("BINANCE_AUTOSL_SL_FAST_PATH", "1") != "0"
+
+
+class EngineError(Exception):
+    """
+    An action could not run; `title` is a short category for dialogs.
+    """
+    title = "Error"
+
+    def __init__(self, msg: str, title: str | None = None):
+        super().__init__(msg)
+        if title is not None:
+            self.title = title
+
+
+class ConfirmationRequired(EngineError):
+    """
+    Nothing was sent; repeat the call with confirmed=True to go ahead.
+    """
+    title = "Warning"
+
+
+class NothingToDo(EngineError):
+    title = "Info"
+
+
+@dataclass
+class OrderResult:
+    symbol: str
+    qty: Decimal
+    order: dict
+    sl_order: dict | None = None
+    basis_price: Decimal | None = None   # avg fill price (+SL) or current price (SL*)
+    stop_price: Decimal | None = None
+    limit_price: Decimal | None = None
+    fill_to_sl_ms: float | None = None
+    ref_price: Decimal | None = None     # best book price before a market order
+    stages: dict[str, float] = field(default_factory=dict)  # ms: order, calc, sl, cancel
+
+
+@dataclass
+class ProtectReport:
+    placed: list[OrderResult] = field(default_factory=list)
+    skipped: list[tuple[str, str]] = field(default_factory=list)   # (asset, reason)
+    errors: list[tuple[str, Exception]] = field(default_factory=list)  # (symbol, error)
+
+
+# =========================
+# ROUNDING / PARSING
+# =========================
+def round_down_step(value: Decimal, step: Decimal) -> Decimal:
+    """
+    Round value down to the next multiple of step.
+    Example: value=1.234, step=0.01 -> 1.23
+    """
+    if step <= 0:
+        return value
+    return (value // step) * step
+
+
+def percent_qty(usdt_balance: Decimal, pct: Decimal, price: Decimal,
+                step_size: Decimal) -> tuple[Decimal, Decimal]:
+    """
+    (USDT to spend, base qty rounded down to stepSize) for pct % of the balance.
+    """
+    usdt_to_spend = usdt_balance * pct / Decimal("100")
+    return usdt_to_spend, round_down_step(usdt_to_spend / price, step_size)
+
+
+def fmt_decimal(val: Decimal) -> str:
+    """
+    Render a Decimal without unnecessary trailing zeros (e.g. 0.01000000 -> 0.01).
+    """
+    q = val.normalize()
+    s = format(q, "f")
+    if "." in s:
+        # only fractional zeros (100 normalizes to 1E+2 -> "100", not "1")
+        s = s.rstrip("0").rstrip(".")
+    return s or "0"
+
+
+def parse_positive(value, name: str) -> Decimal:
+    """
+    Decimal from user input; EngineError unless it is a number > 0.
+    """
+    try:
+        d = Decimal(str(value).strip())
+    except Exception:
+        raise EngineError(f"Invalid {name}: {value}") from None
+    if not d.is_finite():
+        raise EngineError(f"Invalid {name}: {value}")
+    if d <= 0:
+        raise EngineError(f"{name[0].upper()}{name[1:]} must be > 0.")
+    return d
+
+
+def check_sl_percents(trigger_pct: Decimal, limit_pct: Decimal, confirmed: bool) -> None:
+    # usually the limit should be deeper than the trigger
+    if limit_pct < trigger_pct and not confirmed:
+        raise ConfirmationRequired(
+            "SL limit % is smaller than SL trigger %.\n"
+            "Usually the limit should be >= trigger (deeper).\n\nContinue anyway?"
+        )
+
+
+def sl_prices(basis: Decimal, trigger_pct: Decimal, limit_pct: Decimal,
+              tick_size: Decimal) -> tuple[Decimal, Decimal]:
+    """
+    (stopPrice, limit price) below basis, rounded down to tickSize.
+    Stop = näher am Markt, Limit = weiter unten.
+    """
+    raw_stop = round_down_step(basis * (Decimal("1") - trigger_pct / Decimal("100")), tick_size)
+    raw_limit = round_down_step(basis * (Decimal("1") - limit_pct / Decimal("100")), tick_size)
+    return max(raw_stop, raw_limit), min(raw_stop, raw_limit)
+
+
+def avg_fill_price(fills: list[dict]) -> Decimal:
+    total_amount = Decimal("0")
+    total_quote = Decimal("0")
+    for f in fills:
+        q = Decimal(f["qty"])
+        total_amount += q
+        total_quote += Decimal(f["price"]) * q
+    if total_amount == 0:
+        raise EngineError("total_amount == 0.")
+    return total_quote / total_amount
+
+
+def sl_qty_from_fills(fills: list[dict], base_asset: str, step_size: Decimal) -> Decimal:
+    """
+    SL quantity from a FULL order response: sum of fill qty minus the
+    commission charged in the base asset, rounded down to stepSize.
+    """
+    filled = Decimal("0")
+    fee = Decimal("0")
+    for f in fills:
+        filled += Decimal(f["qty"])
+        if f.get("commissionAsset") == base_asset:
+            fee += Decimal(f.get("commission", "0"))
+    return round_down_step(filled - fee, step_size)
+
+
+def _order_flow(fn):
+    # every request of an action (price lookups included) runs with order priority
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        return self._boosted(fn, self, *args, **kwargs)
+    return wrapper
+
+
+# concurrent SL orders of protect_all (the scheduler still enforces ORDERS limits)
+PROTECT_PARALLEL = 4
+
+# =========================
+# ENGINE
+# =========================
+class TradingEngine:
+    """
+    Order flows on top of a (scheduled) python-binance client and the
+    exchange-info cache. Thread-safe as long as callers serialize actions
+    (the GUI runs them on one worker).
+    """
+
+    def __init__(self, client, symbols: SymbolInfoCache, balances=None, scheduler=None,
+                 log: Callable[[str], None] | None = None,
+                 background: Callable[..., object] | None = None,
+                 sl_fast_path: bool = SL_FAST_PATH, depth=None, open_orders=None, journal=None,
+                 cost_basis=None):
+        self.client = client
+        self.symbols = symbols
+        self.balances = balances      # BalanceBook, if a user data stream runs
+        self.scheduler = scheduler
+        self._log = log or (lambda msg: None)
+        # background(fn, *args): off-path follow-ups; inline by default
+        self._background = background or (lambda fn, *args: fn(*args))
+        self.sl_fast_path = sl_fast_path
+        self.depth = depth            # OrderBookMirror: pre-trade fill estimates
+        self.open_orders = open_orders  # OpenOrderStore: cancels without get_open_orders
+        self.journal = journal        # TradeJournal: orders, fills and stage latencies on disk
+        self.cost_basis = cost_basis  # CostBasisBook: entry price for SL* anchored to it
+
+    # ---- lookups ----
+    def filters(self, symbol: str) -> SymbolFilters:
+        try:
+            return self.symbols.filters(symbol)
+        except Exception as e:
+            self._log(f"[ERROR] Symbol info: {e}")
+            raise EngineError(str(e)) from e
+
+    def _base_asset(self, f: SymbolFilters) -> str:
+        if not f.base_asset:
+            raise EngineError(f"baseAsset not found for {f.symbol}.")
+        return f.base_asset
+
+    def _api_error(self, what: str, e: Exception, order: bool = False) -> EngineError:
+        self._log(f"[ERROR] {what}: {e}")
+        if order:
+            self.symbols.note_order_error(e)
+        return EngineError(str(e), title="API Error")
+
+    def free_balance(self, asset: str) -> Decimal:
+        """
+        Free balance straight from the account (not the stream), since it is
+        used to size orders.
+        """
+        try:
+            balance = self.client.get_asset_balance(asset=asset)
+        except API_ERRORS as e:
+            raise self._api_error(f"get_asset_balance({asset})", e) from e
+        free_str = (balance or {}).get("free", "0")
+        try:
+            return Decimal(free_str)
+        except Exception:
+            raise EngineError(f"Invalid balance: {free_str}") from None
+
+    def usdt_balance(self) -> Decimal:
+        if self.balances is not None and self.balances.synced:
+            return self.balances.free("USDT")
+        try:
+            bal = self.client.get_asset_balance(asset="USDT")
+        except API_ERRORS as e:
+            self._log(f"[ERROR] get_asset_balance(USDT): {e}")
+            return Decimal("0")
+        try:
+            return Decimal(bal.get("free", "0"))
+        except Exception:
+            return Decimal("0")
+
+    def price(self, symbol: str) -> Decimal:
+        try:
+            price = Decimal(self.client.get_symbol_ticker(symbol=symbol)["price"])
+        except API_ERRORS as e:
+            raise self._api_error(f"get_symbol_ticker({symbol})", e) from e
+        if price <= 0:
+            raise EngineError(f"Invalid price for {symbol}: {price}")
+        return price
+
+    def calc_qty_from_percent(self, symbol: str, pct: Decimal) -> tuple[Decimal, Decimal, str]:
+        """
+        Returns (usdt_to_spend, rounded base qty, base asset).
+        """
+        usdt_balance = self.usdt_balance()
+        if usdt_balance <= 0:
+            raise EngineError("USDT balance is 0.")
+        price = self.price(symbol)
+        f = self.filters(symbol)
+        usdt_to_spend, qty = percent_qty(usdt_balance, pct, price, f.step_size)
+        return usdt_to_spend, qty, f.base_asset or "BASE"
+
+    def _rounded_qty(self, qty, f: SymbolFilters, msg: str = "Rounded quantity is 0. Increase quantity.") -> Decimal:
+        qty_rounded = round_down_step(qty, f.step_size)
+        if qty_rounded <= 0:
+            raise EngineError(msg)
+        return qty_rounded
+
+    def entry_price(self, symbol: str) -> Decimal | None:
+        """
+        Average entry price from the cost basis; synced first if this
+        session has not done so yet (usually one empty myTrades page).
+        """
+        if self.cost_basis is None:
+            return None
+        if not self.cost_basis.synced(symbol):
+            try:
+                self.cost_basis.sync(symbol)
+            except API_ERRORS as e:
+                self._log(f"[ERROR] myTrades({symbol}): {e}")
+                return None
+        return self.cost_basis.entry_price(symbol)
+
+    def _log_estimate(self, symbol: str, side: str, qty: Decimal) -> Decimal | None:
+        """
+        Expected fill of a market order from the local book (no request);
+        returns the best price as the slippage reference.
+        """
+        est = self.depth.estimate(symbol, side, qty) if self.depth is not None else None
+        if est is None:
+            return None
+        self._log(f"[INFO] {side} {symbol} estimate from book: {est.summary()}")
+        return Decimal(repr(est.best_price))
+
+    def _journal(self, action: str, result: OrderResult) -> OrderResult:
+        if self.journal is not None:
+            self.journal.record_result(action, result)
+        return result
+
+    def _place_sl(self, symbol: str, qty: Decimal, stop: Decimal, limit: Decimal) -> dict:
+        order = self.client.create_order(
+            symbol=symbol,
+            side="SELL",
+            type="STOP_LOSS_LIMIT",
+            timeInForce="GTC",
+            quantity=float(qty),
+            price=str(limit),
+            stopPrice=str(stop),
+            newOrderRespType="FULL"
+        )
+        if self.open_orders is not None:
+            self.open_orders.on_order_response(order, symbol=symbol, side="SELL", type="STOP_LOSS_LIMIT",
+                                               quantity=qty, price=limit, stopPrice=stop)
+        return order
+
+    # ---- actions ----
+    @_order_flow
+    def buy_spot(self, symbol: str, qty) -> OrderResult:
+        qty = parse_positive(qty, "quantity")
+        qty_rounded = self._rounded_qty(qty, self.filters(symbol))
+
+        self._log(f"[INFO] Market BUY {symbol}, qty {qty_rounded} ...")
+        ref_price = self._log_estimate(symbol, "BUY", qty_rounded)
+        try:
+            t0 = time.perf_counter()
+            order = self.client.order_market_buy(symbol=symbol, quantity=float(qty_rounded))
+            t_fill = time.perf_counter()
+        except API_ERRORS as e:
+            raise self._api_error("Market-Buy failed", e, order=True) from e
+        self._log(f"[OK] BUY OrderId={order.get('orderId')} Status={order.get('status')}")
+        return self._journal("buy", OrderResult(symbol, qty_rounded, order, ref_price=ref_price,
+                                                stages={"order": (t_fill - t0) * 1000}))
+
+    @_order_flow
+    def buy_spot_with_sl(self, symbol: str, qty, sl_trigger_pct, sl_limit_pct,
+                         confirmed: bool = False) -> OrderResult:
+        qty = parse_positive(qty, "quantity")
+        trigger_pct = parse_positive(sl_trigger_pct, "SL trigger %")
+        limit_pct = parse_positive(sl_limit_pct, "SL limit %")
+        check_sl_percents(trigger_pct, limit_pct, confirmed)
+
+        self._log(f"[INFO] Market BUY {symbol}, qty {qty}, "
+                  f"SL trigger -{trigger_pct}%, SL limit -{limit_pct}% ...")
+        f = self.filters(symbol)
+        base_asset = self._base_asset(f)
+        qty_rounded = self._rounded_qty(qty, f)
+        ref_price = self._log_estimate(symbol, "BUY", qty_rounded)
+
+        # 1) Market BUY
+        try:
+            t_buy = time.perf_counter()
+            buy_order = self.client.order_market_buy(
+                symbol=symbol,
+                quantity=float(qty_rounded),
+                newOrderRespType="FULL"
+            )
+            t_fill = time.perf_counter()
+        except API_ERRORS as e:
+            raise self._api_error("Market-Buy failed", e, order=True) from e
+        bought = f"[OK] BUY OrderId={buy_order.get('orderId')} Status={buy_order.get('status')}"
+
+        fills = buy_order.get("fills", [])
+        if not fills:
+            self._log(bought)
+            self._log("[ERROR] No fills -> cannot determine execution price.")
+            raise EngineError("No fills in buy order.")
+        try:
+            avg_price = avg_fill_price(fills)
+        except EngineError:
+            self._log("[ERROR] total_amount == 0 – something went wrong.")
+            raise
+
+        # 2) SL prices
+        stop_price, limit_price = sl_prices(avg_price, trigger_pct, limit_pct, f.tick_size)
+
+        # 3) SL qty
+        if self.sl_fast_path:
+            # straight from the FULL response: filled qty minus base-asset fees
+            sl_qty = sl_qty_from_fills(fills, base_asset, f.step_size)
+        else:
+            # echten freien Bestand nach dem Buy nehmen (extra round trip)
+            try:
+                free_amount = self.free_balance(base_asset)
+            except EngineError:
+                self._log(bought)
+                raise
+            sl_qty = round_down_step(free_amount, f.step_size)
+        if sl_qty <= 0:
+            self._log("[ERROR] SL quantity after balance/fees is 0.")
+            raise EngineError("Free balance for SL is 0 after fees/rounding.")
+
+        # 4) SL order -- nothing but local math between fill and this call
+        try:
+            t_sl_sent = time.perf_counter()
+            sl_order = self._place_sl(symbol, sl_qty, stop_price, limit_price)
+            t_sl = time.perf_counter()
+        except API_ERRORS as e:
+            self._log(bought)
+            raise self._api_error("Stop-Loss order failed", e, order=True) from e
+
+        fill_to_sl_ms = (t_sl - t_fill) * 1000
+        self._log(bought)
+        self._log(f"[INFO] Avg execution price: {avg_price}")
+        self._log("[INFO] Place Stop-Loss-Limit:")
+        self._log(f"       Trigger (stopPrice): {stop_price}")
+        self._log(f"       Limit   (price)    : {limit_price}")
+        self._log(f"       Qty                 : {sl_qty}")
+        self._log(f"[OK] SL OrderId={sl_order.get('orderId')} Status={sl_order.get('status')}")
+        self._log(f"[PERF] {symbol} fill -> SL: {fill_to_sl_ms:.0f} ms"
+                  f" ({'fast path' if self.sl_fast_path else 'balance lookup'})")
+
+        if self.sl_fast_path:
+            self._background(self.reconcile_sl_balance, symbol, base_asset, f.step_size)
+        stages = {"order": (t_fill - t_buy) * 1000, "calc": (t_sl_sent - t_fill) * 1000,
+                  "sl": (t_sl - t_sl_sent) * 1000}
+        return self._journal("buy_sl", OrderResult(symbol, sl_qty, buy_order, sl_order, avg_price,
+                                                   stop_price, limit_price, fill_to_sl_ms, ref_price, stages))
+
+    def reconcile_sl_balance(self, symbol: str, base_asset: str, step_size: Decimal) -> None:
+        """
+        After a fast-path SL: report free coins that are not covered by an SL
+        (older holdings, fee rounding). Runs off the order path.
+        """
+        try:
+            balance = self.client.get_asset_balance(asset=base_asset)
+            free_amount = Decimal(balance.get("free", "0"))
+        except API_ERRORS as e:
+            self._log(f"[ERROR] get_asset_balance({base_asset}) for reconciliation: {e}")
+            return
+        uncovered = round_down_step(free_amount, step_size)
+        if uncovered > 0:
+            self._log(f"[INFO] {fmt_decimal(uncovered)} {base_asset} free without SL "
+                      f"(use SL* to protect them).")
+
+    def _log_cancel_report(self, report: CancelReport, with_symbol: bool) -> None:
+        for c in report.canceled:
+            where = f"{c['symbol']} " if with_symbol else ""
+            self._log(f"[OK] Canceled SL/TP order: {where}Id={c['orderId']} Type={c['type']}")
+        for symbol, order_id, e in report.errors:
+            self._log(f"[ERROR] cancel_order {symbol} {order_id}: {e}")
+
+    def _cancel_sl_tp(self, symbol: str | None) -> CancelReport:
+        """
+        Cancel from the local open-orders store when it is synced (no
+        round trip); if it was stale (a cancel failed), once more from REST.
+        Local ids are canceled one by one: cancel-all-open-orders would also
+        hit orders the store does not know about.
+        """
+        store = self.open_orders
+        if store is not None and store.synced:
+            report = cancel_sl_tp(self.client, store.orders(symbol), log=self._log, bulk=False)
+            self._track_cancels(report)
+            if not report.errors:
+                return report
+            self._log("[INFO] Local open orders were stale, cancelling from REST.")
+            store.request_reconcile()
+        else:
+            report = CancelReport()
+        what = "get_open_orders" if symbol else "get_open_orders(all)"
+        try:
+            open_orders = self.client.get_open_orders(symbol=symbol) if symbol else self.client.get_open_orders()
+        except API_ERRORS as e:
+            raise self._api_error(what, e) from e
+        retry = cancel_sl_tp(self.client, open_orders, log=self._log)
+        self._track_cancels(retry)
+        report.canceled += retry.canceled
+        report.bulk_symbols += retry.bulk_symbols
+        report.errors = retry.errors  # the first pass's errors were stale ids
+        return report
+
+    def _track_cancels(self, report: CancelReport) -> None:
+        if self.journal is not None:
+            for c in report.canceled:
+                self.journal.record_cancel(c["symbol"], c["orderId"], c.get("type"))
+        if self.open_orders is None:
+            return
+        by_symbol: dict[str, list[int]] = {}
+        for c in report.canceled:
+            by_symbol.setdefault(c["symbol"], []).append(c["orderId"])
+        for symbol, ids in by_symbol.items():
+            self.open_orders.on_canceled(symbol, ids)
+
+    @_order_flow
+    def cancel_sl_orders(self, symbol: str) -> CancelReport:
+        """
+        Cancel SL/TP orders for a single symbol.
+        """
+        report = self._cancel_sl_tp(symbol)
+        self._log_cancel_report(report, with_symbol=False)
+        if report.count == 0:
+            self._log("[INFO] No SL/TP orders for this symbol.")
+        return report
+
+    @_order_flow
+    def cancel_all_sl_orders(self) -> CancelReport:
+        """
+        Cancel all SL/TP orders on the entire account.
+        """
+        # per symbol in parallel, bulk endpoint where only SL/TP orders are open
+        report = self._cancel_sl_tp(None)
+        self._log_cancel_report(report, with_symbol=True)
+        if report.count == 0:
+            self._log("[INFO] No SL/TP orders on account.")
+        else:
+            self._log(f"[INFO] Cleared {report.count} SL/TP orders.")
+        return report
+
+    @_order_flow
+    def sell_all(self, symbol: str) -> OrderResult | None:
+        """
+        Cancel the symbol's SL/TP orders, then market sell the free base
+        balance. None if there was nothing to sell.
+        """
+        self._log(f"[INFO] Cancel SL/TP orders for {symbol} ...")
+        t0 = time.perf_counter()
+        try:
+            self.cancel_sl_orders(symbol)
+        except EngineError:
+            pass  # logged; coins not locked by an SL can still be sold
+        cancel_ms = (time.perf_counter() - t0) * 1000
+
+        f = self.filters(symbol)
+        base_asset = self._base_asset(f)
+        free_amount = self.free_balance(base_asset)
+        if free_amount <= 0:
+            self._log(f"[INFO] No free balance of {base_asset} to sell.")
+            return None
+        sell_qty = self._rounded_qty(free_amount, f, "Rounded sell quantity is 0.")
+
+        self._log(f"[INFO] Market SELL all: {fmt_decimal(sell_qty)} {base_asset} ...")
+        ref_price = self._log_estimate(symbol, "SELL", sell_qty)
+        try:
+            t0 = time.perf_counter()
+            order = self.client.order_market_sell(symbol=symbol, quantity=float(sell_qty))
+            t_fill = time.perf_counter()
+        except API_ERRORS as e:
+            raise self._api_error("Market-Sell failed", e, order=True) from e
+        self._log(f"[OK] SELL OrderId={order.get('orderId')} Status={order.get('status')}")
+        return self._journal("sell", OrderResult(symbol, sell_qty, order, ref_price=ref_price,
+                                                 stages={"order": (t_fill - t0) * 1000, "cancel": cancel_ms}))
+
+    @_order_flow
+    def add_sl_for_free(self, symbol: str, sl_trigger_pct, sl_limit_pct,
+                        confirmed: bool = False, anchor: str = "price") -> OrderResult:
+        """
+        Setzt eine SL-Order für den gesamten freien Bestand des Base-Coins
+        des gewählten Symbols (ohne neuen Buy).
+        anchor="entry": percentages below the average entry price instead of
+        the current price, if it is known and the stop would not trigger at once.
+        """
+        trigger_pct = parse_positive(sl_trigger_pct, "SL trigger %")
+        limit_pct = parse_positive(sl_limit_pct, "SL limit %")
+        check_sl_percents(trigger_pct, limit_pct, confirmed)
+
+        f = self.filters(symbol)
+        base_asset = self._base_asset(f)
+        free_amount = self.free_balance(base_asset)
+        if free_amount <= 0:
+            self._log(f"[INFO] No free {base_asset} to protect with SL.")
+            raise NothingToDo(f"No free {base_asset} balance to set SL for.")
+        qty_rounded = self._rounded_qty(free_amount, f, "Rounded quantity is 0.")
+
+        # current price as basis for the SL percentages
+        basis = self.price(symbol)
+        stop_price, limit_price = sl_prices(basis, trigger_pct, limit_pct, f.tick_size)
+        basis_note = ""
+        if anchor == "entry":
+            entry = self.entry_price(symbol)
+            if entry is None:
+                self._log(f"[INFO] No entry price known for {symbol}, SL based on the current price.")
+            else:
+                entry_stop, entry_limit = sl_prices(entry, trigger_pct, limit_pct, f.tick_size)
+                if entry_stop >= basis:
+                    self._log(f"[INFO] Stop {fmt_decimal(entry_stop)} from entry {fmt_decimal(round_down_step(entry, f.tick_size))} is at or "
+                              f"above the price, SL based on the current price.")
+                else:
+                    basis, stop_price, limit_price = round_down_step(entry, f.tick_size), entry_stop, entry_limit
+                    basis_note = " (avg entry)"
+
+        self._log(f"[INFO] Add SL for free {base_asset}:")
+        self._log(f"       Qty       : {fmt_decimal(qty_rounded)}")
+        self._log(f"       BasisPrice: {fmt_decimal(basis)}{basis_note}")
+        self._log(f"       Trigger   : {fmt_decimal(stop_price)}")
+        self._log(f"       Limit     : {fmt_decimal(limit_price)}")
+        try:
+            t0 = time.perf_counter()
+            sl_order = self._place_sl(symbol, qty_rounded, stop_price, limit_price)
+            t_sl = time.perf_counter()
+        except API_ERRORS as e:
+            raise self._api_error("Add-SL failed", e, order=True) from e
+        self._log(f"[OK] Added SL for free coins. OrderId={sl_order.get('orderId')} "
+                  f"Status={sl_order.get('status')}")
+        return self._journal("sl", OrderResult(symbol, qty_rounded, sl_order, sl_order, basis, stop_price,
+                                               limit_price, stages={"sl": (t_sl - t0) * 1000}))
+
+    @_order_flow
+    def protect_all(self, sl_trigger_pct, sl_limit_pct, confirmed: bool = False,
+                    quote: str = "USDT", max_parallel: int = PROTECT_PARALLEL) -> ProtectReport:
+        """
+        SL for every free balance with a `quote` pair, in one pass: balances
+        once, prices of the held pairs in one request, all prices and
+        quantities from the cached filters, orders submitted concurrently.
+        """
+        trigger_pct = parse_positive(sl_trigger_pct, "SL trigger %")
+        limit_pct = parse_positive(sl_limit_pct, "SL limit %")
+        check_sl_percents(trigger_pct, limit_pct, confirmed)
+
+        if self.balances is not None and self.balances.synced:
+            free = {a: f for a, (f, _) in self.balances.snapshot().items()}
+        else:
+            try:
+                account = self.client.get_account()
+            except API_ERRORS as e:
+                raise self._api_error("get_account", e) from e
+            free = {b["asset"]: Decimal(b.get("free", "0")) for b in account.get("balances", [])}
+
+        report = ProtectReport()
+        candidates = {}
+        for asset, amount in free.items():
+            if asset == quote or amount <= 0:
+                continue
+            symbol = f"{asset}{quote}"
+            if symbol not in self.symbols or self.symbols.filters(symbol).status != "TRADING":
+                report.skipped.append((asset, f"no {quote} pair"))
+                continue
+            candidates[symbol] = (asset, amount)
+        if not candidates:
+            self._log("[INFO] Protect all: no free balances to protect.")
+            return report
+
+        try:
+            tickers = self.client.get_symbol_ticker(
+                symbols=json.dumps(sorted(candidates), separators=(",", ":")))
+        except API_ERRORS as e:
+            raise self._api_error("get_symbol_ticker(protect all)", e) from e
+        prices = {t["symbol"]: Decimal(t["price"]) for t in tickers}
+
+        # all order parameters first, pure local math
+        batch = []
+        for symbol, (asset, amount) in sorted(candidates.items()):
+            f = self.symbols.filters(symbol)
+            price = prices.get(symbol)
+            qty = round_down_step(amount, f.step_size)
+            if price is None or price <= 0:
+                report.skipped.append((asset, "no price"))
+                continue
+            if qty <= 0:
+                report.skipped.append((asset, "below step size"))
+                continue
+            stop, limit = sl_prices(price, trigger_pct, limit_pct, f.tick_size)
+            if qty * limit < f.min_notional:
+                report.skipped.append((asset, f"{fmt_decimal(qty * limit)} {quote} below min notional"))
+                continue
+            batch.append((symbol, qty, stop, limit, price))
+
+        def place(item):
+            symbol, qty, stop, limit, price = item
+            try:
+                t0 = time.perf_counter()
+                order = self._place_sl(symbol, qty, stop, limit)
+                t_sl = time.perf_counter()
+            except API_ERRORS as e:
+                self.symbols.note_order_error(e)
+                return symbol, None, e
+            result = OrderResult(symbol, qty, order, order, price, stop, limit, stages={"sl": (t_sl - t0) * 1000})
+            return symbol, self._journal("sl", result), None
+
+        self._log(f"[INFO] Protect all: {len(batch)} SL orders "
+                  f"(-{trigger_pct}% / -{limit_pct}%), {len(report.skipped)} skipped ...")
+        if batch:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_parallel, len(batch)))) as pool:
+                # pool threads do not inherit the boost
+                results = list(pool.map(lambda item: self._boosted(place, item), batch))
+            for symbol, result, error in results:
+                if error is not None:
+                    report.errors.append((symbol, error))
+                    self._log(f"[ERROR] SL {symbol}: {error}")
+                else:
+                    report.placed.append(result)
+                    self._log(f"[OK] SL {symbol}: {fmt_decimal(result.qty)} @ stop "
+                              f"{fmt_decimal(result.stop_price)} / limit {fmt_decimal(result.limit_price)}, "
+                              f"OrderId={result.order.get('orderId')}")
+        for asset, reason in report.skipped:
+            self._log(f"[INFO] Skipped {asset}: {reason}")
+        self._log(f"[INFO] Protect all: {len(report.placed)} placed, "
+                  f"{len(report.errors)} failed, {len(report.skipped)} skipped.")
+        return report
+
+    def _boosted(self, fn, *args, **kwargs):
+        ctx = self.scheduler.boost(PRIORITY_ORDER) if self.scheduler is not None else nullcontext()
+        with ctx:
+            return fn(*args, **kwargs)
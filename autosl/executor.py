@@ -0,0 +1,127 @@
+"""
+Command executor: runs blocking (network) work on worker threads and hands
+results back through a `post` callable (the GUI passes its root.after based
+dispatcher). Commands with the same key coalesce: a newer one supersedes an
+older one that has not finished yet.
+"""
+import queue
+import threading
+from typing import Any, Callable
+
+_current = threading.local()
+
+
+class Command:
+    def __init__(self, fn: Callable, args: tuple, kwargs: dict, key: str | None,
+                 on_result: Callable[[Any], None] | None,
+                 on_error: Callable[[Exception], None] | None):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.key = key
+        self.on_result = on_result
+        self.on_error = on_error
+        self.started = False
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Exception | None = None
+        self._cancelled = threading.Event()
+
+    def cancel(self) -> None:
+        """
+        Skip the command if it has not started; otherwise its result is
+        dropped and a running fn can stop early via is_cancelled().
+        """
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        return self.done.wait(timeout)
+
+
+def is_cancelled() -> bool:
+    """
+    Inside a running command: True if it was cancelled or superseded.
+    """
+    cmd = getattr(_current, "command", None)
+    return cmd is not None and cmd.cancelled
+
+
+class CommandExecutor:
+    def __init__(self, workers: int = 4, post: Callable[..., None] | None = None,
+                 name: str = "worker", log: Callable[[str], None] | None = None):
+        self._post = post or (lambda fn, *args: fn(*args))
+        self._log = log or (lambda msg: None)
+        self._queue: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._latest: dict[str, Command] = {}
+        self._threads = []
+        for i in range(workers):
+            t = threading.Thread(target=self._worker, name=f"{name}-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, fn: Callable, *args, key: str | None = None,
+               on_result: Callable[[Any], None] | None = None,
+               on_error: Callable[[Exception], None] | None = None, **kwargs) -> Command:
+        cmd = Command(fn, args, kwargs, key, on_result, on_error)
+        if key is not None:
+            with self._lock:
+                older = self._latest.get(key)
+                self._latest[key] = cmd
+            if older is not None:
+                older.cancel()
+        self._queue.put(cmd)
+        return cmd
+
+    def cancel(self, key: str) -> None:
+        with self._lock:
+            cmd = self._latest.pop(key, None)
+        if cmd is not None:
+            cmd.cancel()
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def shutdown(self) -> None:
+        for _ in self._threads:
+            self._queue.put(None)
+
+    def _worker(self) -> None:
+        while True:
+            cmd = self._queue.get()
+            if cmd is None:
+                return
+            if cmd.cancelled:
+                cmd.done.set()
+                continue
+
+            cmd.started = True
+            _current.command = cmd
+            try:
+                cmd.result = cmd.fn(*cmd.args, **cmd.kwargs)
+            except Exception as e:
+                cmd.error = e
+            finally:
+                _current.command = None
+                if cmd.key is not None:
+                    with self._lock:
+                        if self._latest.get(cmd.key) is cmd:
+                            del self._latest[cmd.key]
+                cmd.done.set()
+
+            if cmd.cancelled:
+                continue
+            try:
+                if cmd.error is not None:
+                    if cmd.on_error is not None:
+                        self._post(cmd.on_error, cmd.error)
+                    else:
+                        self._log(f"[ERROR] {getattr(cmd.fn, '__name__', 'command')}: {cmd.error}")
+                elif cmd.on_result is not None:
+                    self._post(cmd.on_result, cmd.result)
+            except Exception as e:
+                self._log(f"[ERROR] posting command result: {e}")
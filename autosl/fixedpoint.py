@@ -0,0 +1,188 @@
+"""
+Integer fixed-point prices and quantities for hot paths (trailing stops,
+batch SL math). A value is a pair (units, scale) meaning units * 10**-scale;
+tick and step sizes are Quantum(scale, units). Rounding, SL price derivation
+and formatting are pure integer arithmetic and give the same results as the
+Decimal helpers in engine.py (round_down_step, sl_prices, fmt_decimal,
+format(d, "f")), including the exponent Decimal keeps from the tick size.
+
+Differences are only possible where Decimal itself rounds, i.e. operands
+beyond its 28 significant digits (exchange prices are far below that).
+"""
+from dataclasses import dataclass
+from decimal import Decimal
+
+_POW10 = [10 ** i for i in range(64)]
+
+
+def pow10(n: int) -> int:
+    return _POW10[n] if 0 <= n < 64 else 10 ** n
+
+
+def _div_trunc(a: int, b: int) -> int:
+    # Decimal's // truncates toward zero (not floor)
+    q = abs(a) // abs(b)
+    return q if (a >= 0) == (b > 0) else -q
+
+
+def parse(text: str) -> tuple[int, int]:
+    """
+    Exact (units, scale) from a decimal string: "596.40" -> (59640, 2).
+    Trailing zeros are kept, like Decimal("596.40").
+    """
+    s = text.strip()
+    exp = 0
+    if "e" in s or "E" in s:
+        s, _, exp_s = s.replace("E", "e").partition("e")
+        exp = int(exp_s)
+    neg = s.startswith("-")
+    if s[:1] in ("+", "-"):
+        s = s[1:]
+    whole, _, frac = s.partition(".")
+    digits = whole + frac
+    if not digits or not digits.isdigit():
+        raise ValueError(f"invalid decimal: {text!r}")
+    units = int(digits)
+    scale = len(frac) - exp
+    if scale < 0:
+        units *= pow10(-scale)
+        scale = 0
+    return (-units if neg else units), scale
+
+
+def from_decimal(d: Decimal) -> tuple[int, int]:
+    exp = d.as_tuple().exponent
+    if not isinstance(exp, int):
+        raise ValueError(f"not a finite number: {d}")
+    if exp >= 0:
+        return int(d), 0
+    return int(d.scaleb(-exp)), -exp
+
+
+def to_decimal(units: int, scale: int) -> Decimal:
+    return Decimal(units).scaleb(-scale)
+
+
+def rescale(units: int, scale: int, new_scale: int) -> int:
+    """
+    Same value at another scale, truncated toward zero when digits are lost.
+    """
+    if new_scale >= scale:
+        return units * pow10(new_scale - scale)
+    return _div_trunc(units, pow10(scale - new_scale))
+
+
+@dataclass(frozen=True)
+class Quantum:
+    """
+    A tick or step size: units * 10**-scale, e.g. "0.01000000" -> (8, 1000000).
+    """
+    scale: int
+    units: int
+
+    @classmethod
+    def parse(cls, text: str) -> "Quantum":
+        units, scale = parse(text)
+        return cls(scale, units)
+
+    @classmethod
+    def from_decimal(cls, d: Decimal) -> "Quantum":
+        units, scale = from_decimal(d)
+        return cls(scale, units)
+
+
+def round_down(units: int, scale: int, q: Quantum) -> tuple[int, int]:
+    """
+    round_down_step: multiple of q at q's scale (input unchanged if q <= 0).
+    """
+    qu, qs = q.units, q.scale
+    if qu <= 0:
+        return units, scale
+    if units >= 0:  # fast path: prices / quantities are never negative
+        if scale <= qs:
+            n = units * pow10(qs - scale) // qu
+        else:
+            n = units // (pow10(scale - qs) * qu)
+    else:
+        n = _div_trunc(units * pow10(qs), pow10(scale) * qu)
+    return n * qu, qs
+
+
+def sl_prices(basis: tuple[int, int], trigger_pct: tuple[int, int], limit_pct: tuple[int, int],
+              tick: Quantum) -> tuple[tuple[int, int], tuple[int, int]]:
+    """
+    engine.sl_prices in integers: (stop, limit) below basis, rounded down
+    to the tick, stop >= limit.
+    """
+    qu, qs = tick.units, tick.scale
+    if qu <= 0:
+        raise ValueError("tick size must be > 0")
+    b, sb = basis
+    (tp, ts), (lp, ls) = trigger_pct, limit_pct
+    # basis * (1 - p/100) as an exact rational, in whole ticks:
+    # b * 10**qs * (hundred - p) / (10**sb * qu * hundred), hundred = 100 at p's scale
+    num = b * pow10(qs)
+    den = pow10(sb) * qu
+    ht, hl = 100 * pow10(ts), 100 * pow10(ls)
+    x, y = num * (ht - tp), den * ht
+    st = x // y if x >= 0 else _div_trunc(x, y)
+    x, y = num * (hl - lp), den * hl
+    lm = x // y if x >= 0 else _div_trunc(x, y)
+    if st < lm:
+        st, lm = lm, st
+    return (st * qu, qs), (lm * qu, qs)
+
+
+def compare(a: tuple[int, int], b: tuple[int, int]) -> int:
+    (ua, sa), (ub, sb) = a, b
+    s = max(sa, sb)
+    x, y = ua * pow10(s - sa), ub * pow10(s - sb)
+    return (x > y) - (x < y)
+
+
+def format_plain(units: int, scale: int) -> str:
+    """
+    format(Decimal, "f"): fixed notation with exactly `scale` decimals.
+    """
+    if units < 0:
+        return "-" + format_plain(-units, scale)
+    if scale <= 0:
+        return str(units * pow10(-scale))
+    s = str(units)
+    if len(s) <= scale:
+        s = "0" * (scale - len(s) + 1) + s
+    return s[:-scale] + "." + s[-scale:]
+
+
+def format_trimmed(units: int, scale: int) -> str:
+    """
+    fmt_decimal: no trailing zeros, "0" for zero.
+    """
+    if units == 0:
+        return "0"
+    s = format_plain(units, scale)
+    return s.rstrip("0").rstrip(".") if scale > 0 else s
+
+
+@dataclass(frozen=True)
+class FixedSymbol:
+    """
+    Integer view of one symbol's PRICE_FILTER / LOT_SIZE.
+    """
+    symbol: str
+    tick: Quantum
+    step: Quantum
+
+    @classmethod
+    def from_filters(cls, f) -> "FixedSymbol":
+        return cls(f.symbol, Quantum.from_decimal(f.tick_size), Quantum.from_decimal(f.step_size))
+
+    def round_qty(self, qty: tuple[int, int]) -> tuple[int, int]:
+        return round_down(qty[0], qty[1], self.step)
+
+    def round_price(self, price: tuple[int, int]) -> tuple[int, int]:
+        return round_down(price[0], price[1], self.tick)
+
+    def sl_prices(self, basis: tuple[int, int], trigger_pct: tuple[int, int],
+                  limit_pct: tuple[int, int]) -> tuple[tuple[int, int], tuple[int, int]]:
+        return sl_prices(basis, trigger_pct, limit_pct, self.tick)
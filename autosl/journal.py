@@ -0,0 +1,373 @@
+"""
+Append-only trade journal in SQLite (WAL mode): order events, fills with
+commissions, SL placements, cancels and the per-stage latencies of the
+engine's order flows. Callers only put rows on a queue; one background
+thread inserts whatever has piled up in a single transaction, so the
+trading path never waits for the disk.
+
+Rows are never updated. Fills arrive from both the order responses and the
+user data stream and are de-duplicated by (symbol, trade id). Every table
+has a (symbol, ts_ms) and a day (UTC) index for the report queries.
+"""
+import math
+import queue
+import sqlite3
+import threading
+import time
+from decimal import Decimal
+from typing import Callable, Iterable
+
+from .config import app_path
+
+MAX_BATCH = 1000
+SL_TYPES = ("STOP_LOSS_LIMIT", "STOP_LOSS")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    ts_ms INTEGER NOT NULL, day TEXT NOT NULL, source TEXT NOT NULL,
+    symbol TEXT NOT NULL, order_id INTEGER, client_order_id TEXT, side TEXT, type TEXT,
+    event TEXT, status TEXT, qty REAL, price REAL, stop_price REAL,
+    executed_qty REAL, quote_qty REAL
+);
+CREATE INDEX IF NOT EXISTS orders_symbol_ts ON orders (symbol, ts_ms);
+CREATE INDEX IF NOT EXISTS orders_day ON orders (day);
+CREATE INDEX IF NOT EXISTS orders_order ON orders (symbol, order_id);
+
+CREATE TABLE IF NOT EXISTS fills (
+    ts_ms INTEGER NOT NULL, day TEXT NOT NULL, symbol TEXT NOT NULL,
+    order_id INTEGER, trade_id INTEGER NOT NULL, side TEXT, type TEXT,
+    price REAL, qty REAL, quote_qty REAL, commission REAL, commission_asset TEXT,
+    stop_price REAL, maker INTEGER
+);
+CREATE UNIQUE INDEX IF NOT EXISTS fills_trade ON fills (symbol, trade_id);
+CREATE INDEX IF NOT EXISTS fills_symbol_ts ON fills (symbol, ts_ms);
+CREATE INDEX IF NOT EXISTS fills_day ON fills (day);
+
+CREATE TABLE IF NOT EXISTS actions (
+    ts_ms INTEGER NOT NULL, day TEXT NOT NULL, symbol TEXT NOT NULL, action TEXT NOT NULL,
+    order_id INTEGER, sl_order_id INTEGER, qty REAL, ref_price REAL, avg_price REAL,
+    stop_price REAL, limit_price REAL, order_ms REAL, calc_ms REAL, sl_ms REAL,
+    cancel_ms REAL, fill_to_sl_ms REAL
+);
+CREATE INDEX IF NOT EXISTS actions_symbol_ts ON actions (symbol, ts_ms);
+CREATE INDEX IF NOT EXISTS actions_day ON actions (day);
+"""
+
+INSERTS = {
+    "orders": "INSERT INTO orders VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+    "fills": "INSERT OR IGNORE INTO fills VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+    "actions": "INSERT INTO actions VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+}
+
+
+def default_path(paper: bool = False) -> str:
+    return app_path("journal.paper.sqlite3" if paper else "journal.sqlite3")
+
+
+def day_of(ts_ms: int) -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime(ts_ms / 1000))
+
+
+def _f(value) -> float | None:
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _int(value) -> int | None:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class TradeJournal:
+    """
+    Feeds are cheap and thread-safe. If the queue is full, rows are
+    dropped and counted instead of blocking the caller (like JsonlSink).
+    """
+
+    def __init__(self, path: str | None = None, log: Callable[[str], None] | None = None,
+                 max_queue: int = 100000):
+        self.path = path or default_path()
+        self._log = log or (lambda msg: None)
+        self.dropped = 0
+        self.written = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="journal-writer", daemon=True)
+        self._thread.start()
+
+    # ---- feeds ----
+    def on_execution_report(self, event: dict) -> None:
+        """
+        user data stream handler for "executionReport".
+        """
+        ts = int(event.get("E") or _now_ms())
+        symbol, order_id = event["s"], _int(event.get("i"))
+        self._put("orders", (
+            ts, day_of(ts), "stream", symbol, order_id, event.get("c"), event.get("S"), event.get("o"),
+            event.get("x"), event.get("X"), _f(event.get("q")), _f(event.get("p")), _f(event.get("P")),
+            _f(event.get("z")), _f(event.get("Z")),
+        ))
+        if event.get("x") == "TRADE" and _int(event.get("t")) is not None:
+            trade_ts = int(event.get("T") or ts)
+            self._put("fills", (
+                trade_ts, day_of(trade_ts), symbol, order_id, int(event["t"]), event.get("S"),
+                event.get("o"), _f(event.get("L")), _f(event.get("l")), _f(event.get("Y")),
+                _f(event.get("n")), event.get("N"), _f(event.get("P")), int(bool(event.get("m"))),
+            ))
+
+    def record_order(self, response: dict, **request) -> None:
+        """
+        REST order response (any resp type); `request` (symbol, side, type,
+        quantity, price, stopPrice) fills in what the response leaves out.
+        """
+        if not response or "orderId" not in response:
+            return
+        o = {"symbol": request.get("symbol"), "side": request.get("side"), "type": request.get("type"),
+             "origQty": request.get("quantity"), "price": request.get("price"),
+             "stopPrice": request.get("stopPrice"), **response}
+        ts = int(o.get("transactTime") or o.get("updateTime") or _now_ms())
+        symbol, order_id = o["symbol"], _int(o["orderId"])
+        self._put("orders", (
+            ts, day_of(ts), "rest", symbol, order_id, o.get("clientOrderId"), o.get("side"), o.get("type"),
+            "NEW", o.get("status"), _f(o.get("origQty")), _f(o.get("price")), _f(o.get("stopPrice")),
+            _f(o.get("executedQty")), _f(o.get("cummulativeQuoteQty")),
+        ))
+        for fill in o.get("fills") or []:
+            trade_id = _int(fill.get("tradeId"))
+            if trade_id is None:
+                continue
+            price, qty = _f(fill.get("price")), _f(fill.get("qty"))
+            self._put("fills", (
+                ts, day_of(ts), symbol, order_id, trade_id, o.get("side"), o.get("type"), price, qty,
+                price * qty if price is not None and qty is not None else None,
+                _f(fill.get("commission")), fill.get("commissionAsset"), _f(o.get("stopPrice")), 0,
+            ))
+
+    def record_cancel(self, symbol: str, order_id, order_type: str | None = None) -> None:
+        ts = _now_ms()
+        self._put("orders", (ts, day_of(ts), "rest", symbol, _int(order_id), None, None, order_type,
+                             "CANCELED", "CANCELED", None, None, None, None, None))
+
+    def record_result(self, action: str, result) -> None:
+        """
+        One engine flow (an OrderResult): its orders plus an actions row with
+        the stage latencies in ms.
+        """
+        order, sl_order = result.order or {}, result.sl_order
+        if action != "sl":
+            self.record_order(order, symbol=result.symbol)
+        if sl_order is not None:
+            self.record_order(sl_order, symbol=result.symbol, side="SELL", type="STOP_LOSS_LIMIT",
+                              quantity=result.qty, price=result.limit_price, stopPrice=result.stop_price)
+        executed, quote = _f(order.get("executedQty")), _f(order.get("cummulativeQuoteQty"))
+        avg = quote / executed if executed and quote is not None else None
+        stages = result.stages
+        ts = int(order.get("transactTime") or _now_ms())
+        self._put("actions", (
+            ts, day_of(ts), result.symbol, action, _int(order.get("orderId")),
+            _int(sl_order.get("orderId")) if sl_order else None, _f(result.qty), _f(result.ref_price),
+            avg, _f(result.stop_price), _f(result.limit_price), stages.get("order"),
+            stages.get("calc"), stages.get("sl"), stages.get("cancel"), result.fill_to_sl_ms,
+        ))
+
+    def _put(self, table: str, row: tuple) -> None:
+        try:
+            self._queue.put_nowait((table, row))
+        except queue.Full:
+            self.dropped += 1
+
+    # ---- writer ----
+    def flush(self, timeout: float = 5.0) -> bool:
+        """
+        Wait until everything queued so far is committed; False if that
+        did not happen within `timeout` (the queue stayed full, writer gone).
+        """
+        if not self._thread.is_alive():
+            return False
+        deadline = time.monotonic() + timeout
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(max(0.0, deadline - time.monotonic()))
+
+    def close(self, timeout: float = 5.0) -> None:
+        """
+        Commit what is queued and stop the writer, waiting at most `timeout`.
+        """
+        if not self._thread.is_alive():
+            return
+        deadline = time.monotonic() + timeout
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            self._log(f"[ERROR] Trade journal: writer stuck, {self._queue.qsize()} queued row(s) not written.")
+            return
+        self._thread.join(max(0.0, deadline - time.monotonic()))
+
+    def _run(self) -> None:
+        try:
+            con = connect(self.path)
+        except sqlite3.Error as e:
+            self._log(f"[ERROR] Trade journal {self.path}: {e}")
+            con = None
+        try:
+            while True:
+                batch = [self._queue.get()]
+                # everything that is already waiting goes into one transaction
+                while len(batch) < MAX_BATCH:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                rows: dict[str, list[tuple]] = {}
+                for item in batch:
+                    if isinstance(item, tuple):
+                        rows.setdefault(item[0], []).append(item[1])
+                if con is not None and rows:
+                    try:
+                        with con:
+                            for table, values in rows.items():
+                                con.executemany(INSERTS[table], values)
+                        self.written += sum(len(v) for v in rows.values())
+                    except sqlite3.Error as e:
+                        self._log(f"[ERROR] Trade journal write: {e}")
+                for item in batch:
+                    if isinstance(item, threading.Event):
+                        item.set()
+                if None in batch:
+                    return
+        finally:
+            if con is not None:
+                con.close()
+
+
+def connect(path: str, readonly: bool = False) -> sqlite3.Connection:
+    if readonly:
+        return sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    con = sqlite3.connect(path)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")  # WAL: durable up to the last checkpoint-safe commit
+    con.executescript(SCHEMA)
+    return con
+
+
+# =========================
+# REPORT
+# =========================
+GROUPINGS = {
+    "symbol": lambda symbol, day: symbol,
+    "month": lambda symbol, day: day[:7],
+    "day": lambda symbol, day: day,
+    "all": lambda symbol, day: "all",
+}
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """
+    Nearest-rank percentile (q in 0..100) of an ascending list.
+    """
+    if not sorted_values:
+        return float("nan")
+    k = max(0, min(len(sorted_values) - 1, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def _where(symbol: str | None, since: str | None, until: str | None, extra: str = "") -> tuple[str, list]:
+    clauses, params = [], []
+    if symbol:
+        clauses.append("symbol = ?")
+        params.append(symbol)
+    if since:
+        clauses.append("day >= ?")
+        params.append(since)
+    if until:
+        clauses.append("day <= ?")
+        params.append(until)
+    if extra:
+        clauses.append(extra)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def _grouped(rows: Iterable[tuple], by: str) -> dict[str, list[float]]:
+    """
+    rows of (symbol, day, value) -> {group: ascending values}
+    """
+    key = GROUPINGS[by]
+    groups: dict[str, list[float]] = {}
+    for symbol, day, value in rows:
+        if value is not None:
+            groups.setdefault(key(symbol, day), []).append(value)
+    for values in groups.values():
+        values.sort()
+    return groups
+
+
+def _table(title: str, unit: str, groups: dict[str, list[float]], fmt: str) -> list[str]:
+    lines = [title]
+    if not groups:
+        return lines + ["  (no data)"]
+    lines.append(f"  {'':<12} {'n':>6} {'mean':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}  {unit}")
+    for name in sorted(groups):
+        v = groups[name]
+        stats = [sum(v) / len(v), percentile(v, 50), percentile(v, 95), percentile(v, 99), v[-1]]
+        lines.append(f"  {name:<12} {len(v):>6} " + " ".join(format(s, fmt).rjust(9) for s in stats))
+    return lines
+
+
+def report_lines(path: str, symbol: str | None = None, since: str | None = None,
+                 until: str | None = None, by: str = "symbol") -> list[str]:
+    """
+    Fill-to-SL latency and slippage statistics over the journal; days are
+    UTC "YYYY-MM-DD" (inclusive).
+    """
+    con = connect(path, readonly=True)
+    try:
+        where, params = _where(symbol, since, until, "fill_to_sl_ms IS NOT NULL")
+        latency = con.execute(f"SELECT symbol, day, fill_to_sl_ms FROM actions{where}", params).fetchall()
+        where, params = _where(symbol, since, until, "order_ms IS NOT NULL")
+        order_rtt = con.execute(
+            f"SELECT symbol, day, order_ms FROM actions{where} AND action IN ('buy', 'buy_sl', 'sell')",
+            params).fetchall()
+
+        # market orders against the best book price just before sending (% adverse)
+        where, params = _where(symbol, since, until, "ref_price > 0 AND avg_price > 0")
+        entry = con.execute(
+            f"SELECT symbol, day, CASE WHEN action = 'sell' THEN (ref_price - avg_price) / ref_price * 100"
+            f" ELSE (avg_price - ref_price) / ref_price * 100 END FROM actions{where}", params).fetchall()
+
+        # executed stop-losses: average fill of each SL order below its stop
+        types = ", ".join(f"'{t}'" for t in SL_TYPES)
+        where, params = _where(symbol, since, until, f"type IN ({types}) AND stop_price > 0")
+        sl = con.execute(
+            f"SELECT symbol, MIN(day), (MAX(stop_price) - SUM(quote_qty) / SUM(qty)) / MAX(stop_price) * 100"
+            f" FROM fills{where} GROUP BY symbol, order_id HAVING SUM(qty) > 0", params).fetchall()
+
+        where, params = _where(symbol, since, until)
+        fees = con.execute(
+            f"SELECT commission_asset, SUM(commission), COUNT(*) FROM fills{where}"
+            f" GROUP BY commission_asset ORDER BY commission_asset", params).fetchall()
+    finally:
+        con.close()
+
+    span = f"{since or 'start'} .. {until or 'now'}" + (f", {symbol}" if symbol else "")
+    lines = [f"Trade journal {path} ({span})"]
+    lines += _table("fill -> SL latency (+SL)", "ms", _grouped(latency, by), ".1f")
+    lines += _table("market order round trip", "ms", _grouped(order_rtt, by), ".1f")
+    lines += _table("market order slippage vs best book price", "% adverse", _grouped(entry, by), ".3f")
+    lines += _table("SL fill below stop price (per executed SL)", "%", _grouped(sl, by), ".3f")
+    if fees:
+        lines.append("commissions: " + ", ".join(
+            f"{format(Decimal(f'{total:.8f}').normalize(), 'f')} {asset} ({n} fills)"
+            for asset, total, n in fees if asset))
+    return lines
@@ -0,0 +1,154 @@
+"""
+Logging pipeline: a bounded in-memory ring buffer that the GUI drains in
+batches, plus an optional JSONL file sink written by a background thread
+with size-based rotation.
+"""
+import json
+import os
+import queue
+import re
+import threading
+import time
+from collections import deque
+
+_LEVEL_RE = re.compile(r"^\[([A-Z]+)\]")
+
+
+def level_of(msg: str) -> str:
+    """
+    "[ERROR] foo" -> "ERROR"; messages without a tag are INFO.
+    """
+    m = _LEVEL_RE.match(msg)
+    return m.group(1) if m else "INFO"
+
+
+class JsonlSink:
+    """
+    Appends one JSON object per line. Writes happen on a background thread;
+    if the queue is full, records are dropped and counted instead of
+    blocking the caller. If the file cannot be opened, the writer drains
+    the queue and exits, and later records are dropped.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 5 * 1024 * 1024, backups: int = 3,
+                 max_queue: int = 10000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.dropped = 0
+        self._failed = False
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, record: dict) -> None:
+        if self._failed:
+            self.dropped += 1
+            return
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout: float = 2.0) -> None:
+        """
+        Write what is queued and stop; never waits longer than `timeout`.
+        """
+        if not self._thread.is_alive():
+            return
+        deadline = time.monotonic() + timeout
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return  # writer stuck (e.g. a hung disk): give up, it is a daemon thread
+        self._thread.join(max(0.0, deadline - time.monotonic()))
+
+    def _fail(self) -> None:
+        self._failed = True
+        while True:
+            try:
+                if self._queue.get_nowait() is not None:
+                    self.dropped += 1
+            except queue.Empty:
+                return
+
+    def _rotate(self) -> None:
+        for i in range(self.backups - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if os.path.exists(self.path):
+            os.replace(self.path, f"{self.path}.1")
+
+    def _run(self) -> None:
+        try:
+            fh = open(self.path, "a", encoding="utf-8")
+        except OSError:
+            self._fail()
+            return
+        try:
+            while True:
+                record = self._queue.get()
+                batch = [record]
+                # take everything that is already waiting -> one write + flush
+                while True:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                stop = None in batch
+                fh.write("".join(json.dumps(r, ensure_ascii=False) + "\n"
+                                 for r in batch if r is not None))
+                fh.flush()
+
+                if fh.tell() >= self.max_bytes:
+                    fh.close()
+                    try:
+                        self._rotate()
+                        fh = open(self.path, "a", encoding="utf-8")
+                    except OSError:
+                        self._fail()
+                        return
+                if stop:
+                    return
+        finally:
+            fh.close()
+
+
+class LogPipeline:
+    """
+    write() is cheap and thread-safe. The GUI calls drain() at a capped rate
+    and inserts the batch in one go.
+    """
+
+    def __init__(self, max_lines: int = 2000, sink: JsonlSink | None = None):
+        self.max_lines = max_lines
+        self.sink = sink
+        self._lock = threading.Lock()
+        self._ring: deque[str] = deque(maxlen=max_lines)
+        self._pending: deque[str] = deque(maxlen=max_lines)
+
+    def write(self, msg: str) -> None:
+        with self._lock:
+            self._ring.append(msg)
+            self._pending.append(msg)
+        if self.sink is not None:
+            self.sink.write({
+                "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime()),
+                "level": level_of(msg),
+                "msg": msg,
+            })
+
+    def drain(self) -> list[str]:
+        """
+        Lines written since the last drain (at most max_lines).
+        """
+        with self._lock:
+            lines = list(self._pending)
+            self._pending.clear()
+        return lines
+
+    def lines(self) -> list[str]:
+        with self._lock:
+            return list(self._ring)
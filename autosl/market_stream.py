@@ -0,0 +1,216 @@
+"""
+Streaming market data (bookTicker / miniTicker / any other stream) over one
+combined Binance WebSocket connection, with automatic resubscribe and
+reconnect with backoff.
+"""
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Callable, Iterable
+
+from websockets.exceptions import ConnectionClosed
+from websockets.sync.client import connect
+
+from .config import WS_URL
+
+# Binance accepts max. 5 control messages per second per connection
+SUBSCRIBE_INTERVAL = 0.25
+SUBSCRIBE_CHUNK = 100
+RECV_TIMEOUT = 0.5
+BACKOFF_MAX = 30.0
+
+
+@dataclass
+class PriceTick:
+    symbol: str
+    last: Decimal | None = None
+    bid: Decimal | None = None
+    ask: Decimal | None = None
+    ts: float = 0.0
+
+    @property
+    def price(self) -> Decimal | None:
+        """
+        Last trade price, or the book mid if no trade price arrived yet.
+        """
+        if self.last is not None:
+            return self.last
+        if self.bid is not None and self.ask is not None:
+            return (self.bid + self.ask) / 2
+        return None
+
+
+PRICE_CHANNELS = ("bookTicker", "miniTicker")
+
+
+def price_streams(symbol: str, channels: Iterable[str] = PRICE_CHANNELS) -> list[str]:
+    s = symbol.lower()
+    return [f"{s}@{c}" for c in channels]
+
+
+class MarketStream:
+    """
+    Several consumers (GUI, valuation, ...) each declare the streams they
+    want via set_streams(owner, ...); the connection carries the union.
+    """
+
+    def __init__(self, base_url: str = WS_URL, log: Callable[[str], None] | None = None):
+        self.base_url = base_url.rstrip("/")
+        self._log = log or (lambda msg: None)
+        self._lock = threading.Lock()
+        self._wanted: dict[str, set[str]] = {}
+        self._prices: dict[str, PriceTick] = {}
+        self._handlers: dict[str, list[Callable[[str, dict], None]]] = {}
+        self._price_listeners: list[Callable[[PriceTick], None]] = []
+        self._changed = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._next_id = 1
+        self.connected = False
+
+        self.add_handler("bookTicker", self._on_book_ticker)
+        self.add_handler("miniTicker", self._on_mini_ticker)
+
+    # ---- public API ----
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="market-stream", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._changed.set()
+
+    def set_streams(self, owner: str, streams: Iterable[str]) -> None:
+        with self._lock:
+            self._wanted[owner] = set(streams)
+        self._changed.set()
+
+    def watch_prices(self, owner: str, symbols: Iterable[str],
+                     channels: Iterable[str] = PRICE_CHANNELS) -> None:
+        """
+        bookTicker is real time, miniTicker (last price) once per second;
+        consumers that do not need every book change pass ("miniTicker",).
+        """
+        channels = tuple(channels)
+        streams = []
+        for sym in symbols:
+            if sym:
+                streams.extend(price_streams(sym, channels))
+        self.set_streams(owner, streams)
+
+    def add_handler(self, channel: str, fn: Callable[[str, dict], None]) -> None:
+        """
+        fn(SYMBOL, data) for every message of a channel, e.g. "depth@100ms".
+        """
+        self._handlers.setdefault(channel, []).append(fn)
+
+    def add_price_listener(self, fn: Callable[[PriceTick], None]) -> None:
+        self._price_listeners.append(fn)
+
+    def price(self, symbol: str) -> PriceTick | None:
+        return self._prices.get(symbol)
+
+    # ---- price channels ----
+    def _tick(self, symbol: str) -> PriceTick:
+        tick = self._prices.get(symbol)
+        if tick is None:
+            tick = self._prices[symbol] = PriceTick(symbol)
+        return tick
+
+    def _on_book_ticker(self, symbol: str, data: dict) -> None:
+        tick = self._tick(symbol)
+        tick.bid = Decimal(data["b"])
+        tick.ask = Decimal(data["a"])
+        tick.ts = time.time()
+        self._emit_price(tick)
+
+    def _on_mini_ticker(self, symbol: str, data: dict) -> None:
+        tick = self._tick(symbol)
+        tick.last = Decimal(data["c"])
+        tick.ts = time.time()
+        self._emit_price(tick)
+
+    def _emit_price(self, tick: PriceTick) -> None:
+        for fn in self._price_listeners:
+            try:
+                fn(tick)
+            except Exception as e:
+                self._log(f"[ERROR] price listener: {e}")
+
+    # ---- connection ----
+    def _all_wanted(self) -> set[str]:
+        with self._lock:
+            return set().union(*self._wanted.values()) if self._wanted else set()
+
+    def _run(self) -> None:
+        attempt = 0
+        while not self._stop.is_set():
+            wanted = self._all_wanted()
+            if not wanted:
+                self._changed.wait(1.0)
+                self._changed.clear()
+                continue
+
+            url = f"{self.base_url}/stream?streams={'/'.join(sorted(wanted))}"
+            try:
+                with connect(url, open_timeout=10, max_size=None) as ws:
+                    self.connected = True
+                    if attempt:
+                        self._log("[INFO] Market stream reconnected.")
+                    attempt = 0
+                    self._session(ws, wanted)
+            except (OSError, ConnectionClosed, TimeoutError) as e:
+                if not self._stop.is_set():
+                    self._log(f"[ERROR] Market stream: {e}")
+            except Exception as e:
+                self._log(f"[ERROR] Market stream: {e}")
+            finally:
+                self.connected = False
+
+            if self._stop.is_set():
+                break
+            delay = min(BACKOFF_MAX, 2 ** attempt) * random.uniform(0.5, 1.0)
+            attempt += 1
+            self._stop.wait(delay)
+
+    def _session(self, ws, subscribed: set[str]) -> None:
+        while not self._stop.is_set():
+            if self._changed.is_set():
+                self._changed.clear()
+                self._resubscribe(ws, subscribed)
+
+            try:
+                raw = ws.recv(timeout=RECV_TIMEOUT)
+            except TimeoutError:
+                continue
+
+            msg = json.loads(raw)
+            stream = msg.get("stream")
+            data = msg.get("data")
+            if not stream or data is None:
+                continue  # SUBSCRIBE/UNSUBSCRIBE acks
+            sym, _, channel = stream.partition("@")
+            for fn in self._handlers.get(channel, ()):
+                try:
+                    fn(sym.upper(), data)
+                except Exception as e:
+                    self._log(f"[ERROR] {stream} handler: {e}")
+
+    def _resubscribe(self, ws, subscribed: set[str]) -> None:
+        wanted = self._all_wanted()
+        for method, streams in (("UNSUBSCRIBE", subscribed - wanted),
+                                ("SUBSCRIBE", wanted - subscribed)):
+            streams = sorted(streams)
+            for i in range(0, len(streams), SUBSCRIBE_CHUNK):
+                params = streams[i:i + SUBSCRIBE_CHUNK]
+                ws.send(json.dumps({"method": method, "params": params, "id": self._next_id}))
+                self._next_id += 1
+                time.sleep(SUBSCRIBE_INTERVAL)
+        subscribed.clear()
+        subscribed.update(wanted)
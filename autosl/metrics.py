@@ -0,0 +1,186 @@
+"""
+Per-endpoint latency / error metrics and Binance rate-limit headers for the
+REST client, exported in Prometheus text format or as summary lines.
+"""
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+from urllib.parse import urlsplit
+
+# histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+RECENT_SAMPLES = 500
+
+
+class EndpointStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.sum_s = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.recent: deque[float] = deque(maxlen=RECENT_SAMPLES)
+
+    def observe(self, seconds: float, error: bool) -> None:
+        self.count += 1
+        self.sum_s += seconds
+        if error:
+            self.errors += 1
+        self.recent.append(seconds)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+
+    def percentile(self, q: float) -> float:
+        samples = sorted(self.recent)
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+class ClientMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints: dict[tuple[str, str], EndpointStats] = {}
+        # e.g. {"x-mbx-used-weight-1m": 123, "x-mbx-order-count-10s": 2}
+        self.limits: dict[str, int] = {}
+        self._header_listeners: list[Callable[[dict[str, int]], None]] = []
+
+    def add_header_listener(self, fn: Callable[[dict[str, int]], None]) -> None:
+        """
+        fn(limits) after every response carrying rate-limit headers.
+        """
+        self._header_listeners.append(fn)
+
+    def observe(self, method: str, url: str, seconds: float,
+                status: int | None, headers=None) -> None:
+        path = urlsplit(url).path
+        error = status is None or status >= 400
+        counters = {}
+        if headers is not None:
+            for name, value in headers.items():
+                lname = name.lower()
+                if lname.startswith(("x-mbx-used-weight", "x-mbx-order-count")):
+                    try:
+                        counters[lname] = int(value)
+                    except ValueError:
+                        pass
+
+        with self._lock:
+            stats = self._endpoints.get((method, path))
+            if stats is None:
+                stats = self._endpoints[(method, path)] = EndpointStats()
+            stats.observe(seconds, error)
+            self.limits.update(counters)
+
+        if counters:
+            for fn in self._header_listeners:
+                try:
+                    fn(counters)
+                except Exception:
+                    pass
+
+    # ---- export ----
+    def render_prometheus(self) -> str:
+        out = [
+            "# HELP binance_request_duration_seconds Binance REST request latency.",
+            "# TYPE binance_request_duration_seconds histogram",
+        ]
+        errors = [
+            "# HELP binance_request_errors_total Failed Binance REST requests (HTTP >= 400 or no response).",
+            "# TYPE binance_request_errors_total counter",
+        ]
+        with self._lock:
+            for (method, path), st in sorted(self._endpoints.items()):
+                labels = f'method="{method}",endpoint="{path}"'
+                cumulative = 0
+                for bound, n in zip(LATENCY_BUCKETS, st.buckets):
+                    cumulative += n
+                    out.append(f'binance_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                out.append(f'binance_request_duration_seconds_bucket{{{labels},le="+Inf"}} {st.count}')
+                out.append(f"binance_request_duration_seconds_sum{{{labels}}} {st.sum_s:.6f}")
+                out.append(f"binance_request_duration_seconds_count{{{labels}}} {st.count}")
+                errors.append(f"binance_request_errors_total{{{labels}}} {st.errors}")
+            limits = dict(self.limits)
+
+        out.extend(errors)
+        out.append("# HELP binance_rate_limit_usage Last X-MBX-USED-WEIGHT / X-MBX-ORDER-COUNT header values.")
+        out.append("# TYPE binance_rate_limit_usage gauge")
+        for name, value in sorted(limits.items()):
+            kind, _, interval = name.removeprefix("x-mbx-").rpartition("-")
+            out.append(f'binance_rate_limit_usage{{type="{kind}",interval="{interval}"}} {value}')
+        return "\n".join(out) + "\n"
+
+    def summary_lines(self) -> list[str]:
+        """
+        Human readable table for the stats panel, slowest endpoints first.
+        """
+        with self._lock:
+            rows = [
+                (st.percentile(0.95), method, path, st)
+                for (method, path), st in self._endpoints.items()
+            ]
+            limits = dict(self.limits)
+        rows.sort(key=lambda r: r[0], reverse=True)
+
+        lines = [f"{'endpoint':<28} {'n':>5} {'err':>4} {'p50':>6} {'p95':>6} {'max':>6}"]
+        for _, method, path, st in rows:
+            name = f"{method} {path.removeprefix('/api')}"
+            lines.append(
+                f"{name[:28]:<28} {st.count:>5} {st.errors:>4} "
+                f"{st.percentile(0.5) * 1000:>5.0f}ms {st.percentile(0.95) * 1000:>4.0f}ms "
+                f"{max(st.recent, default=0) * 1000:>4.0f}ms"
+            )
+        if limits:
+            lines.append("")
+            for name, value in sorted(limits.items()):
+                lines.append(f"{name}: {value}")
+        return lines
+
+
+def instrument_client(client, metrics: ClientMetrics) -> None:
+    """
+    Time every HTTP request of a python-binance Client (including failed
+    ones) by wrapping its requests session.
+    """
+    session = client.session
+    original = session.request
+
+    def request(method, url, *args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            response = original(method, url, *args, **kwargs)
+        except Exception:
+            metrics.observe(method.upper(), url, time.perf_counter() - t0, None)
+            raise
+        metrics.observe(method.upper(), url, time.perf_counter() - t0,
+                        response.status_code, response.headers)
+        return response
+
+    session.request = request
+
+
+def serve_metrics(metrics: ClientMetrics, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """
+    Serve /metrics for Prometheus on a background thread.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, fmt, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
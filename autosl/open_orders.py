@@ -0,0 +1,259 @@
+"""
+Local open-orders index, kept from executionReport events and our own
+order responses, so cancels and the GUI's SL status need no
+get_open_orders round trip. A background reconcile compares a checksum of
+the local set with REST every few minutes and after every user-stream
+resync (events may have been missed while disconnected) and replaces the
+local set on a mismatch.
+"""
+import hashlib
+import threading
+from collections import deque
+from decimal import Decimal
+from typing import Callable, Iterable
+
+from .cancel import SL_TP_TYPES
+
+RECONCILE_INTERVAL = 300.0
+OPEN_STATES = frozenset({"NEW", "PARTIALLY_FILLED", "PENDING_NEW"})
+CLOSED_MEMORY = 2000  # ids of finished orders, so a late response cannot revive them
+
+
+def _norm(value) -> str:
+    return format(Decimal(str(value or "0")).normalize(), "f")
+
+
+def checksum(orders: Iterable[dict]) -> str:
+    """
+    Order-independent digest over what matters for cancels and the SL
+    status: id, status, filled qty and prices.
+    """
+    lines = sorted(
+        f"{o['symbol']}:{o['orderId']}:{o.get('status', '')}:{_norm(o.get('executedQty'))}:"
+        f"{_norm(o.get('price'))}:{_norm(o.get('stopPrice'))}"
+        for o in orders
+    )
+    return hashlib.sha1("\n".join(lines).encode()).hexdigest()
+
+
+class OpenOrderStore:
+    """
+    {symbol: {orderId: order}} with orders in the get_open_orders shape.
+    Thread-safe; listeners get the set of changed symbols.
+    """
+
+    def __init__(self, log: Callable[[str], None] | None = None):
+        self._log = log or (lambda msg: None)
+        self._lock = threading.Lock()
+        self._orders: dict[str, dict[int, dict]] = {}
+        self._closed: set[int] = set()
+        self._closed_order: deque[int] = deque()
+        self._listeners: list[Callable[[set[str]], None]] = []
+        self._version = 0
+        self.synced = False
+        self._stream_down = False  # events are being missed: REST alone cannot make it synced
+        self.mismatches = 0
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def add_listener(self, fn: Callable[[set[str]], None]) -> None:
+        self._listeners.append(fn)
+
+    # ---- feeds ----
+    def on_execution_report(self, event: dict) -> None:
+        """
+        user data stream handler for "executionReport".
+        """
+        order_id = int(event["i"])
+        self._upsert({
+            "symbol": event["s"], "orderId": order_id, "clientOrderId": event.get("c", ""),
+            "side": event.get("S"), "type": event.get("o"), "timeInForce": event.get("f"),
+            "origQty": event.get("q"), "executedQty": event.get("z"), "price": event.get("p"),
+            "stopPrice": event.get("P"), "status": event["X"], "isWorking": bool(event.get("w")),
+            "time": event.get("O"), "updateTime": event.get("E"),
+        })
+
+    def on_order_response(self, response: dict, **request) -> None:
+        """
+        POST order response; `request` (symbol, side, type, quantity, price,
+        stopPrice) fills in what an ACK response leaves out.
+        """
+        if "orderId" not in response:
+            return
+        order = {
+            "symbol": request.get("symbol"), "side": request.get("side"), "type": request.get("type"),
+            "origQty": str(request.get("quantity", "0")), "price": str(request.get("price", "0")),
+            "stopPrice": str(request.get("stopPrice", "0")), "executedQty": "0", "status": "NEW",
+            "isWorking": request.get("type") not in SL_TP_TYPES,
+            "updateTime": response.get("transactTime"),
+        }
+        order.update({k: v for k, v in response.items() if k != "fills"})
+        order["orderId"] = int(order["orderId"])
+        self._upsert(order)
+
+    def on_canceled(self, symbol: str, order_ids: Iterable[int]) -> None:
+        """
+        Our own successful cancels (the events follow, this is just earlier).
+        """
+        with self._lock:
+            orders = self._orders.get(symbol, {})
+            for order_id in order_ids:
+                orders.pop(int(order_id), None)
+                self._remember_closed(int(order_id))
+            self._version += 1
+        self._notify({symbol})
+
+    def _upsert(self, order: dict) -> None:
+        symbol, order_id = order["symbol"], order["orderId"]
+        with self._lock:
+            if order["status"] not in OPEN_STATES:
+                self._orders.get(symbol, {}).pop(order_id, None)
+                self._remember_closed(order_id)
+            elif order_id in self._closed:
+                return  # late NEW for an order that is already done
+            else:
+                current = self._orders.setdefault(symbol, {}).get(order_id)
+                if current is not None and int(current.get("updateTime") or 0) > int(order.get("updateTime") or 0):
+                    return  # older than what we have
+                self._orders[symbol][order_id] = {**(current or {}), **order}
+            if not self._orders.get(symbol):
+                self._orders.pop(symbol, None)
+            self._version += 1
+        self._notify({symbol})
+
+    def _remember_closed(self, order_id: int) -> None:
+        if order_id in self._closed:
+            return
+        self._closed.add(order_id)
+        self._closed_order.append(order_id)
+        if len(self._closed_order) > CLOSED_MEMORY:
+            self._closed.discard(self._closed_order.popleft())
+
+    def _notify(self, symbols: set[str]) -> None:
+        for fn in self._listeners:
+            try:
+                fn(symbols)
+            except Exception as e:
+                self._log(f"[ERROR] open orders listener: {e}")
+
+    # ---- reads ----
+    def orders(self, symbol: str | None = None, types: Iterable[str] | None = None) -> list[dict]:
+        """
+        Copies in the get_open_orders shape, optionally one symbol / some types.
+        """
+        types = set(types) if types is not None else None
+        with self._lock:
+            books = [self._orders.get(symbol, {})] if symbol else list(self._orders.values())
+            return [dict(o) for b in books for o in b.values() if types is None or o.get("type") in types]
+
+    def sl_orders(self, symbol: str | None = None) -> list[dict]:
+        return self.orders(symbol, SL_TP_TYPES)
+
+    def sl_status(self, symbol: str) -> str:
+        """
+        Short SL state for the GUI: "-" (none), the stop price, "2x" or
+        "triggered" (stop hit, limit not filled yet).
+        """
+        sl = [o for o in self.sl_orders(symbol) if o.get("side") == "SELL"]
+        if not sl:
+            return "-"
+        if any(o.get("isWorking") for o in sl):
+            return "triggered"
+        if len(sl) > 1:
+            return f"{len(sl)}x"
+        return format(Decimal(str(sl[0].get("stopPrice", "0"))).normalize(), "f")
+
+    def checksum(self) -> str:
+        with self._lock:
+            return checksum(o for b in self._orders.values() for o in b.values())
+
+    # ---- REST reconciliation ----
+    def mark_stale(self) -> None:
+        """
+        The user data stream is down: the local set may miss orders placed
+        elsewhere, so it is not used for cancels until a reconcile succeeds.
+        """
+        with self._lock:
+            was, self.synced = self.synced, False
+            self._stream_down = True
+            self._version += 1
+        if was:
+            self._notify(set())
+
+    def stream_resynced(self) -> None:
+        """
+        The user data stream is back (resync listener): reconcile now, the
+        store counts as synced again once that succeeds.
+        """
+        self._stream_down = False
+        self._wake.set()
+
+    def reset(self, orders: list[dict]) -> None:
+        """
+        Replace everything with a get_open_orders() result.
+        """
+        table: dict[str, dict[int, dict]] = {}
+        for o in orders:
+            table.setdefault(o["symbol"], {})[int(o["orderId"])] = {**o, "orderId": int(o["orderId"])}
+        with self._lock:
+            changed = set(table) | set(self._orders)
+            self._orders = table
+            self._version += 1
+            self.synced = not self._stream_down
+        self._notify(changed)
+
+    def reconcile(self, client, attempts: int = 3) -> bool:
+        """
+        Compare with REST; True if they matched. Orders that change while
+        the request is in flight make the comparison meaningless, so it is
+        retried then.
+        """
+        for _ in range(attempts):
+            version = self._version
+            remote = client.get_open_orders()
+            with self._lock:
+                if self._version != version:
+                    continue
+                local = checksum(o for b in self._orders.values() for o in b.values())
+            if local == checksum(remote):
+                self.synced = not self._stream_down
+                return True
+            if self.synced:
+                self.mismatches += 1
+                self._log(f"[INFO] Open orders out of sync with REST ({len(remote)} open), reloaded.")
+            self.reset(remote)
+            return False
+        self._log("[INFO] Open orders kept changing during reconcile, next try later.")
+        return False
+
+    def start(self, client, interval: float = RECONCILE_INTERVAL) -> None:
+        """
+        Reconcile now, every `interval` seconds and whenever request_reconcile()
+        is called (e.g. from a user-stream resync listener).
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._wake.set()
+        self._thread = threading.Thread(target=self._run, args=(client, interval),
+                                        name="open-orders", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def request_reconcile(self) -> None:
+        self._wake.set()
+
+    def _run(self, client, interval: float) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.reconcile(client)
+            except Exception as e:
+                self._log(f"[ERROR] open orders reconcile: {e}")
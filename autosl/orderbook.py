@@ -0,0 +1,349 @@
+"""
+Local order book mirror: REST depth snapshot plus the diff-depth stream
+(<symbol>@depth@100ms) per watched symbol, kept in sync the way Binance
+documents it (buffer events, drop what the snapshot already contains,
+then every event must continue the previous one: U == last u + 1; a gap
+triggers a new snapshot).
+
+Each side is a pair of sorted float arrays (price key, qty), so an update
+is a bisect plus an in-place insert/delete and a fill estimate is a walk
+from the best level. The books answer pre-trade questions without a
+request: average fill price / slippage of a market order of a given size,
+and how far below the stop an SL limit must sit for the book to absorb it.
+"""
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from decimal import ROUND_UP, Decimal
+from typing import Callable, Iterable
+
+DEPTH_CHANNEL = "depth@100ms"
+SNAPSHOT_LIMIT = 1000     # levels per side (request weight 50)
+MAX_BUFFERED = 2000       # diff events kept while a snapshot is in flight
+SNAPSHOT_MIN_INTERVAL = 2.0  # seconds between two snapshots of one symbol
+# the SL limit must leave room for this multiple of the SL quantity
+LIQUIDITY_FACTOR = 2.0
+PCT_STEP = Decimal("0.01")
+
+
+class BookSide:
+    """
+    Levels best first: keys are prices for asks and negated prices for
+    bids, so both sides are ascending arrays.
+    """
+    __slots__ = ("sign", "keys", "qtys")
+
+    def __init__(self, is_bid: bool):
+        self.sign = -1.0 if is_bid else 1.0
+        self.keys = array("d")
+        self.qtys = array("d")
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def load(self, levels: Iterable) -> None:
+        pairs = sorted((self.sign * float(p), float(q)) for p, q in levels if float(q) > 0)
+        self.keys = array("d", (k for k, _ in pairs))
+        self.qtys = array("d", (q for _, q in pairs))
+
+    def set(self, price: float, qty: float) -> None:
+        """
+        Absolute quantity at a price level; 0 removes it.
+        """
+        key = self.sign * price
+        keys = self.keys
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            if qty > 0:
+                self.qtys[i] = qty
+            else:
+                del keys[i]
+                del self.qtys[i]
+        elif qty > 0:
+            keys.insert(i, key)
+            self.qtys.insert(i, qty)
+
+    def best(self) -> float | None:
+        return self.sign * self.keys[0] if self.keys else None
+
+    def levels(self, n: int) -> list[tuple[float, float]]:
+        sign = self.sign
+        return [(sign * k, q) for k, q in zip(self.keys[:n], self.qtys[:n])]
+
+    def walk(self, qty: float) -> tuple[float, float, float | None]:
+        """
+        Take up to qty from the best level on: (filled, cost, last price).
+        """
+        filled = cost = 0.0
+        price = None
+        sign = self.sign
+        for k, q in zip(self.keys, self.qtys):
+            price = sign * k
+            take = min(q, qty - filled)
+            filled += take
+            cost += take * price
+            if filled >= qty:
+                break
+        return filled, cost, price
+
+
+@dataclass
+class FillEstimate:
+    symbol: str
+    side: str
+    qty: float
+    filled: float           # < qty if the mirrored depth is too thin
+    avg_price: float
+    best_price: float       # best ask (BUY) / best bid (SELL)
+    worst_price: float      # deepest level touched
+    mid: float
+
+    @property
+    def complete(self) -> bool:
+        return self.filled >= self.qty
+
+    @property
+    def slippage_pct(self) -> float:
+        """
+        Average fill against the best price, in %; positive is adverse.
+        """
+        diff = self.avg_price - self.best_price if self.side == "BUY" else self.best_price - self.avg_price
+        return diff / self.best_price * 100
+
+    @property
+    def spread_pct(self) -> float:
+        """
+        Half the spread: what even the first unit pays against the mid.
+        """
+        return abs(self.best_price - self.mid) / self.mid * 100
+
+    def summary(self) -> str:
+        text = f"avg {self.avg_price:.6g} ({self.slippage_pct:+.3f} % vs best {self.best_price:.6g})"
+        if not self.complete:
+            text += f", book holds only {self.filled:g} of {self.qty:g}"
+        return text
+
+
+class LocalOrderBook:
+    """
+    One symbol. Not thread-safe on its own (OrderBookMirror locks).
+    """
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.bids = BookSide(is_bid=True)
+        self.asks = BookSide(is_bid=False)
+        self.last_update_id = 0
+        self.synced = False
+        self.buffer: list[dict] = []
+        self.resyncs = 0
+        self.snapshot_at = 0.0
+
+    def apply(self, event: dict) -> bool:
+        """
+        One diff event on a synced book; False on a sequence gap.
+        """
+        if event["u"] <= self.last_update_id:
+            return True  # already in the snapshot
+        if event["U"] > self.last_update_id + 1:
+            return False
+        bids, asks = self.bids, self.asks
+        for p, q in event["b"]:
+            bids.set(float(p), float(q))
+        for p, q in event["a"]:
+            asks.set(float(p), float(q))
+        self.last_update_id = event["u"]
+        return True
+
+    def load_snapshot(self, snapshot: dict) -> bool:
+        """
+        Snapshot plus the buffered events; False if the snapshot is older
+        than the oldest buffered event (fetch again).
+        """
+        last_id = int(snapshot["lastUpdateId"])
+        events = [e for e in self.buffer if e["u"] > last_id]
+        if events and events[0]["U"] > last_id + 1:
+            return False
+        self.bids.load(snapshot.get("bids", []))
+        self.asks.load(snapshot.get("asks", []))
+        self.last_update_id = last_id
+        self.buffer = []
+        for e in events:
+            if not self.apply(e):
+                return False
+        self.synced = True
+        return True
+
+    def reset(self) -> None:
+        self.synced = False
+        self.buffer = []
+        self.resyncs += 1
+
+    def mid(self) -> float | None:
+        bid, ask = self.bids.best(), self.asks.best()
+        if bid is None or ask is None:
+            return None
+        return (bid + ask) / 2
+
+    def estimate(self, side: str, qty: float) -> FillEstimate | None:
+        book_side = self.asks if side == "BUY" else self.bids
+        mid = self.mid()
+        if mid is None or qty <= 0:
+            return None
+        filled, cost, worst = book_side.walk(qty)
+        if not filled:
+            return None
+        return FillEstimate(self.symbol, side, qty, filled, cost / filled, book_side.best(), worst, mid)
+
+    def absorb_pct(self, qty: float) -> float | None:
+        """
+        How far below the best bid (in %) the bids hold qty; None if the
+        mirrored depth does not.
+        """
+        filled, _, price = self.bids.walk(qty)
+        best = self.bids.best()
+        if filled < qty or best is None:
+            return None
+        return (best - price) / best * 100
+
+
+class OrderBookMirror:
+    """
+    Books for the symbols consumers ask for via watch(owner, symbols).
+    Snapshots are fetched on a worker, never on the stream thread.
+    """
+
+    def __init__(self, client, market_stream, log: Callable[[str], None] | None = None,
+                 snapshot_limit: int = SNAPSHOT_LIMIT):
+        self.client = client
+        self.market_stream = market_stream
+        self._log = log or (lambda msg: None)
+        self.snapshot_limit = snapshot_limit
+        self._lock = threading.Lock()
+        self._wanted: dict[str, set[str]] = {}
+        self._books: dict[str, LocalOrderBook] = {}
+        self._pending: set[str] = set()
+        self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="depth")
+        self._listeners: list[Callable[[LocalOrderBook], None]] = []
+        market_stream.add_handler(DEPTH_CHANNEL, self._on_depth)
+
+    def add_listener(self, fn: Callable[[LocalOrderBook], None]) -> None:
+        """
+        fn(book) after each applied update (stream thread, lock released).
+        """
+        self._listeners.append(fn)
+
+    def watch(self, owner: str, symbols: Iterable[str]) -> None:
+        with self._lock:
+            self._wanted[owner] = {s for s in symbols if s}
+            wanted = set().union(*self._wanted.values())
+            for symbol in wanted - set(self._books):
+                self._books[symbol] = LocalOrderBook(symbol)
+            for symbol in set(self._books) - wanted:
+                del self._books[symbol]
+        self.market_stream.set_streams("depth", [f"{s.lower()}@{DEPTH_CHANNEL}" for s in wanted])
+        for symbol in wanted:
+            self._request_snapshot(symbol)
+
+    def book(self, symbol: str) -> LocalOrderBook | None:
+        """
+        The synced book of a symbol, else None.
+        """
+        book = self._books.get(symbol)
+        return book if book is not None and book.synced else None
+
+    # ---- stream ----
+    def _on_depth(self, symbol: str, data: dict) -> None:
+        with self._lock:
+            book = self._books.get(symbol)
+            if book is None:
+                return
+            if not book.synced:
+                if len(book.buffer) >= MAX_BUFFERED:
+                    del book.buffer[0]
+                book.buffer.append(data)
+                ok = False
+            elif book.apply(data):
+                ok = True
+            else:
+                self._log(f"[INFO] {symbol} depth gap (U={data['U']}, have {book.last_update_id}), resyncing.")
+                book.reset()
+                book.buffer.append(data)
+                ok = False
+        if ok:
+            self._notify(book)
+        else:
+            self._request_snapshot(symbol)
+
+    def _request_snapshot(self, symbol: str) -> None:
+        """
+        Unsynced books retry from here on their next event (rate limited).
+        """
+        now = time.monotonic()
+        with self._lock:
+            book = self._books.get(symbol)
+            if book is None or book.synced or symbol in self._pending:
+                return
+            if now - book.snapshot_at < SNAPSHOT_MIN_INTERVAL:
+                return
+            book.snapshot_at = now
+            self._pending.add(symbol)
+        self._pool.submit(self._snapshot, symbol)
+
+    def _snapshot(self, symbol: str) -> None:
+        try:
+            snapshot = self.client.get_order_book(symbol=symbol, limit=self.snapshot_limit)
+            with self._lock:
+                book = self._books.get(symbol)
+                if book is None or not book.load_snapshot(snapshot):
+                    return  # older than the buffered events: next event asks again
+        except Exception as e:
+            self._log(f"[ERROR] get_order_book({symbol}): {e}")
+            return
+        finally:
+            with self._lock:
+                self._pending.discard(symbol)
+        self._notify(book)
+
+    def _notify(self, book: LocalOrderBook) -> None:
+        for fn in self._listeners:
+            try:
+                fn(book)
+            except Exception as e:
+                self._log(f"[ERROR] order book listener: {e}")
+
+    # ---- pre-trade estimates ----
+    def levels(self, symbol: str, n: int = 20) -> tuple[list, list] | None:
+        """
+        (bids, asks) as (price, qty) lists, best first.
+        """
+        with self._lock:
+            book = self.book(symbol)
+            return (book.bids.levels(n), book.asks.levels(n)) if book is not None else None
+
+    def estimate(self, symbol: str, side: str, qty: Decimal) -> FillEstimate | None:
+        """
+        Expected average fill of a market order of qty; None without a
+        synced book.
+        """
+        with self._lock:
+            book = self.book(symbol)
+            return book.estimate(side, float(qty)) if book is not None else None
+
+    def suggest_limit_pct(self, symbol: str, qty: Decimal, trigger_pct: Decimal,
+                          factor: float = LIQUIDITY_FACTOR) -> Decimal | None:
+        """
+        SL limit % (below the basis, like the GUI field) that leaves the bid
+        depth for factor x qty between the stop and the limit, measured on
+        the book as it is now. None if the mirrored depth is too thin.
+        """
+        with self._lock:
+            book = self.book(symbol)
+            gap = book.absorb_pct(float(qty) * factor) if book is not None else None
+        if gap is None:
+            return None
+        gap = Decimal(repr(gap)).quantize(PCT_STEP, ROUND_UP)
+        return trigger_pct + max(gap, PCT_STEP)
@@ -0,0 +1,1124 @@
+"""
+Paper trading: an in-process simulated exchange behind a python-binance
+shaped client, so the engine, trailing stops, the GUI and the CLI run
+unchanged against it (BINANCE_AUTOSL_PAPER, or `python -m autosl
+paper-replay` for recorded trades).
+
+PaperExchange keeps balances (free / locked), orders and a book per symbol,
+driven by market data: trades (replayed aggTrades or live ticks) and quotes
+(bookTicker or depth levels).
+- MARKET orders take the book, walking the levels; whatever is left fills at
+  the last level. With trades only, the book is last price / last + 1 tick.
+- STOP_LOSS(_LIMIT) / TAKE_PROFIT(_LIMIT) trigger on the last trade price
+  like Binance, then take the book up to their limit. The rest of the
+  order rests. A resting order fills at its price when a trade prints
+  through it (at the price only with touch_fills), up to the traded
+  quantity. A stop whose trigger trade gapped below the limit therefore
+  stays open: a limit miss.
+- Filters (PRICE_FILTER, LOT_SIZE, NOTIONAL) and balances are checked
+  with the real error codes. Fees (taker / maker) are charged in the
+  received asset.
+Execution reports and account positions are emitted in the user data
+stream format. Per trade the hot path only compares the price with four
+cached thresholds, so a replay runs at several 100k trades per second.
+"""
+import csv
+import itertools
+import json
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from decimal import ROUND_UP, Decimal
+from typing import Callable, Iterable, Iterator
+
+import requests
+from binance.exceptions import BinanceAPIException
+
+from .config import API_URL, app_path
+from .symbols import SymbolFilters
+from .trailing import TrailingStopManager
+
+ZERO = Decimal("0")
+INF = float("inf")
+FEE_QUANTUM = Decimal("0.00000001")
+TAKER_FEE = Decimal("0.001")
+MAKER_FEE = Decimal("0.001")
+# trigger direction per (type, side): -1 fires at/below the stop, +1 at/above
+TRIGGER_DIRECTION = {
+    ("STOP_LOSS", "SELL"): -1, ("STOP_LOSS_LIMIT", "SELL"): -1,
+    ("STOP_LOSS", "BUY"): 1, ("STOP_LOSS_LIMIT", "BUY"): 1,
+    ("TAKE_PROFIT", "SELL"): 1, ("TAKE_PROFIT_LIMIT", "SELL"): 1,
+    ("TAKE_PROFIT", "BUY"): -1, ("TAKE_PROFIT_LIMIT", "BUY"): -1,
+}
+ORDER_TYPES = {"MARKET", "LIMIT", "LIMIT_MAKER", *(t for t, _ in TRIGGER_DIRECTION)}
+OPEN_STATES = ("NEW", "PARTIALLY_FILLED")
+DEPTH_LEVELS = 50  # mirrored levels per side a paper order can take
+# (time, price, qty) columns of the public trade files
+TRADE_COLUMNS = {"aggTrades": (5, 1, 2), "trades": (4, 1, 2)}
+
+
+def api_error(code: int, msg: str, status: int = 400) -> BinanceAPIException:
+    """
+    The exception python-binance raises for this error response.
+    """
+    return BinanceAPIException(None, status, json.dumps({"code": code, "msg": msg}))
+
+
+def insufficient_balance() -> BinanceAPIException:
+    return api_error(-2010, "Account has insufficient balance for requested action.")
+
+
+def _dec(value) -> Decimal:
+    # floats via repr: 600.1 -> Decimal("600.1"), not its binary expansion
+    return value if isinstance(value, Decimal) else Decimal(repr(value) if isinstance(value, float) else str(value))
+
+
+def _s(d: Decimal) -> str:
+    return f"{d:.8f}"
+
+
+@dataclass(eq=False)
+class PaperOrder:
+    symbol: str
+    order_id: int
+    client_order_id: str
+    side: str
+    type: str
+    time_in_force: str
+    qty: Decimal
+    price: Decimal | None
+    stop_price: Decimal | None
+    time: int
+    status: str = "NEW"
+    executed: Decimal = ZERO
+    cum_quote: Decimal = ZERO
+    working: bool = True         # False while a stop order waits for its trigger
+    working_time: int = -1
+    update_time: int = 0
+    locked: Decimal = ZERO       # still locked for it: base (SELL) or quote (BUY)
+    fills: list[dict] = field(default_factory=list)
+
+    @property
+    def remaining(self) -> Decimal:
+        return self.qty - self.executed
+
+    def view(self) -> dict:
+        return {
+            "symbol": self.symbol, "orderId": self.order_id, "orderListId": -1,
+            "clientOrderId": self.client_order_id, "price": _s(self.price or ZERO),
+            "origQty": _s(self.qty), "executedQty": _s(self.executed),
+            "cummulativeQuoteQty": _s(self.cum_quote), "status": self.status,
+            "timeInForce": self.time_in_force, "type": self.type, "side": self.side,
+            "stopPrice": _s(self.stop_price or ZERO), "icebergQty": _s(ZERO),
+            "time": self.time, "updateTime": self.update_time or self.time,
+            "isWorking": self.working, "workingTime": self.working_time,
+            "origQuoteOrderQty": _s(ZERO), "selfTradePreventionMode": "EXPIRE_MAKER",
+        }
+
+    def response(self, resp_type: str = "FULL") -> dict:
+        """
+        POST /order response (ACK / RESULT / FULL).
+        """
+        data = {"symbol": self.symbol, "orderId": self.order_id, "orderListId": -1,
+                "clientOrderId": self.client_order_id, "transactTime": self.update_time or self.time}
+        if resp_type == "ACK":
+            return data
+        view = self.view()
+        for key in ("time", "updateTime", "isWorking", "stopPrice", "icebergQty"):
+            view.pop(key)
+        if self.stop_price is not None:
+            view["stopPrice"] = _s(self.stop_price)
+        data.update(view)
+        if resp_type == "FULL":
+            data["fills"] = list(self.fills)
+        return data
+
+
+class _Book:
+    """
+    Market state of one symbol plus its open orders and the thresholds the
+    per-trade hot path compares against.
+    """
+    __slots__ = ("filters", "tick_f", "last", "bids", "asks", "quoted", "orders",
+                 "down", "up", "sell_at", "buy_at")
+
+    def __init__(self, filters: SymbolFilters):
+        self.filters = filters
+        self.tick_f = float(filters.tick_size)
+        self.last: float | None = None
+        self.bids: list[tuple[float, float]] = []  # best first
+        self.asks: list[tuple[float, float]] = []
+        self.quoted = False
+        self.orders: dict[int, PaperOrder] = {}
+        self.down = -INF    # highest stop that fires at/below
+        self.up = INF       # lowest stop that fires at/above
+        self.sell_at = INF  # lowest resting SELL limit
+        self.buy_at = -INF  # highest resting BUY limit
+
+    def levels(self, side: str) -> list[tuple[float, float]]:
+        """
+        The levels an order of `side` takes: asks for BUY, bids for SELL.
+        """
+        if self.quoted:
+            return self.asks if side == "BUY" else self.bids
+        if self.last is None:
+            return []
+        return [(self.last + self.tick_f, INF)] if side == "BUY" else [(self.last, INF)]
+
+    def reindex(self) -> None:
+        down, up, sell_at, buy_at = -INF, INF, INF, -INF
+        for o in self.orders.values():
+            if not o.working:
+                stop = float(o.stop_price)
+                if TRIGGER_DIRECTION[(o.type, o.side)] < 0:
+                    down = max(down, stop)
+                else:
+                    up = min(up, stop)
+            elif o.side == "SELL":
+                sell_at = min(sell_at, float(o.price))
+            else:
+                buy_at = max(buy_at, float(o.price))
+        self.down, self.up, self.sell_at, self.buy_at = down, up, sell_at, buy_at
+
+
+class PaperExchange:
+    """
+    Thread-safe: market data may come from a stream thread while orders
+    arrive from worker threads. Listeners get user data stream events
+    (executionReport, outboundAccountPosition), called outside the lock.
+    """
+
+    def __init__(self, exchange_info: dict, balances: dict[str, Decimal] | None = None,
+                 taker_fee: Decimal = TAKER_FEE, maker_fee: Decimal = MAKER_FEE,
+                 touch_fills: bool = False,
+                 price_source: Callable[[str], Decimal] | None = None,
+                 log: Callable[[str], None] | None = None):
+        self.exchange_info = exchange_info
+        self.taker_fee = taker_fee
+        self.maker_fee = maker_fee
+        self.touch_fills = touch_fills
+        # asked once for a symbol without market data yet (e.g. a public REST ticker)
+        self._price_source = price_source
+        self._log = log or (lambda msg: None)
+        self._lock = threading.RLock()
+        self._books: dict[str, _Book] = {}
+        self._infos: dict[str, dict] = {}
+        for info in exchange_info.get("symbols", []):
+            self._infos[info["symbol"]] = info
+            self._books[info["symbol"]] = _Book(SymbolFilters.from_info(info))
+        self._balances: dict[str, list[Decimal]] = {
+            a: [_dec(v), ZERO] for a, v in (balances or {}).items()}
+        self._order_ids = itertools.count(1)
+        self._trade_ids = itertools.count(1)
+        self.trades: dict[str, list[dict]] = {}  # symbol -> myTrades records
+        self._orders: dict[int, PaperOrder] = {}
+        self._listeners: list[Callable[[dict], None]] = []
+        self._events: list[dict] = []
+        self._touched: set[str] = set()
+        self.data_time_ms: int | None = None  # replay clock; wall clock while None
+
+    # ---- setup ----
+    def add_listener(self, fn: Callable[[dict], None]) -> None:
+        self._listeners.append(fn)
+
+    def add_symbol(self, symbol: str, base: str, quote: str, tick_size: str, step_size: str,
+                   min_notional: str = "0") -> None:
+        """
+        A symbol without exchange info (synthetic replays).
+        """
+        info = {"symbol": symbol, "status": "TRADING", "baseAsset": base, "quoteAsset": quote,
+                "filters": [{"filterType": "PRICE_FILTER", "tickSize": tick_size},
+                            {"filterType": "LOT_SIZE", "stepSize": step_size},
+                            {"filterType": "NOTIONAL", "minNotional": min_notional}]}
+        with self._lock:
+            self.exchange_info.setdefault("symbols", []).append(info)
+            self._infos[symbol] = info
+            self._books[symbol] = _Book(SymbolFilters.from_info(info))
+
+    def now_ms(self) -> int:
+        return self.data_time_ms if self.data_time_ms is not None else int(time.time() * 1000)
+
+    # ---- market data ----
+    def on_trade(self, symbol: str, price: float, qty: float = INF, ts_ms: int | None = None) -> None:
+        """
+        One trade print; the hot path of a replay.
+        """
+        book = self._books.get(symbol)
+        if book is None:
+            return
+        if ts_ms is not None:
+            self.data_time_ms = ts_ms
+        book.last = price
+        if price <= book.down or price >= book.up or price >= book.sell_at or price <= book.buy_at:
+            self._run(self._cross, book, price, qty)
+
+    def on_quote(self, symbol: str, bid: float, ask: float, bid_qty: float = INF,
+                 ask_qty: float = INF) -> None:
+        """
+        Best bid / ask (bookTicker).
+        """
+        self.on_depth(symbol, [(bid, bid_qty)], [(ask, ask_qty)])
+
+    def on_depth(self, symbol: str, bids: list[tuple[float, float]], asks: list[tuple[float, float]]) -> None:
+        """
+        Book levels, best first. Resting orders the book has moved through fill.
+        """
+        book = self._books.get(symbol)
+        if book is None:
+            return
+        book.bids, book.asks, book.quoted = bids, asks, True
+        if (bids and bids[0][0] >= book.sell_at) or (asks and asks[0][0] <= book.buy_at):
+            self._run(self._cross_book, book)
+
+    def on_tick(self, symbol: str, last: Decimal | None, bid: Decimal | None = None,
+                ask: Decimal | None = None) -> None:
+        """
+        Live MarketStream tick (PriceTick fields).
+        """
+        book = self._books.get(symbol)
+        if book is None:
+            return
+        if bid is not None and ask is not None:
+            self.on_quote(symbol, float(bid), float(ask))
+        if last is not None and float(last) != book.last:
+            self.on_trade(symbol, float(last))
+
+    def _ensure_price(self, book: _Book) -> None:
+        if book.last is not None or self._price_source is None:
+            return
+        try:
+            book.last = float(self._price_source(book.filters.symbol))
+        except Exception as e:
+            self._log(f"[ERROR] Paper price for {book.filters.symbol}: {e}")
+
+    # ---- matching ----
+    def _cross(self, book: _Book, price: float, qty: float) -> None:
+        fired = set()
+        for o in list(book.orders.values()):
+            if o.working:
+                continue
+            stop = float(o.stop_price)
+            if (price <= stop) if TRIGGER_DIRECTION[(o.type, o.side)] < 0 else (price >= stop):
+                fired.add(o.order_id)
+                self._trigger(book, o)
+        available = qty
+        touch = self.touch_fills
+        for o in sorted(book.orders.values(), key=lambda o: (o.price or ZERO) * (1 if o.side == "SELL" else -1)):
+            if not o.working or o.order_id in fired or available <= 0:
+                continue
+            limit = float(o.price)
+            if o.side == "SELL":
+                through = price > limit or (touch and price == limit)
+            else:
+                through = price < limit or (touch and price == limit)
+            if through:
+                fill = o.remaining if available == INF else min(o.remaining, _dec(available))
+                available -= float(fill)
+                self._fill(book, o, o.price, fill, maker=True)
+        book.reindex()
+
+    def _cross_book(self, book: _Book) -> None:
+        for o in list(book.orders.values()):
+            if o.working and o.price is not None:
+                self._take(book, o, maker=True)
+        book.reindex()
+
+    def _trigger(self, book: _Book, o: PaperOrder) -> None:
+        o.working, o.working_time = True, self.now_ms()
+        o.update_time = o.working_time
+        self._report(o, "NEW")
+        if o.price is None:  # STOP_LOSS / TAKE_PROFIT: market order now
+            self._take(book, o, maker=False)
+            if o.status in OPEN_STATES:
+                self._expire(o)
+        else:
+            self._take(book, o, maker=False)
+
+    def _take(self, book: _Book, o: PaperOrder, maker: bool) -> None:
+        """
+        Fill `o` against the book levels within its limit (market: all of it,
+        the rest at the last level).
+        """
+        limit = float(o.price) if o.price is not None else None
+        levels = book.levels(o.side)
+        for i, (price, size) in enumerate(levels):
+            if o.remaining <= 0:
+                break
+            if limit is not None and (price < limit if o.side == "SELL" else price > limit):
+                break
+            last_level = i == len(levels) - 1
+            if size == INF or (limit is None and last_level):
+                qty = o.remaining
+            else:
+                qty = min(o.remaining, _dec(size))
+            # a resting order filled by a moving book trades at its own price
+            self._fill(book, o, o.price if maker else _dec(price), qty, maker)
+
+    def _fill(self, book: _Book, o: PaperOrder, price: Decimal, qty: Decimal, maker: bool) -> None:
+        f = book.filters
+        quote_qty = price * qty
+        rate = self.maker_fee if maker else self.taker_fee
+        if o.side == "BUY":
+            fee, fee_asset = (qty * rate).quantize(FEE_QUANTUM, ROUND_UP), f.base_asset
+            quote = self._balance(f.quote_asset)
+            if o.price is not None:  # limit buy: release the lock at the limit price
+                reserved = o.price * qty
+                quote[1] -= reserved
+                o.locked -= reserved
+                quote[0] += reserved - quote_qty
+            else:
+                quote[0] -= quote_qty
+            self._balance(f.base_asset)[0] += qty - fee
+        else:
+            fee, fee_asset = (quote_qty * rate).quantize(FEE_QUANTUM, ROUND_UP), f.quote_asset
+            base = self._balance(f.base_asset)
+            base[1] -= qty
+            o.locked -= qty
+            self._balance(f.quote_asset)[0] += quote_qty - fee
+        self._touched.update((f.base_asset, f.quote_asset))
+
+        now = self.now_ms()
+        trade_id = next(self._trade_ids)
+        o.executed += qty
+        o.cum_quote += quote_qty
+        o.update_time = now
+        o.status = "FILLED" if o.remaining <= 0 else "PARTIALLY_FILLED"
+        o.fills.append({"price": _s(price), "qty": _s(qty), "commission": _s(fee),
+                        "commissionAsset": fee_asset, "tradeId": trade_id})
+        self.trades.setdefault(o.symbol, []).append({
+            "symbol": o.symbol, "id": trade_id, "orderId": o.order_id, "orderListId": -1,
+            "price": _s(price), "qty": _s(qty), "quoteQty": _s(quote_qty), "commission": _s(fee),
+            "commissionAsset": fee_asset, "time": now, "isBuyer": o.side == "BUY",
+            "isMaker": maker, "isBestMatch": True,
+        })
+        if o.status == "FILLED":
+            self._close(o)
+        self._report(o, "TRADE", last=(price, qty, fee, fee_asset, trade_id, maker))
+
+    def _expire(self, o: PaperOrder) -> None:
+        o.status = "EXPIRED"
+        self._release(o)
+        self._close(o)
+        self._report(o, "EXPIRED")
+
+    def _release(self, o: PaperOrder) -> None:
+        f = self._books[o.symbol].filters
+        asset = f.base_asset if o.side == "SELL" else f.quote_asset
+        if o.locked:
+            bal = self._balance(asset)
+            bal[0] += o.locked
+            bal[1] -= o.locked
+            o.locked = ZERO
+            self._touched.add(asset)
+
+    def _close(self, o: PaperOrder) -> None:
+        self._books[o.symbol].orders.pop(o.order_id, None)
+        if o.status == "FILLED":
+            self._release(o)  # price improvement on a limit buy
+
+    # ---- orders ----
+    def place(self, symbol: str, side: str, type: str, quantity, price=None, stop_price=None,
+              time_in_force: str = "GTC", client_order_id: str | None = None) -> PaperOrder:
+        """
+        Validate, lock the balance and match; raises BinanceAPIException like
+        POST /api/v3/order.
+        """
+        book = self._book(symbol)
+        o = self._new_order(book, side, type, quantity, price, stop_price, time_in_force, client_order_id)
+        return self._run(self._submit, book, o)
+
+    def _new_order(self, book: _Book, side, type, quantity, price, stop_price, time_in_force,
+                   client_order_id) -> PaperOrder:
+        """
+        Parameter and filter checks (no state change).
+        """
+        f = book.filters
+        if side not in ("BUY", "SELL"):
+            raise api_error(-1117, "Invalid side.")
+        if type not in ORDER_TYPES:
+            raise api_error(-1116, "Invalid orderType.")
+        if quantity is None:
+            raise api_error(-1102, "Mandatory parameter 'quantity' was not sent, was empty/null, or malformed.")
+        qty = _dec(quantity)
+        needs_price = type in ("LIMIT", "LIMIT_MAKER") or type.endswith("_LIMIT")
+        needs_stop = (type, side) in TRIGGER_DIRECTION
+        if needs_price and price is None:
+            raise api_error(-1102, "Mandatory parameter 'price' was not sent, was empty/null, or malformed.")
+        if needs_stop and stop_price is None:
+            raise api_error(-1102, "Mandatory parameter 'stopPrice' was not sent, was empty/null, or malformed.")
+        price = _dec(price) if needs_price else None
+        stop = _dec(stop_price) if needs_stop else None
+        if qty <= 0 or qty % f.step_size:
+            raise api_error(-1013, "Filter failure: LOT_SIZE")
+        for p in (price, stop):
+            if p is not None and (p <= 0 or p % f.tick_size):
+                raise api_error(-1013, "Filter failure: PRICE_FILTER")
+        self._ensure_price(book)
+        if book.last is None:
+            raise api_error(-2010, f"No market data for {f.symbol} yet (paper).")
+        ref = price if price is not None else _dec(book.last)
+        if qty * ref < f.min_notional:
+            raise api_error(-1013, "Filter failure: NOTIONAL")
+        now = self.now_ms()
+        return PaperOrder(
+            symbol=f.symbol, order_id=0, client_order_id=client_order_id or f"paper{now}",
+            side=side, type=type, time_in_force=time_in_force if needs_price else "GTC",
+            qty=qty, price=price, stop_price=stop, time=now, working=not needs_stop,
+            working_time=now if not needs_stop else -1,
+        )
+
+    def _submit(self, book: _Book, o: PaperOrder) -> PaperOrder:
+        f = book.filters
+        # checked at placement against the price of that moment (for
+        # cancel-replace: after the old order is already canceled)
+        if o.stop_price is not None:
+            direction = TRIGGER_DIRECTION[(o.type, o.side)]
+            if (book.last <= float(o.stop_price)) if direction < 0 else (book.last >= float(o.stop_price)):
+                raise api_error(-2010, "Stop price would trigger immediately.")
+        # lock what the order may spend (sells: base, buys: quote at the limit / book)
+        if o.side == "SELL":
+            asset, amount = f.base_asset, o.qty
+        elif o.price is not None:
+            asset, amount = f.quote_asset, o.qty * o.price
+        else:
+            asset, amount = f.quote_asset, self._market_cost(book, o.qty)
+        bal = self._balance(asset)
+        if bal[0] < amount:
+            raise insufficient_balance()
+        if o.type == "LIMIT_MAKER" and book.levels(o.side) and self._crosses(book, o):
+            raise api_error(-2010, "Order would immediately match and take.")
+        o.order_id = next(self._order_ids)
+        self._orders[o.order_id] = o
+        if o.side == "SELL" or o.price is not None:
+            bal[0] -= amount
+            bal[1] += amount
+            o.locked = amount
+            self._touched.add(asset)
+        book.orders[o.order_id] = o
+        self._report(o, "NEW")
+        if o.working:
+            self._take(book, o, maker=False)
+            if o.status in OPEN_STATES and (o.price is None or o.time_in_force in ("IOC", "FOK")):
+                self._expire(o)
+        book.reindex()
+        return o
+
+    def _crosses(self, book: _Book, o: PaperOrder) -> bool:
+        best = book.levels(o.side)[0][0]
+        return best >= float(o.price) if o.side == "SELL" else best <= float(o.price)
+
+    def _market_cost(self, book: _Book, qty: Decimal) -> Decimal:
+        cost, left = ZERO, qty
+        levels = book.levels("BUY")
+        for i, (price, size) in enumerate(levels):
+            take = left if size == INF or i == len(levels) - 1 else min(left, _dec(size))
+            cost += _dec(price) * take
+            left -= take
+            if left <= 0:
+                break
+        return cost
+
+    def cancel(self, symbol: str, order_id: int | None = None,
+               client_order_id: str | None = None) -> PaperOrder:
+        book = self._book(symbol)
+        return self._run(self._cancel, book, order_id, client_order_id)
+
+    def _cancel(self, book: _Book, order_id: int | None, client_order_id: str | None) -> PaperOrder:
+        o = book.orders.get(order_id) if order_id is not None else next(
+            (o for o in book.orders.values() if o.client_order_id == client_order_id), None)
+        if o is None:
+            raise api_error(-2011, "Unknown order sent.")
+        o.status, o.update_time = "CANCELED", self.now_ms()
+        self._release(o)
+        self._close(o)
+        book.reindex()
+        self._report(o, "CANCELED")
+        return o
+
+    def cancel_all(self, symbol: str) -> list[PaperOrder]:
+        book = self._book(symbol)
+
+        def run():
+            if not book.orders:
+                raise api_error(-2011, "Unknown order sent.")
+            return [self._cancel(book, oid, None) for oid in list(book.orders)]
+        return self._run(run)
+
+    def cancel_replace(self, symbol: str, cancel_order_id: int, mode: str, side: str, type: str,
+                       quantity, price=None, stop_price=None, time_in_force: str = "GTC") -> dict:
+        """
+        Filters first (nothing happens on a filter error), then cancel, then
+        the new order, like POST /api/v3/order/cancelReplace. A new stop
+        that would trigger immediately fails after the cancel (-2021), so
+        the old order is gone then, as on Binance.
+        """
+        book = self._book(symbol)
+
+        def run():
+            new = self._new_order(book, side, type, quantity, price, stop_price, time_in_force, None)
+            try:
+                old = self._cancel(book, cancel_order_id, None)
+            except BinanceAPIException as e:
+                if mode == "STOP_ON_FAILURE":
+                    raise api_error(-2022, "Order cancel-replace failed.") from e
+                old = None
+            try:
+                placed = self._submit(book, new)
+            except BinanceAPIException as e:
+                raise api_error(-2021, "Order cancel-replace partially failed.") from e
+            return {"cancelResult": "SUCCESS" if old else "FAILURE", "newOrderResult": "SUCCESS",
+                    "cancelResponse": old.view() if old else {}, "newOrderResponse": placed.response()}
+        return self._run(run)
+
+    # ---- queries ----
+    def order(self, symbol: str, order_id: int) -> PaperOrder:
+        o = self._orders.get(order_id)
+        if o is None or o.symbol != symbol:
+            raise api_error(-2013, "Order does not exist.")
+        return o
+
+    def open_orders(self, symbol: str | None = None) -> list[PaperOrder]:
+        with self._lock:
+            books = [self._book(symbol)] if symbol else self._books.values()
+            return sorted((o for b in books for o in b.orders.values()), key=lambda o: o.order_id)
+
+    def balance(self, asset: str) -> tuple[Decimal, Decimal]:
+        free_amt, locked_amt = self._balances.get(asset, (ZERO, ZERO))
+        return free_amt, locked_amt
+
+    def balances(self) -> dict[str, tuple[Decimal, Decimal]]:
+        with self._lock:
+            return {a: (b[0], b[1]) for a, b in self._balances.items()}
+
+    def last_price(self, symbol: str) -> Decimal | None:
+        book = self._book(symbol)
+        self._ensure_price(book)
+        return _dec(book.last) if book.last is not None else None
+
+    def active_symbols(self) -> set[str]:
+        """
+        Symbols with open orders (their prices must keep flowing in).
+        """
+        return {s for s, b in self._books.items() if b.orders}
+
+    # ---- internals ----
+    def _book(self, symbol: str) -> _Book:
+        book = self._books.get(symbol)
+        if book is None:
+            raise api_error(-1121, "Invalid symbol.")
+        return book
+
+    def _balance(self, asset: str) -> list[Decimal]:
+        bal = self._balances.get(asset)
+        if bal is None:
+            bal = self._balances[asset] = [ZERO, ZERO]
+        return bal
+
+    def _run(self, fn, *args):
+        """
+        fn under the lock, then the events it produced (outside the lock).
+        """
+        error = result = None
+        with self._lock:
+            try:
+                result = fn(*args)
+            except BinanceAPIException as e:
+                error = e  # what happened before it (cancel-replace) is still reported
+            events = self._drain()
+        for event in events:
+            for listener in self._listeners:
+                try:
+                    listener(event)
+                except Exception as e:
+                    self._log(f"[ERROR] paper listener: {e}")
+        if error is not None:
+            raise error
+        return result
+
+    def _drain(self) -> list[dict]:
+        events, self._events = self._events, []
+        if self._touched:
+            now = self.now_ms()
+            events.append({"e": "outboundAccountPosition", "E": now, "u": now, "B": [
+                {"a": a, "f": _s(self._balances[a][0]), "l": _s(self._balances[a][1])}
+                for a in sorted(self._touched)]})
+            self._touched = set()
+        return events
+
+    def _report(self, o: PaperOrder, exec_type: str, last=None) -> None:
+        if not self._listeners:
+            return
+        price, qty, fee, fee_asset, trade_id, maker = last or (ZERO, ZERO, ZERO, None, -1, False)
+        now = self.now_ms()
+        self._events.append({
+            "e": "executionReport", "E": now, "s": o.symbol, "c": o.client_order_id,
+            "S": o.side, "o": o.type, "f": o.time_in_force, "q": _s(o.qty),
+            "p": _s(o.price or ZERO), "P": _s(o.stop_price or ZERO), "F": _s(ZERO), "g": -1,
+            "C": "", "x": exec_type, "X": o.status, "r": "NONE", "i": o.order_id,
+            "l": _s(qty), "z": _s(o.executed), "L": _s(price), "n": _s(fee), "N": fee_asset,
+            "T": now, "t": trade_id, "I": 0, "w": o.working and o.status in OPEN_STATES,
+            "m": maker, "M": False, "O": o.time, "Z": _s(o.cum_quote),
+            "Y": _s(price * qty), "Q": _s(ZERO), "W": o.working_time, "V": "EXPIRE_MAKER",
+        })
+
+
+class PaperClient:
+    """
+    python-binance Client look-alike over a PaperExchange (the calls the app
+    makes). Wrap it in a ScheduledClient like the real one.
+    """
+
+    def __init__(self, exchange: PaperExchange, market=None):
+        self.exchange = exchange
+        self.market = market  # public client for real depth snapshots, if any
+        self.timestamp_offset = 0
+        # never sends anything; the ConnectionManager mounts its pool here
+        self.session = requests.Session()
+
+    # ---- general / market data ----
+    def ping(self, **params) -> dict:
+        return {}
+
+    def get_server_time(self, **params) -> dict:
+        return {"serverTime": self.exchange.now_ms()}
+
+    def get_exchange_info(self, **params) -> dict:
+        return self.exchange.exchange_info
+
+    def get_symbol_info(self, symbol: str, **params) -> dict | None:
+        return self.exchange._infos.get(symbol)
+
+    def get_symbol_ticker(self, **params):
+        if "symbols" in params:
+            return [self._ticker(s) for s in json.loads(params["symbols"])]
+        if "symbol" in params:
+            return self._ticker(params["symbol"])
+        return self.get_all_tickers()
+
+    def get_all_tickers(self, **params) -> list[dict]:
+        return [{"symbol": s, "price": _s(_dec(b.last))}
+                for s, b in self.exchange._books.items() if b.last is not None]
+
+    def get_order_book(self, **params) -> dict:
+        if self.market is None:
+            raise api_error(-1121, "No market data source for depth (paper).")
+        return self.market.get_order_book(**params)
+
+    def _ticker(self, symbol: str) -> dict:
+        price = self.exchange.last_price(symbol)
+        if price is None:
+            raise api_error(-1121, "Invalid symbol.")
+        return {"symbol": symbol, "price": _s(price)}
+
+    # ---- account ----
+    def get_account(self, **params) -> dict:
+        return {
+            "makerCommission": 10, "takerCommission": 10, "canTrade": True, "canWithdraw": False,
+            "canDeposit": False, "accountType": "SPOT", "updateTime": self.exchange.now_ms(),
+            "balances": [{"asset": a, "free": _s(f), "locked": _s(l)}
+                         for a, (f, l) in sorted(self.exchange.balances().items())],
+            "permissions": ["SPOT"],
+        }
+
+    def get_asset_balance(self, asset=None, **params) -> dict | None:
+        free_amt, locked_amt = self.exchange.balance(asset)
+        return {"asset": asset, "free": _s(free_amt), "locked": _s(locked_amt)}
+
+    def get_my_trades(self, **params) -> list[dict]:
+        trades = self.exchange.trades.get(params["symbol"], [])
+        from_id = int(params.get("fromId", 0))
+        limit = int(params.get("limit", 500))
+        return [t for t in trades if t["id"] >= from_id][:limit]
+
+    # ---- orders ----
+    def create_order(self, **params) -> dict:
+        o = self.exchange.place(
+            params["symbol"], params.get("side"), params.get("type"), params.get("quantity"),
+            price=params.get("price"), stop_price=params.get("stopPrice"),
+            time_in_force=params.get("timeInForce", "GTC"),
+            client_order_id=params.get("newClientOrderId"),
+        )
+        default = "FULL" if o.type in ("MARKET", "LIMIT") else "ACK"
+        return o.response(params.get("newOrderRespType", default))
+
+    def order_market_buy(self, **params) -> dict:
+        return self.create_order(side="BUY", type="MARKET", **params)
+
+    def order_market_sell(self, **params) -> dict:
+        return self.create_order(side="SELL", type="MARKET", **params)
+
+    def order_limit_buy(self, **params) -> dict:
+        return self.create_order(side="BUY", type="LIMIT", timeInForce="GTC", **params)
+
+    def order_limit_sell(self, **params) -> dict:
+        return self.create_order(side="SELL", type="LIMIT", timeInForce="GTC", **params)
+
+    def get_order(self, **params) -> dict:
+        return self.exchange.order(params["symbol"], int(params["orderId"])).view()
+
+    def get_open_orders(self, **params) -> list[dict]:
+        return [o.view() for o in self.exchange.open_orders(params.get("symbol"))]
+
+    def cancel_order(self, **params) -> dict:
+        order_id = params.get("orderId")
+        o = self.exchange.cancel(params["symbol"], int(order_id) if order_id is not None else None,
+                                 params.get("origClientOrderId"))
+        return o.view()
+
+    def cancel_all_open_orders(self, **params) -> list[dict]:
+        return [o.view() for o in self.exchange.cancel_all(params["symbol"])]
+
+    def cancel_replace_order(self, **params) -> dict:
+        return self.exchange.cancel_replace(
+            params["symbol"], int(params["cancelOrderId"]), params.get("cancelReplaceMode", "STOP_ON_FAILURE"),
+            params.get("side"), params.get("type"), params.get("quantity"),
+            price=params.get("price"), stop_price=params.get("stopPrice"),
+            time_in_force=params.get("timeInForce", "GTC"),
+        )
+
+    # ---- user data stream (events come from PaperExchange listeners) ----
+    def stream_get_listen_key(self, **params) -> str:
+        return "paper"
+
+    def stream_keepalive(self, listenKey=None, **params) -> dict:
+        return {}
+
+    def stream_close(self, listenKey=None, **params) -> dict:
+        return {}
+
+
+# =========================
+# SETUP / LIVE FEED
+# =========================
+def parse_balances(spec: str) -> dict[str, Decimal]:
+    """
+    "USDT=10000,BNB=1" -> {"USDT": Decimal("10000"), "BNB": Decimal("1")}.
+    """
+    balances = {}
+    for part in spec.replace(";", ",").split(","):
+        if not part.strip():
+            continue
+        asset, _, amount = part.partition("=")
+        try:
+            balances[asset.strip().upper()] = Decimal(amount.strip())
+        except Exception:
+            raise ValueError(f"invalid paper balance: {part!r} (expected ASSET=AMOUNT)") from None
+    return balances
+
+
+def public_client():
+    """
+    Unauthenticated python-binance client for market data (exchange info,
+    first prices) in paper mode.
+    """
+    from binance.client import Client
+    c = Client(ping=False)
+    if API_URL:
+        c.API_URL = API_URL
+    return c
+
+
+def load_exchange_info(client=None) -> dict:
+    """
+    The exchange-info disk cache of SymbolInfoCache, else one public request.
+    """
+    try:
+        with open(app_path("exchange_info.json"), "r", encoding="utf-8") as fh:
+            data = json.load(fh)
+        if data.get("symbols"):
+            return {"rateLimits": data.get("rateLimits", []), "symbols": data["symbols"]}
+    except (OSError, ValueError):
+        pass
+    return (client or public_client()).get_exchange_info()
+
+
+def create_live_exchange(balances_spec: str, public=None,
+                         log: Callable[[str], None] | None = None) -> PaperExchange:
+    """
+    Paper exchange for the GUI / daemon: real exchange info and prices,
+    simulated orders and balances (kept in memory for this process).
+    """
+    public = public or public_client()
+    return PaperExchange(
+        load_exchange_info(public), parse_balances(balances_spec),
+        price_source=lambda symbol: Decimal(public.get_symbol_ticker(symbol=symbol)["price"]),
+        log=log,
+    )
+
+
+def attach_streams(exchange: PaperExchange, market_stream, user_stream, depth=None) -> None:
+    """
+    Live paper mode: stream prices drive the book (symbols with open orders
+    stay subscribed), paper events replace the user data stream socket.
+    With an OrderBookMirror, mirrored symbols fill against the real depth.
+    """
+    def on_tick(tick) -> None:
+        if depth is not None and depth.book(tick.symbol) is not None:
+            exchange.on_tick(tick.symbol, tick.last)  # quotes come from the depth
+        else:
+            exchange.on_tick(tick.symbol, tick.last, tick.bid, tick.ask)
+    market_stream.add_price_listener(on_tick)
+    if depth is not None:
+        def on_book(book) -> None:
+            levels = depth.levels(book.symbol, DEPTH_LEVELS)
+            if levels is not None:
+                exchange.on_depth(book.symbol, *levels)
+        depth.add_listener(on_book)
+
+    def on_event(event: dict) -> None:
+        if event.get("e") == "executionReport" and (event["x"] == "NEW" or event["X"] not in OPEN_STATES):
+            market_stream.watch_prices("paper", exchange.active_symbols())
+        user_stream.dispatch(event)
+    exchange.add_listener(on_event)
+    user_stream.resync()
+
+
+# =========================
+# REPLAY
+# =========================
+def read_trades(path: str) -> Iterator[tuple[int, float, float]]:
+    """
+    (time ms, price, qty) from a Binance public aggTrades / trades CSV.
+    """
+    name = os.path.basename(path)
+    kind = "trades" if "-trades-" in name else "aggTrades"
+    t_col, p_col, q_col = TRADE_COLUMNS[kind]
+    with open(path, "r", encoding="utf-8", newline="") as fh:
+        rows = csv.reader(fh)
+        first = next(rows, None)
+        if first is None:
+            return
+        if first[0][:1].isdigit():
+            rows = itertools.chain([first], rows)
+        micros = None
+        for row in rows:
+            ts = int(row[t_col])
+            if micros is None:
+                micros = ts > 10 ** 14  # public spot data is in microseconds since 2025
+            yield (ts // 1000 if micros else ts), float(row[p_col]), float(row[q_col])
+
+
+@dataclass
+class ReplayCycle:
+    """
+    One entry (+SL) and how it ended.
+    """
+    entry_ms: int
+    qty: Decimal
+    entry_price: Decimal
+    stop_price: Decimal
+    limit_price: Decimal
+    outcome: str = "open"        # stop | miss | unprotected | open
+    exit_price: Decimal | None = None
+    exit_ms: int | None = None
+
+    @property
+    def slippage_pct(self) -> float | None:
+        """
+        Exit below the (last) stop price, in % of the stop.
+        """
+        if self.exit_price is None:
+            return None
+        return float((self.stop_price - self.exit_price) / self.stop_price * 100)
+
+
+@dataclass
+class ReplayReport:
+    trades: int = 0
+    first_ms: int = 0
+    last_ms: int = 0
+    wall_s: float = 0.0
+    cycles: list[ReplayCycle] = field(default_factory=list)
+    reprices: int = 0
+    start_equity: Decimal = ZERO
+    end_equity: Decimal = ZERO
+    fees: Decimal = ZERO
+
+    def lines(self) -> list[str]:
+        hours = (self.last_ms - self.first_ms) / 3_600_000
+        stops = [c for c in self.cycles if c.outcome == "stop"]
+        misses = [c for c in self.cycles if c.outcome == "miss"]
+        lost = [c for c in self.cycles if c.outcome == "unprotected"]
+        slips = [c.slippage_pct for c in stops]
+        lines = [
+            f"[PERF] replay: {self.trades} trades ({hours:.1f} h of data) in {self.wall_s:.1f} s, "
+            f"{self.trades / max(self.wall_s, 1e-9):,.0f} trades/s",
+            f"[INFO] entries {len(self.cycles)}, SL filled {len(stops)}, limit misses {len(misses)}, "
+            f"unprotected {len(lost)}, open {len(self.cycles) - len(stops) - len(misses) - len(lost)}, "
+            f"trailing re-prices {self.reprices}",
+        ]
+        if slips:
+            lines.append(f"[INFO] SL slippage below stop: mean {sum(slips) / len(slips):.3f} %, "
+                         f"max {max(slips):.3f} %")
+        if misses:
+            miss_slips = [c.slippage_pct for c in misses]
+            lines.append(f"[INFO] missed SLs sold {sum(miss_slips) / len(miss_slips):.3f} % below the stop on average")
+        if lost:
+            lost_slips = [c.slippage_pct for c in lost if c.exit_price is not None]
+            lines.append(f"[INFO] {len(lost)} position(s) lost their SL (trailing could not restore it)"
+                         + (f", sold {sum(lost_slips) / len(lost_slips):.3f} % below the stop on average"
+                            if lost_slips else ""))
+        pnl = self.end_equity - self.start_equity
+        lines.append(f"[INFO] equity {self.start_equity:.2f} -> {self.end_equity:.2f} "
+                     f"({pnl:+.2f}, fees {self.fees:.2f})")
+        return lines
+
+
+class PaperReplay:
+    """
+    Recorded trades of one symbol through a PaperExchange with the real
+    TradingEngine (and TrailingStopManager) on top. Every `every_s` seconds
+    of data time without a position it buys `pct` % of the free quote with
+    +SL; an SL that triggered but is still unfilled after `miss_after_s` is
+    a limit miss and the position is sold at market (sell all). An SL that
+    disappeared without filling (trailing could not restore it) counts as
+    unprotected; what is left is sold at market too.
+    """
+
+    def __init__(self, exchange: PaperExchange, symbol: str, trigger_pct, limit_pct, pct,
+                 every_s: float = 3600, miss_after_s: float = 60, trail: bool = False,
+                 log: Callable[[str], None] | None = None):
+        from .engine import TradingEngine
+        from .symbols import SymbolInfoCache
+
+        self.exchange = exchange
+        self.symbol = symbol
+        self.trigger_pct, self.limit_pct = Decimal(str(trigger_pct)), Decimal(str(limit_pct))
+        self.pct = Decimal(str(pct))
+        self.every_ms = int(every_s * 1000)
+        self.miss_after_ms = int(miss_after_s * 1000)
+        self._log = log or (lambda msg: None)
+        self._tmp = tempfile.TemporaryDirectory(prefix="autosl-replay-")
+        self.client = PaperClient(exchange)
+        self.symbols = SymbolInfoCache(self.client, path=os.path.join(self._tmp.name, "exchange_info.json"))
+        self.symbols.ensure_loaded()
+        self.filters = self.symbols.filters(symbol)
+        self.engine = TradingEngine(self.client, self.symbols, log=self._log)
+        self.trail = trail
+        self.trailing: TrailingStopManager | None = None
+
+    def equity(self) -> Decimal:
+        f = self.filters
+        price = self.exchange.last_price(self.symbol) or ZERO
+        return sum(self.exchange.balance(f.quote_asset)) + sum(self.exchange.balance(f.base_asset)) * price
+
+    def run(self, trades: Iterable[tuple[int, float, float]]) -> ReplayReport:
+        report = ReplayReport()
+        symbol, exchange = self.symbol, self.exchange
+        on_trade = exchange.on_trade
+        trades = iter(trades)
+        first = next(trades, None)
+        if first is None:
+            return report
+        on_trade(symbol, first[1], first[2], first[0])
+        report.first_ms = next_entry = next_step = first[0]
+        report.start_equity = self.equity()
+        if self.trail:
+            # on data time (set by the first trade), re-prices inline:
+            # deterministic and as fast as the data
+            self.trailing = TrailingStopManager(
+                self.client, self.symbols, log=self._log,
+                path=os.path.join(self._tmp.name, "trailing.json"),
+                clock=lambda: exchange.now_ms() / 1000, submit=lambda fn, *args: fn(*args))
+            # order updates as the user data stream would deliver them
+            exchange.add_listener(self._on_event)
+        trailing = self.trailing
+        cycle = None
+        high = INF
+        count = 1
+        t0 = time.perf_counter()
+        for ts, price, qty in trades:
+            on_trade(symbol, price, qty, ts)
+            count += 1
+            if price > high:
+                high = price
+                trailing.on_price(symbol, _dec(price))
+            if ts < next_step:
+                continue
+            next_step = ts + 1000  # orders / state once per data second
+            if trailing is not None:
+                # falling prices too (the last price guards the next stop), like the live stream
+                trailing.on_price(symbol, _dec(price))
+            if cycle is None:
+                if ts >= next_entry:
+                    next_entry = ts + self.every_ms
+                    cycle = self._enter(ts)
+                    if cycle is not None:
+                        report.cycles.append(cycle)
+                        high = float(cycle.entry_price) if trailing is not None else INF
+            elif self._settle(cycle, ts):
+                cycle, high = None, INF
+            if trailing is not None:
+                trailing.flush()
+        report.wall_s = time.perf_counter() - t0
+        report.trades, report.last_ms = count, exchange.now_ms()
+        report.end_equity = self.equity()
+        report.reprices = trailing.reprice_count if trailing is not None else 0
+        for trades_list in exchange.trades.values():
+            for t in trades_list:
+                fee = Decimal(t["commission"])
+                report.fees += fee if t["commissionAsset"] == self.filters.quote_asset else fee * Decimal(t["price"])
+        self._tmp.cleanup()
+        return report
+
+    def _enter(self, ts: int) -> ReplayCycle | None:
+        from .engine import EngineError
+        try:
+            _, qty, _ = self.engine.calc_qty_from_percent(self.symbol, self.pct)
+            res = self.engine.buy_spot_with_sl(self.symbol, qty, self.trigger_pct, self.limit_pct,
+                                               confirmed=True)
+        except EngineError as e:
+            self._log(f"[INFO] replay entry skipped: {e}")
+            return None
+        if self.trailing is not None:
+            self.trailing.protect_result(res, self.trigger_pct, self.limit_pct)
+        self._sl_id = int(res.sl_order["orderId"])
+        return ReplayCycle(ts, res.qty, res.basis_price, res.stop_price, res.limit_price)
+
+    def _on_event(self, event: dict) -> None:
+        if event.get("e") != "executionReport":
+            return
+        if event["s"] == self.symbol and event["o"] == "STOP_LOSS_LIMIT" and event["x"] == "NEW":
+            # a replaced / re-placed stop, also when trailing ends before the next _settle
+            self._sl_id, self._sl_prices = int(event["i"]), (Decimal(event["P"]), Decimal(event["p"]))
+        self.trailing.on_execution_report(event)
+
+    def _settle(self, cycle: ReplayCycle, ts: int) -> bool:
+        """
+        True once the cycle is over (SL filled, missed or lost, and sold).
+        """
+        from .engine import EngineError
+        if self.trailing is not None:
+            cycle.stop_price, cycle.limit_price = self._sl_prices
+        o = self.exchange.order(self.symbol, self._sl_id)
+        if o.status == "FILLED":
+            cycle.outcome, cycle.exit_ms = "stop", o.update_time
+            cycle.exit_price = o.cum_quote / o.executed
+        elif o.status not in OPEN_STATES and (self.trailing is None or self.symbol not in self.trailing):
+            # the SL is gone without filling: the trailing recovery failed
+            # (or sold at market itself), sell whatever is left
+            try:
+                self.engine.sell_all(self.symbol)
+            except EngineError as e:
+                self._log(f"[INFO] replay sell after lost SL: {e}")
+            cycle.outcome, cycle.exit_ms = "unprotected", ts
+            sold = [(Decimal(t["price"]), Decimal(t["qty"])) for t in self.exchange.trades.get(self.symbol, [])
+                    if not t["isBuyer"] and t["time"] >= cycle.entry_ms]
+            total = sum(q for _, q in sold)
+            cycle.exit_price = sum(p * q for p, q in sold) / total if total else None
+        elif o.working and ts - o.working_time >= self.miss_after_ms:
+            if self.trailing is not None:
+                self.trailing.release(self.symbol)
+            res = self.engine.sell_all(self.symbol)
+            cycle.outcome, cycle.exit_ms = "miss", ts
+            sold = [(Decimal(f["price"]), Decimal(f["qty"])) for f in (res.order.get("fills", []) if res else [])]
+            sold += [(Decimal(f["price"]), Decimal(f["qty"])) for f in o.fills]
+            total = sum(q for _, q in sold)
+            cycle.exit_price = sum(p * q for p, q in sold) / total if total else None
+        else:
+            return False
+        if self.trailing is not None:
+            self.trailing.release(self.symbol)
+        return True
@@ -0,0 +1,298 @@
+"""
+Rate-limit aware request scheduler. Token buckets mirror the REQUEST_WEIGHT
+and ORDERS limits from exchange info; orders and cancels always go first,
+background reads are deferred briefly and then shed. Retry-After from 429/418
+responses pauses everything.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+PRIORITY_ORDER = 0        # place / cancel orders
+PRIORITY_ACCOUNT = 1      # balances, open orders, own trades
+PRIORITY_BACKGROUND = 2   # prices, exchange info, anything periodic
+
+# share of each bucket a priority may NOT touch (kept free for orders)
+RESERVE = {PRIORITY_ORDER: 0.0, PRIORITY_ACCOUNT: 0.1, PRIORITY_BACKGROUND: 0.3}
+# how long a request may wait for tokens before it is shed
+MAX_WAIT = {PRIORITY_ORDER: 30.0, PRIORITY_ACCOUNT: 5.0, PRIORITY_BACKGROUND: 1.0}
+
+_INTERVAL_SECONDS = {"SECOND": 1, "MINUTE": 60, "HOUR": 3600, "DAY": 86400}
+_HEADER_UNIT = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+# Binance's public defaults, used until exchange info is loaded
+DEFAULT_RATE_LIMITS = [
+    {"rateLimitType": "REQUEST_WEIGHT", "interval": "MINUTE", "intervalNum": 1, "limit": 6000},
+    {"rateLimitType": "ORDERS", "interval": "SECOND", "intervalNum": 10, "limit": 100},
+    {"rateLimitType": "ORDERS", "interval": "DAY", "intervalNum": 1, "limit": 200000},
+]
+
+
+def _open_orders_weight(kw: dict) -> int:
+    return 6 if kw.get("symbol") else 80
+
+
+def _ticker_weight(kw: dict) -> int:
+    return 2 if kw.get("symbol") else 4
+
+
+def _depth_weight(kw: dict) -> int:
+    limit = int(kw.get("limit", 100))
+    if limit <= 100:
+        return 5
+    if limit <= 500:
+        return 25
+    if limit <= 1000:
+        return 50
+    return 250
+
+
+# python-binance Client method -> (weight or weight(kwargs), priority, counts toward ORDERS)
+ENDPOINT_COSTS: dict[str, tuple] = {
+    "order_market_buy": (1, PRIORITY_ORDER, True),
+    "order_market_sell": (1, PRIORITY_ORDER, True),
+    "create_order": (1, PRIORITY_ORDER, True),
+    "cancel_replace_order": (1, PRIORITY_ORDER, True),
+    "cancel_order": (1, PRIORITY_ORDER, False),
+    "cancel_all_open_orders": (1, PRIORITY_ORDER, False),
+    "get_account": (20, PRIORITY_ACCOUNT, False),
+    "get_asset_balance": (20, PRIORITY_ACCOUNT, False),
+    "get_open_orders": (_open_orders_weight, PRIORITY_ACCOUNT, False),
+    "get_my_trades": (20, PRIORITY_ACCOUNT, False),
+    "get_order": (4, PRIORITY_ACCOUNT, False),
+    "stream_get_listen_key": (2, PRIORITY_ACCOUNT, False),
+    "stream_keepalive": (2, PRIORITY_ACCOUNT, False),
+    "get_symbol_ticker": (_ticker_weight, PRIORITY_BACKGROUND, False),
+    "get_all_tickers": (4, PRIORITY_BACKGROUND, False),
+    "get_exchange_info": (20, PRIORITY_BACKGROUND, False),
+    "get_symbol_info": (20, PRIORITY_BACKGROUND, False),
+    "get_order_book": (_depth_weight, PRIORITY_BACKGROUND, False),
+    "get_server_time": (1, PRIORITY_BACKGROUND, False),
+    "ping": (1, PRIORITY_BACKGROUND, False),
+}
+DEFAULT_COST = (1, PRIORITY_BACKGROUND, False)
+
+
+class RequestShed(Exception):
+    """
+    A low-priority request was dropped to keep weight free for orders.
+    """
+
+
+class TokenBucket:
+    def __init__(self, capacity: int, period: float, clock: Callable[[], float] = time.monotonic):
+        self.capacity = capacity
+        self.period = period
+        self.rate = capacity / period
+        self.tokens = float(capacity)
+        self._clock = clock
+        self._stamp = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def available(self) -> float:
+        self._refill()
+        return self.tokens
+
+    def take(self, n: int) -> None:
+        self._refill()
+        self.tokens -= n
+
+    def wait_time(self, n: float) -> float:
+        """
+        Seconds until n tokens are available.
+        """
+        self._refill()
+        missing = n - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def sync_used(self, used: int) -> None:
+        """
+        Align with the server's count (X-MBX-USED-WEIGHT-*, X-MBX-ORDER-COUNT-*).
+        """
+        self._refill()
+        self.tokens = min(self.tokens, float(self.capacity - used))
+
+
+class RequestScheduler:
+    def __init__(self, rate_limits: list[dict] | None = None,
+                 log: Callable[[str], None] | None = None):
+        self._log = log or (lambda msg: None)
+        self._cond = threading.Condition()
+        self._weight: dict[int, TokenBucket] = {}
+        self._orders: dict[int, TokenBucket] = {}
+        self._waiting = [0, 0, 0]
+        self._blocked_until = 0.0
+        self._local = threading.local()
+        self.shed_count = 0
+        self.configure(rate_limits or DEFAULT_RATE_LIMITS)
+
+    def configure(self, rate_limits: list[dict]) -> None:
+        """
+        (Re)build buckets from exchange info `rateLimits`.
+        """
+        weight, orders = {}, {}
+        for rl in rate_limits:
+            seconds = _INTERVAL_SECONDS.get(rl.get("interval"), 60) * int(rl.get("intervalNum", 1))
+            if rl.get("rateLimitType") == "REQUEST_WEIGHT":
+                weight[seconds] = TokenBucket(int(rl["limit"]), seconds)
+            elif rl.get("rateLimitType") == "ORDERS":
+                orders[seconds] = TokenBucket(int(rl["limit"]), seconds)
+        if not weight and not orders:
+            return
+        with self._cond:
+            self._weight, self._orders = weight, orders
+            self._cond.notify_all()
+
+    @contextmanager
+    def boost(self, priority: int = PRIORITY_ORDER):
+        """
+        Run every request of the current thread with (at least) this priority,
+        e.g. the price lookup inside an order flow.
+        """
+        previous = getattr(self._local, "priority", None)
+        self._local.priority = priority
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
+    def effective_priority(self, priority: int) -> int:
+        boosted = getattr(self._local, "priority", None)
+        return priority if boosted is None else min(priority, boosted)
+
+    # ---- admission ----
+    def _delay(self, weight: int, priority: int, is_order: bool) -> float:
+        """
+        0 if the request may go now, else seconds to wait (lock held).
+        """
+        now = time.monotonic()
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        if any(self._waiting[p] for p in range(priority)):
+            return 0.05  # a more important request is waiting
+        reserve = RESERVE[priority]
+        delay = 0.0
+        buckets = [(b, weight) for b in self._weight.values()]
+        if is_order:
+            buckets += [(b, 1) for b in self._orders.values()]
+        for bucket, n in buckets:
+            delay = max(delay, bucket.wait_time(n + reserve * bucket.capacity))
+        return delay
+
+    def acquire(self, weight: int, priority: int, is_order: bool = False) -> None:
+        priority = self.effective_priority(priority)
+        deadline = time.monotonic() + MAX_WAIT[priority]
+        with self._cond:
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    delay = self._delay(weight, priority, is_order)
+                    if delay <= 0:
+                        break
+                    if time.monotonic() + delay > deadline and priority != PRIORITY_ORDER:
+                        self.shed_count += 1
+                        raise RequestShed(f"request shed (weight {weight}, priority {priority})")
+                    self._cond.wait(min(delay, 0.5))
+                for bucket in self._weight.values():
+                    bucket.take(weight)
+                if is_order:
+                    for bucket in self._orders.values():
+                        bucket.take(1)
+            finally:
+                self._waiting[priority] -= 1
+                self._cond.notify_all()
+
+    # ---- feedback from the server ----
+    def observe_headers(self, counters: dict[str, int]) -> None:
+        """
+        Listener for ClientMetrics: {"x-mbx-used-weight-1m": 120, ...}.
+        """
+        with self._cond:
+            for name, used in counters.items():
+                kind, _, interval = name.removeprefix("x-mbx-").rpartition("-")
+                try:
+                    seconds = int(interval[:-1]) * _HEADER_UNIT[interval[-1]]
+                except (KeyError, ValueError):
+                    continue
+                buckets = self._weight if kind == "used-weight" else self._orders
+                bucket = buckets.get(seconds)
+                if bucket is not None:
+                    bucket.sync_used(used)
+
+    def backoff(self, seconds: float) -> None:
+        """
+        Pause all requests (Retry-After of a 429/418 response).
+        """
+        with self._cond:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        self._log(f"[ERROR] Rate limit hit -> pausing requests for {seconds:.0f}s.")
+
+    def status(self) -> dict[str, float]:
+        with self._cond:
+            out = {f"weight/{s}s": b.available() for s, b in self._weight.items()}
+            out.update({f"orders/{s}s": b.available() for s, b in self._orders.items()})
+        return out
+
+
+def _retry_after(exc: Exception) -> float | None:
+    status = getattr(exc, "status_code", None)
+    if status not in (418, 429):
+        return None
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After", 60))
+    except (TypeError, ValueError):
+        return 60.0
+
+
+class ScheduledClient:
+    """
+    Drop-in proxy for a python-binance Client: each API method first takes
+    its weight from the scheduler.
+    """
+
+    def __init__(self, client, scheduler: RequestScheduler,
+                 param_hook: Callable[[str, dict], None] | None = None):
+        object.__setattr__(self, "_client", client)
+        object.__setattr__(self, "_scheduler", scheduler)
+        object.__setattr__(self, "param_hook", param_hook)
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+        weight, priority, is_order = ENDPOINT_COSTS.get(name, DEFAULT_COST)
+        scheduler = self._scheduler
+        param_hook = self.param_hook
+
+        def call(*args, **kwargs):
+            if param_hook is not None:
+                param_hook(name, kwargs)
+            w = weight(kwargs) if callable(weight) else weight
+            scheduler.acquire(w, priority, is_order)
+            try:
+                return attr(*args, **kwargs)
+            except Exception as e:
+                retry_after = _retry_after(e)
+                if retry_after is not None:
+                    scheduler.backoff(retry_after)
+                raise
+
+        call.__name__ = name
+        return call
+
+    def __setattr__(self, name, value):
+        if name == "param_hook":
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._client, name, value)
+
+    @property
+    def raw(self):
+        return self._client
@@ -0,0 +1,149 @@
+"""
+Percent sizing from local state only: the GUI's "%" field is turned into a
+USDT amount and a rounded base quantity from the cached free USDT balance,
+the streamed price and the exchange-info filters, without a request.
+Every input is pushed in when it changes (keystroke, balance event, price
+tick) and the quote is recomputed only if one of them actually differs
+from the last computation.
+"""
+import threading
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Callable
+
+from .engine import fmt_decimal, percent_qty
+from .symbols import SymbolFilters
+
+
+@dataclass(frozen=True)
+class SizeQuote:
+    symbol: str
+    pct: Decimal
+    usdt_balance: Decimal
+    price: Decimal
+    usdt_to_spend: Decimal
+    qty: Decimal
+    base_asset: str
+
+    def summary(self) -> str:
+        return (f"{fmt_decimal(self.pct)}% USDT -> {self.usdt_to_spend:.2f} USDT "
+                f"-> {fmt_decimal(self.qty)} {self.base_asset or 'BASE'}")
+
+
+class PercentSizer:
+    """
+    Holds the inputs and the last SizeQuote. Thread-safe; listeners get the
+    new quote when usdt_to_spend or qty change, and None on every input
+    change that still leaves it empty (see missing()).
+    """
+
+    def __init__(self, filters: Callable[[str], SymbolFilters | None],
+                 log: Callable[[str], None] | None = None):
+        # filters(symbol) must answer from memory, None if unknown
+        self._filters = filters
+        self._log = log or (lambda msg: None)
+        self._lock = threading.Lock()
+        self._symbol = ""
+        self._pct: Decimal | None = None
+        self._usdt: Decimal | None = None
+        self._prices: dict[str, Decimal] = {}
+        self._inputs: tuple | None = None
+        self._quote: SizeQuote | None = None
+        self._listeners: list[Callable[[SizeQuote | None], None]] = []
+        self.recomputes = 0
+
+    def add_listener(self, fn: Callable[[SizeQuote | None], None]) -> None:
+        self._listeners.append(fn)
+
+    # ---- inputs ----
+    def set_target(self, symbol: str, pct: Decimal | None) -> SizeQuote | None:
+        """
+        Symbol and % from the entry fields; None pct clears the quote.
+        """
+        with self._lock:
+            if symbol != self._symbol:
+                self._prices = {s: p for s, p in self._prices.items() if s == symbol}
+            self._symbol, self._pct = symbol, pct
+        return self._update()
+
+    def set_balance(self, usdt: Decimal | None) -> None:
+        """
+        Free USDT; None while no trustworthy balance is known.
+        """
+        with self._lock:
+            if usdt == self._usdt:
+                return
+            self._usdt = usdt
+        self._update()
+
+    def set_price(self, symbol: str, price: Decimal | None) -> None:
+        with self._lock:
+            if symbol != self._symbol or price is None or price <= 0 or self._prices.get(symbol) == price:
+                return
+            self._prices[symbol] = price
+        self._update()
+
+    def filters_changed(self) -> None:
+        """
+        Exchange info was reloaded: the stepSize may differ now.
+        """
+        with self._lock:
+            self._inputs = None
+        self._update()
+
+    # ---- result ----
+    @property
+    def quote(self) -> SizeQuote | None:
+        return self._quote
+
+    def quote_for(self, symbol: str, pct: Decimal) -> SizeQuote | None:
+        """
+        The current quote if it was computed for exactly this symbol and %.
+        """
+        quote = self._quote
+        if quote is None or quote.symbol != symbol or quote.pct != pct or quote.qty <= 0:
+            return None
+        return quote
+
+    def missing(self) -> str:
+        """
+        Which input keeps the quote empty ("" if none), for a hint text.
+        """
+        with self._lock:
+            if not self._symbol or self._pct is None:
+                return "input"
+            if self._usdt is None:
+                return "balance"
+            if self._symbol not in self._prices:
+                return "price"
+        return "" if self._filters(self._symbol) is not None else "symbol info"
+
+    def _update(self) -> SizeQuote | None:
+        with self._lock:
+            symbol, pct, usdt = self._symbol, self._pct, self._usdt
+            price = self._prices.get(symbol)
+            inputs = (symbol, pct, usdt, price)
+            if inputs == self._inputs:
+                return self._quote
+            quote = None
+            f = self._filters(symbol) if symbol and pct is not None else None
+            if f is not None and usdt is not None and usdt > 0 and price is not None:
+                usdt_to_spend, qty = percent_qty(usdt, pct, price, f.step_size)
+                quote = SizeQuote(symbol, pct, usdt, price, usdt_to_spend, qty, f.base_asset)
+                self.recomputes += 1
+            # a missing filter may show up later: keep the inputs unmatched then
+            self._inputs = inputs if f is not None else None
+            old, self._quote = self._quote, quote
+        if quote is None or _changed(old, quote):
+            for fn in self._listeners:
+                try:
+                    fn(quote)
+                except Exception as e:
+                    self._log(f"[ERROR] sizing listener: {e}")
+        return quote
+
+
+def _changed(old: SizeQuote | None, new: SizeQuote | None) -> bool:
+    if old is None or new is None:
+        return old is not new
+    return (old.symbol, old.pct, old.usdt_to_spend, old.qty) != (new.symbol, new.pct, new.usdt_to_spend, new.qty)
@@ -0,0 +1,77 @@
+"""
+SL trigger / limit defaults for the GUI fields. The parameter sweep
+(python -m autosl sweep ... --save) writes one suggestion for all symbols
+plus one per swept symbol to ~/.binance_auto_sl/sl_defaults.json; without
+that file the built-in 0.5 % / 0.6 % apply (limit = trigger + 0.1).
+"""
+import json
+import os
+import time
+from decimal import Decimal, InvalidOperation
+from typing import Callable
+
+from .config import app_path
+
+DEFAULT_TRIGGER = Decimal("0.5")
+DEFAULT_LIMIT_GAP = Decimal("0.1")  # limit % = trigger % + gap
+
+
+class SlDefaults:
+    def __init__(self, path: str | None = None, log: Callable[[str], None] | None = None):
+        self.path = path or app_path("sl_defaults.json")
+        self._log = log or (lambda msg: None)
+        self.default = (DEFAULT_TRIGGER, DEFAULT_TRIGGER + DEFAULT_LIMIT_GAP)
+        self._symbols: dict[str, tuple[Decimal, Decimal]] = {}
+        self.created: float | None = None
+
+    def load(self) -> bool:
+        """
+        Read the sweep suggestions; False (built-in defaults) if there are none.
+        """
+        try:
+            with open(self.path, "r", encoding="utf-8") as fh:
+                data = json.load(fh)
+            default = _pair(data["default"])
+            symbols = {s: _pair(d) for s, d in data.get("symbols", {}).items()}
+        except (OSError, ValueError, KeyError, TypeError, InvalidOperation):
+            return False
+        self.default, self._symbols = default, symbols
+        self.created = data.get("created")
+        return True
+
+    def save(self, default: dict, symbols: dict[str, dict], params: dict) -> None:
+        """
+        default / symbols entries: {"trigger": "0.8", "limit": "1.05", ...stats}.
+        """
+        payload = {"created": time.time(), "params": params, "default": default, "symbols": symbols}
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as fh:
+                json.dump(payload, fh, indent=1)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            self._log(f"[ERROR] Cannot write SL defaults: {e}")
+            return
+        self.default = _pair(default)
+        self._symbols = {s: _pair(d) for s, d in symbols.items()}
+        self.created = payload["created"]
+
+    def get(self, symbol: str = "") -> tuple[Decimal, Decimal]:
+        """
+        (trigger %, limit %) for this symbol, else the all-symbol suggestion.
+        """
+        return self._symbols.get(symbol, self.default)
+
+    def limit_for(self, trigger: Decimal, symbol: str = "") -> Decimal:
+        """
+        Limit % for a typed trigger %: same gap below the trigger as suggested.
+        """
+        trig, lim = self.get(symbol)
+        return trigger + (lim - trig)
+
+
+def _pair(d: dict) -> tuple[Decimal, Decimal]:
+    trig, lim = Decimal(str(d["trigger"])), Decimal(str(d["limit"]))
+    if not (0 < trig < 100 and trig <= lim < 100):
+        raise ValueError(f"bad SL defaults: {d}")
+    return trig, lim
@@ -0,0 +1,78 @@
+"""
+Startup timing: milestones (imports, client, symbols, first paint, first
+data) measured from the top of the entry script and reported once as a
+single [PERF] line, plus a JSONL record to compare releases / builds.
+"""
+import json
+import sys
+import threading
+import time
+from typing import Callable
+
+from .config import app_path
+
+
+class StartupTimer:
+    def __init__(self, t0: float | None = None, expect: tuple[str, ...] = (),
+                 on_report: Callable[[str], None] | None = None,
+                 history_file: str | None = "startup_times.jsonl"):
+        self.t0 = time.perf_counter() if t0 is None else t0
+        self.expect = set(expect)
+        self._on_report = on_report or (lambda line: None)
+        self._history_file = history_file
+        self._marks: dict[str, float] = {}
+        self._notes: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.reported = False
+
+    def mark(self, name: str, note: str = "") -> None:
+        """
+        Record a milestone (first call per name wins); any thread.
+        """
+        with self._lock:
+            if name in self._marks or self.reported:
+                return
+            self._marks[name] = (time.perf_counter() - self.t0) * 1000
+            if note:
+                self._notes[name] = note
+            done = self.expect <= set(self._marks)
+        if done:
+            self.finish()
+
+    def elapsed_ms(self, name: str) -> float | None:
+        return self._marks.get(name)
+
+    def report_line(self) -> str:
+        with self._lock:
+            marks = sorted(self._marks.items(), key=lambda kv: kv[1])
+            missing = sorted(self.expect - set(self._marks))
+            notes = dict(self._notes)
+        parts = [f"{name} {ms:.0f} ms" + (f" ({notes[name]})" if name in notes else "")
+                 for name, ms in marks]
+        parts += [f"{name} -" for name in missing]
+        return "[PERF] startup: " + ", ".join(parts)
+
+    def finish(self) -> None:
+        """
+        Report now (called when all expected milestones are in, or by a
+        timeout with the missing ones shown as "-").
+        """
+        with self._lock:
+            if self.reported:
+                return
+            self.reported = True
+        self._on_report(self.report_line())
+        if self._history_file:
+            self._save()
+
+    def _save(self) -> None:
+        record = {
+            "ts": time.time(),
+            "frozen": bool(getattr(sys, "frozen", False)),  # PyInstaller build
+            "marks_ms": {k: round(v, 1) for k, v in self._marks.items()},
+        }
+        try:
+            with open(app_path(self._history_file), "a", encoding="utf-8") as fh:
+                fh.write(json.dumps(record) + "\n")
+        except OSError:
+            pass
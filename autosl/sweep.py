@@ -0,0 +1,399 @@
+"""
+SL parameter sweep: replay historical klines / trades and evaluate a whole
+grid of (trigger %, limit %) pairs with NumPy.
+
+Model, per entry bar (its close is the basis, like +SL right after a fill):
+the SL fires on the first of the next `horizon` bars whose low reaches the
+stop. The order sells at the stop, or at the bar's open if the bar opened
+below it (a gap). If that price is already below the limit, the order rests
+and fills at the limit only if a high within `fill_window` bars comes back
+to it; otherwise it is a fill miss. Per pair this gives the stop-out rate,
+the fill-miss rate (share of triggered stops), the slippage of filled stops
+below the stop price and the loss of missed stops at the end of the window.
+Gaps inside one bar are invisible, so finer bars (trades resampled to 1 s)
+give more realistic miss rates than 1m klines.
+
+Input: Binance public data files (CSV, or Parquet with pyarrow), named
+SYMBOL-1m-2024-01.csv (klines), SYMBOL-aggTrades-2024-01-01.csv or
+SYMBOL-trades-... Trades are resampled to `bar_ms` bars. Every file is
+converted once to a .npy cache in ~/.binance_auto_sl/sweep_cache and then
+memory-mapped; entries are evaluated in chunks, so memory stays bounded for
+long histories. Files of one symbol are evaluated one after the other
+(windows do not span files); symbols run in separate processes.
+
+numpy is only needed here, not by the GUI.
+"""
+import csv
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from typing import Callable
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .config import app_path
+
+# bar columns: open time (ms), open, high, low, close
+OPEN, HIGH, LOW, CLOSE = 1, 2, 3, 4
+# (time, price) columns of the public trade files
+TRADE_COLUMNS = {"aggTrades": (5, 1), "trades": (4, 1)}
+CHUNK_ELEMENTS = 1 << 21  # entries x horizon evaluated per step (16 MB of float64)
+
+
+@dataclass(frozen=True)
+class SweepParams:
+    triggers: tuple[float, ...]  # trigger % below the basis, ascending
+    gaps: tuple[float, ...]      # limit % - trigger %, ascending
+    horizon: int = 240           # bars an entry is held (stop-out window)
+    fill_window: int = 5         # bars a resting limit may take to fill
+    stride: int = 1              # every n-th bar is an entry
+    bar_ms: int = 1000           # bar size for trade files
+
+    def to_json(self) -> dict:
+        return {"triggers": [fmt_pct(t) for t in self.triggers], "gaps": [fmt_pct(g) for g in self.gaps],
+                "horizon": self.horizon, "fill_window": self.fill_window,
+                "stride": self.stride, "bar_ms": self.bar_ms}
+
+
+@dataclass
+class SweepStats:
+    """
+    Counters for one symbol (or pooled); per trigger [t] or per pair [t, gap].
+    """
+    symbol: str
+    triggers: np.ndarray
+    gaps: np.ndarray
+    entries: int = 0
+    bars: int = 0
+    stopped: np.ndarray = field(default=None)
+    filled: np.ndarray = field(default=None)
+    slip_sum: np.ndarray = field(default=None)
+    slip_max: np.ndarray = field(default=None)
+    miss_loss_sum: np.ndarray = field(default=None)
+
+    def __post_init__(self):
+        shape = (len(self.triggers), len(self.gaps))
+        for name, size in (("stopped", shape[:1]), ("filled", shape), ("slip_sum", shape),
+                           ("slip_max", shape), ("miss_loss_sum", shape)):
+            if getattr(self, name) is None:
+                setattr(self, name, np.zeros(size, dtype=np.int64 if name in ("stopped", "filled")
+                                             else np.float64))
+
+    def merge(self, other: "SweepStats") -> None:
+        self.entries += other.entries
+        self.bars += other.bars
+        self.stopped += other.stopped
+        self.filled += other.filled
+        self.slip_sum += other.slip_sum
+        np.maximum(self.slip_max, other.slip_max, out=self.slip_max)
+        self.miss_loss_sum += other.miss_loss_sum
+
+    @property
+    def missed(self) -> np.ndarray:
+        return self.stopped[:, None] - self.filled
+
+    @property
+    def stopout_rate(self) -> np.ndarray:
+        return self.stopped / max(self.entries, 1)
+
+    @property
+    def miss_rate(self) -> np.ndarray:
+        return self.missed / np.maximum(self.stopped, 1)[:, None]
+
+    @property
+    def mean_slippage(self) -> np.ndarray:
+        """
+        % below the stop price, filled stops only.
+        """
+        return self.slip_sum / np.maximum(self.filled, 1)
+
+    @property
+    def mean_miss_loss(self) -> np.ndarray:
+        """
+        % below the basis at the end of the fill window, missed stops only.
+        """
+        return self.miss_loss_sum / np.maximum(self.missed, 1)
+
+    def suggest(self, max_stopout: float, max_miss: float) -> "Suggestion | None":
+        """
+        Tightest trigger stopped out in at most `max_stopout` of the entries,
+        then the smallest limit gap missing at most `max_miss` of its stops.
+        Falls back to the widest values (within_targets False).
+        """
+        if not self.entries:
+            return None
+        ok_t = np.flatnonzero(self.stopout_rate <= max_stopout)
+        ti = int(ok_t[0]) if len(ok_t) else len(self.triggers) - 1
+        ok_g = np.flatnonzero(self.miss_rate[ti] <= max_miss)
+        gi = int(ok_g[0]) if len(ok_g) else len(self.gaps) - 1
+        trigger = float(self.triggers[ti])
+        return Suggestion(
+            symbol=self.symbol, trigger=trigger, limit=trigger + float(self.gaps[gi]),
+            stopout_rate=float(self.stopout_rate[ti]), miss_rate=float(self.miss_rate[ti, gi]),
+            slippage=float(self.mean_slippage[ti, gi]), entries=self.entries,
+            within_targets=bool(len(ok_t) and len(ok_g)),
+        )
+
+
+@dataclass
+class Suggestion:
+    symbol: str
+    trigger: float
+    limit: float
+    stopout_rate: float
+    miss_rate: float
+    slippage: float
+    entries: int
+    within_targets: bool
+
+    def to_json(self) -> dict:
+        return {"trigger": fmt_pct(self.trigger), "limit": fmt_pct(self.limit),
+                "stopout_rate": round(self.stopout_rate, 4), "miss_rate": round(self.miss_rate, 4),
+                "slippage_pct": round(self.slippage, 4), "entries": self.entries,
+                "within_targets": self.within_targets}
+
+
+def fmt_pct(x: float) -> str:
+    return f"{x:.4f}".rstrip("0").rstrip(".")
+
+
+def parse_grid(text: str) -> tuple[float, ...]:
+    """
+    "0.2:3:0.1" (start:stop:step, inclusive) or "0.5,1,1.5" -> sorted values.
+    """
+    try:
+        if ":" in text:
+            start, stop, step = (Decimal(x) for x in text.split(":"))
+            if step <= 0:
+                raise ValueError(f"grid step must be > 0: {text!r}")
+            values, v = [], start
+            while v <= stop:
+                values.append(v)
+                v += step
+        else:
+            values = [Decimal(x) for x in text.split(",") if x.strip()]
+    except (InvalidOperation, TypeError):
+        raise ValueError(f"invalid grid: {text!r}") from None
+    if not values:
+        raise ValueError(f"empty grid: {text!r}")
+    return tuple(sorted({float(v) for v in values}))
+
+
+# ---- data ----
+def symbol_of(path: str) -> str:
+    """
+    "BNBUSDT-1m-2024-01.csv" -> "BNBUSDT" (Binance public data naming).
+    """
+    return os.path.basename(path).split("-")[0].split(".")[0].upper()
+
+
+def data_kind(path: str) -> str:
+    name = os.path.basename(path)
+    for kind in TRADE_COLUMNS:
+        if f"-{kind}-" in name:
+            return kind
+    return "klines"
+
+
+def _read_columns(path: str, columns: tuple[int, ...]) -> list[np.ndarray]:
+    if path.endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Reading Parquet files needs pyarrow (pip install pyarrow).") from None
+        table = pq.read_table(path, memory_map=True)
+        return [table.column(i).to_numpy().astype(np.float64) for i in columns]
+    with open(path, "r", encoding="utf-8") as fh:
+        header = 0 if fh.readline()[:1].isdigit() else 1  # newer files have a header row
+    data = np.loadtxt(path, delimiter=",", usecols=columns, skiprows=header,
+                      dtype=np.float64, ndmin=2)
+    return [data[:, i] for i in range(len(columns))]
+
+
+def _to_ms(ts: np.ndarray) -> np.ndarray:
+    # public spot data is in microseconds since 2025
+    return ts // 1000 if len(ts) and ts[0] > 1e14 else ts
+
+
+def trades_to_bars(ts_ms: np.ndarray, price: np.ndarray, bar_ms: int) -> np.ndarray:
+    """
+    OHLC bars from time-ordered trades; bars without trades are skipped.
+    """
+    if not len(price):
+        return np.empty((0, 5))
+    bucket = ts_ms // bar_ms
+    cut = np.flatnonzero(np.diff(bucket)) + 1
+    starts = np.concatenate(([0], cut))
+    ends = np.concatenate((cut, [len(price)])) - 1
+    return np.column_stack((bucket[starts] * bar_ms, price[starts], np.maximum.reduceat(price, starts),
+                            np.minimum.reduceat(price, starts), price[ends]))
+
+
+def load_bars(path: str, bar_ms: int = 1000) -> np.ndarray:
+    """
+    (n, 5) bars, memory-mapped from the .npy cache (built on first use).
+    """
+    st = os.stat(path)
+    kind = data_kind(path)
+    key = f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}|{kind}|{bar_ms if kind != 'klines' else ''}"
+    cache_dir = app_path("sweep_cache")
+    os.makedirs(cache_dir, exist_ok=True)
+    cache = os.path.join(cache_dir, f"{symbol_of(path)}-{hashlib.sha1(key.encode()).hexdigest()[:16]}.npy")
+    if not os.path.exists(cache):
+        if kind == "klines":
+            cols = _read_columns(path, (0, 1, 2, 3, 4))
+            cols[0] = _to_ms(cols[0])
+            bars = np.column_stack(cols)
+        else:
+            ts, price = _read_columns(path, TRADE_COLUMNS[kind])
+            bars = trades_to_bars(_to_ms(ts), price, bar_ms)
+        tmp = f"{cache}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as fh:
+            np.save(fh, np.ascontiguousarray(bars, dtype=np.float64))
+        os.replace(tmp, cache)
+    return np.load(cache, mmap_mode="r")
+
+
+# ---- evaluation ----
+def sweep_bars(bars: np.ndarray, params: SweepParams, stats: SweepStats) -> None:
+    """
+    Add the outcome of every entry in `bars` to `stats`.
+    """
+    horizon, window = params.horizon, params.fill_window
+    n = len(bars)
+    stats.bars += n
+    entry_end = n - horizon - window  # entry i needs bars up to i + horizon + window
+    if entry_end <= 0:
+        return
+    triggers = np.asarray(params.triggers)
+    stop_rel = 1 - triggers / 100                                       # [t]
+    limit_rel = 1 - (triggers[:, None] + np.asarray(params.gaps)) / 100  # [t, gap]
+    levels = stop_rel[::-1]  # ascending
+    n_levels = len(levels)
+    span = max(1, CHUNK_ELEMENTS // horizon) * params.stride
+
+    for start in range(0, entry_end, span):
+        end = min(start + span, entry_end)
+        seg = np.asarray(bars[start:end + horizon + window])  # only this part is read from disk
+        entries = np.arange(0, end - start, params.stride)
+        basis = seg[entries, CLOSE]
+        # lowest low so far after each entry, relative to the basis: [entry, bar]
+        low = sliding_window_view(seg[1:, LOW], horizon)[entries]
+        low /= basis[:, None]
+        np.minimum.accumulate(low, axis=1, out=low)
+        # bars before each stop is reached, all triggers in one pass: bucket the
+        # running lows by how many stop levels lie below them (exact compares),
+        # then count per entry with one bincount
+        rows = len(entries)
+        below = np.searchsorted(levels, low, side="left")
+        below += np.arange(rows)[:, None] * (n_levels + 1)
+        hist = np.bincount(below.ravel(), minlength=rows * (n_levels + 1)).reshape(rows, n_levels + 1)
+        before = hist[:, ::-1].cumsum(axis=1)[:, ::-1][:, n_levels - np.arange(n_levels)]  # [entry, t]
+        high_ahead = sliding_window_view(seg[:, HIGH], window + 1).max(axis=1)  # max high[j .. j+window]
+        stats.entries += rows
+
+        for ti, stop in enumerate(stop_rel):
+            hit = np.flatnonzero(before[:, ti] < horizon)
+            if not len(hit):
+                break  # wider triggers are not reached either
+            j = entries[hit] + 1 + before[hit, ti]  # trigger bar
+            b = basis[hit]
+            m = len(hit)
+            sell = np.minimum(seg[j, OPEN] / b, stop)  # stop, or the gap open
+            # best price until the fill window ends (the trigger bar's high is >= its open)
+            back = np.maximum(high_ahead[j] / b, sell)
+            order = np.argsort(back)
+            back = back[order]
+            loss_cum = np.concatenate(([0.0], np.cumsum(1 - seg[j + window, CLOSE][order] / b[order])))
+            sell.sort()
+            sell_cum = np.concatenate(([0.0], np.cumsum(sell)))
+            # every gap at once: counts and sums over the sorted outcomes
+            limit = limit_rel[ti]
+            i_sell = np.searchsorted(sell, limit, side="left")  # sold below the limit -> resting
+            i_back = np.searchsorted(back, limit, side="left")  # never back at the limit -> missed
+            at_once, filled = m - i_sell, m - i_back
+            slip_sum = at_once * stop - (sell_cum[m] - sell_cum[i_sell]) + (filled - at_once) * (stop - limit)
+            worst = np.where(filled > at_once, stop - limit,
+                             np.where(at_once > 0, stop - sell[np.minimum(i_sell, m - 1)], 0.0))
+            stats.stopped[ti] += m
+            stats.filled[ti] += filled
+            stats.slip_sum[ti] += np.maximum(slip_sum, 0.0) / stop * 100  # no rounding noise below 0
+            np.maximum(stats.slip_max[ti], worst / stop * 100, out=stats.slip_max[ti])
+            stats.miss_loss_sum[ti] += loss_cum[i_back] * 100
+
+
+def sweep_symbol(symbol: str, paths: list[str], params: SweepParams) -> SweepStats:
+    stats = SweepStats(symbol, np.asarray(params.triggers), np.asarray(params.gaps))
+    for path in paths:
+        sweep_bars(load_bars(path, params.bar_ms), params, stats)
+    return stats
+
+
+def _sweep_job(job: tuple) -> SweepStats:
+    return sweep_symbol(*job)
+
+
+def run_sweep(paths: list[str], params: SweepParams, workers: int | None = None,
+              log: Callable[[str], None] | None = None) -> list[SweepStats]:
+    """
+    One result per symbol (file name prefix), symbols in parallel processes.
+    """
+    log = log or (lambda msg: None)
+    by_symbol: dict[str, list[str]] = {}
+    for path in sorted(paths):
+        by_symbol.setdefault(symbol_of(path), []).append(path)
+    jobs = [(symbol, files, params) for symbol, files in sorted(by_symbol.items())]
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers <= 1:
+        results = map(_sweep_job, jobs)
+        return [_logged(stats, log) for stats in results]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return [_logged(stats, log) for stats in pool.map(_sweep_job, jobs)]
+
+
+def _logged(stats: SweepStats, log: Callable[[str], None]) -> SweepStats:
+    log(f"[INFO] {stats.symbol}: {stats.bars} bars, {stats.entries} entries")
+    return stats
+
+
+def pooled(results: list[SweepStats]) -> SweepStats:
+    total = SweepStats("ALL", results[0].triggers, results[0].gaps)
+    for stats in results:
+        total.merge(stats)
+    return total
+
+
+def report_lines(stats: SweepStats, max_miss: float) -> list[str]:
+    """
+    Per trigger: stop-out rate and the smallest gap within `max_miss`.
+    """
+    lines = [f"{'trigger %':>9} {'stop-out':>8} {'limit %':>8} {'miss':>7} {'slip %':>7} "
+             f"{'slip max':>8} {'miss loss %':>11}"]
+    for ti, trigger in enumerate(stats.triggers):
+        ok = np.flatnonzero(stats.miss_rate[ti] <= max_miss)
+        gi = int(ok[0]) if len(ok) else len(stats.gaps) - 1
+        lines.append(f"{fmt_pct(trigger):>9} {stats.stopout_rate[ti]:>8.1%} "
+                     f"{fmt_pct(trigger + stats.gaps[gi]):>8} {stats.miss_rate[ti, gi]:>7.2%} "
+                     f"{stats.mean_slippage[ti, gi]:>7.3f} {stats.slip_max[ti, gi]:>8.3f} "
+                     f"{stats.mean_miss_loss[ti, gi]:>11.3f}")
+    return lines
+
+
+def write_grid_csv(path: str, results: list[SweepStats]) -> None:
+    """
+    Every (symbol, trigger, limit) row, for plotting / spreadsheets.
+    """
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        w = csv.writer(fh)
+        w.writerow(["symbol", "trigger_pct", "limit_pct", "entries", "stopout_rate", "stopped",
+                    "miss_rate", "mean_slippage_pct", "max_slippage_pct", "mean_miss_loss_pct"])
+        for stats in results:
+            for ti, trigger in enumerate(stats.triggers):
+                for gi, gap in enumerate(stats.gaps):
+                    w.writerow([stats.symbol, fmt_pct(trigger), fmt_pct(trigger + gap), stats.entries,
+                                f"{stats.stopout_rate[ti]:.6f}", int(stats.stopped[ti]),
+                                f"{stats.miss_rate[ti, gi]:.6f}", f"{stats.mean_slippage[ti, gi]:.6f}",
+                                f"{stats.slip_max[ti, gi]:.6f}", f"{stats.mean_miss_loss[ti, gi]:.6f}"])
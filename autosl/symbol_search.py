@@ -0,0 +1,76 @@
+"""
+Prebuilt symbol search: sorted array for prefix lookups (bisect) plus a
+trigram index for substring lookups, with ranked and capped results.
+"""
+from bisect import bisect_left
+from typing import Iterable
+
+DEFAULT_LIMIT = 50
+
+# rank buckets
+_EXACT, _BASE, _PREFIX, _SUBSTRING = range(4)
+
+
+class SymbolIndex:
+    def __init__(self, symbols: Iterable[str], bases: dict[str, str] | None = None,
+                 preferred_quotes: tuple[str, ...] = ("USDT", "USDC", "FDUSD", "BTC")):
+        self._symbols = sorted(set(symbols))
+        self._bases = bases or {}
+        self._quote_rank = {q: i for i, q in enumerate(preferred_quotes)}
+        self._base_to_ids: dict[str, list[int]] = {}
+        self._grams: dict[str, set[int]] = {}
+
+        for i, sym in enumerate(self._symbols):
+            base = self._bases.get(sym)
+            if base:
+                self._base_to_ids.setdefault(base, []).append(i)
+            for j in range(len(sym) - 2):
+                self._grams.setdefault(sym[j:j + 3], set()).add(i)
+
+    def __len__(self) -> int:
+        return len(self._symbols)
+
+    def _prefix_ids(self, text: str) -> range:
+        lo = bisect_left(self._symbols, text)
+        hi = bisect_left(self._symbols, text + "￿", lo)
+        return range(lo, hi)
+
+    def _substring_ids(self, text: str) -> set[int]:
+        grams = [text[j:j + 3] for j in range(len(text) - 2)]
+        # intersect starting with the rarest trigram
+        postings = sorted((self._grams.get(g, set()) for g in grams), key=len)
+        if not postings or not postings[0]:
+            return set()
+        ids = set(postings[0])
+        for p in postings[1:]:
+            ids &= p
+            if not ids:
+                break
+        # trigrams do not guarantee the order -> verify
+        return {i for i in ids if text in self._symbols[i]}
+
+    def _sort_key(self, rank: int, sym: str):
+        base = self._bases.get(sym, "")
+        quote = sym[len(base):] if base and sym.startswith(base) else ""
+        return rank, self._quote_rank.get(quote, len(self._quote_rank)), len(sym), sym
+
+    def search(self, text: str, limit: int = DEFAULT_LIMIT) -> list[str]:
+        """
+        Ranked matches: exact symbol, exact base asset, prefix, substring.
+        Substring matching starts at 3 characters.
+        """
+        text = text.strip().upper()
+        if not text:
+            return self._symbols[:limit]
+
+        ranked: dict[int, int] = {}
+        for i in self._prefix_ids(text):
+            ranked[i] = _EXACT if self._symbols[i] == text else _PREFIX
+        for i in self._base_to_ids.get(text, ()):
+            ranked[i] = min(ranked.get(i, _BASE), _BASE)
+        if len(text) >= 3:
+            for i in self._substring_ids(text):
+                ranked.setdefault(i, _SUBSTRING)
+
+        hits = sorted((self._sort_key(rank, self._symbols[i]) for i, rank in ranked.items()))
+        return [key[-1] for key in hits[:limit]]
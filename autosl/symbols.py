@@ -0,0 +1,248 @@
+"""
+Exchange-info cache: one bulk `get_exchange_info` call, indexed by symbol,
+with pre-parsed Decimal filters and a warm copy on disk.
+"""
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Callable
+
+from .config import app_path
+
+# refresh exchange info after this many seconds
+DEFAULT_TTL = 6 * 60 * 60
+# Binance error codes that mean "your price/qty does not match the filters"
+FILTER_ERROR_CODES = {-1013, -1111}
+# do not hammer exchangeInfo if several orders get rejected in a row
+MIN_REFRESH_INTERVAL = 30
+
+
+@dataclass(frozen=True)
+class SymbolFilters:
+    symbol: str
+    base_asset: str
+    quote_asset: str
+    status: str
+    tick_size: Decimal
+    step_size: Decimal
+    min_notional: Decimal
+
+    @classmethod
+    def from_info(cls, info: dict) -> "SymbolFilters":
+        tick_size = Decimal("0.01")
+        step_size = Decimal("0.00000001")
+        min_notional = Decimal("0")
+
+        for f in info.get("filters", []):
+            ftype = f.get("filterType")
+            if ftype == "PRICE_FILTER":
+                tick_size = Decimal(f["tickSize"])
+            elif ftype == "LOT_SIZE":
+                step_size = Decimal(f["stepSize"])
+            elif ftype in ("MIN_NOTIONAL", "NOTIONAL"):
+                min_notional = Decimal(f.get("minNotional", "0"))
+
+        return cls(
+            symbol=info["symbol"],
+            base_asset=info.get("baseAsset", ""),
+            quote_asset=info.get("quoteAsset", ""),
+            status=info.get("status", ""),
+            tick_size=tick_size,
+            step_size=step_size,
+            min_notional=min_notional,
+        )
+
+
+class SymbolInfoCache:
+    """
+    Symbol metadata store. Order flows read from memory only; the exchange is
+    asked again when the TTL runs out or an order is rejected by a filter.
+    """
+
+    def __init__(self, client, path: str | None = None, ttl: float = DEFAULT_TTL,
+                 log: Callable[[str], None] | None = None):
+        self.client = client
+        self.path = path or app_path("exchange_info.json")
+        self.ttl = ttl
+        self._log = log or (lambda msg: None)
+        self._lock = threading.RLock()
+        self._infos: dict[str, dict] = {}
+        self._filters: dict[str, SymbolFilters] = {}
+        self._rate_limits: list[dict] = []
+        self._fetched_at = 0.0
+        self._last_refresh_try = 0.0
+        self._refresh_thread: threading.Thread | None = None
+        self._listeners: list[Callable[[], None]] = []
+
+    # ---- loading ----
+    def load(self) -> bool:
+        """
+        Load the last saved exchange info from disk. Returns True on success.
+        """
+        try:
+            with open(self.path, "r", encoding="utf-8") as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            return False
+
+        self._index(data.get("symbols", []), data.get("rateLimits", []),
+                    data.get("fetched_at", 0.0))
+        return bool(self._infos)
+
+    def refresh(self) -> None:
+        """
+        Fetch the full exchange info (one request) and replace the index.
+        """
+        self._last_refresh_try = time.time()
+        data = self.client.get_exchange_info()
+        fetched_at = time.time()
+        self._index(data.get("symbols", []), data.get("rateLimits", []), fetched_at)
+        self._save(data, fetched_at)
+        self._log(f"[INFO] Exchange info loaded: {len(self._infos)} symbols.")
+
+    def refresh_async(self) -> None:
+        """
+        Refresh in a background thread (at most one running at a time).
+        """
+        with self._lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            if time.time() - self._last_refresh_try < MIN_REFRESH_INTERVAL:
+                return
+            self._last_refresh_try = time.time()
+            self._refresh_thread = threading.Thread(
+                target=self._refresh_quietly, name="exchange-info-refresh", daemon=True
+            )
+            self._refresh_thread.start()
+
+    def _refresh_quietly(self) -> None:
+        try:
+            self.refresh()
+        except Exception as e:
+            self._log(f"[ERROR] get_exchange_info: {e}")
+
+    def ensure_loaded(self, block: bool = True) -> bool:
+        """
+        Make sure there is data to serve. Stale data is served while a
+        background refresh runs; only a cold start blocks on the network,
+        and only with block=True (else the data arrives via the listeners).
+        Returns True if data is available now.
+        """
+        if not self._infos:
+            if not self.load():
+                if not block:
+                    self.refresh_async()
+                    return False
+                self.refresh()
+                return True
+        if self.is_stale():
+            self.refresh_async()
+        return True
+
+    def is_stale(self) -> bool:
+        return time.time() - self._fetched_at > self.ttl
+
+    def mark_stale(self) -> None:
+        self._fetched_at = 0.0
+
+    def note_order_error(self, exc: Exception) -> bool:
+        """
+        Call with an order exception. Filter-related rejections trigger a
+        refresh so the next attempt uses current tick/step sizes.
+        """
+        if getattr(exc, "code", None) not in FILTER_ERROR_CODES:
+            return False
+        self._log("[INFO] Order rejected by a filter -> refreshing exchange info.")
+        self.mark_stale()
+        self.refresh_async()
+        return True
+
+    def _index(self, symbols: list[dict], rate_limits: list[dict], fetched_at: float) -> None:
+        infos = {}
+        filters = {}
+        for info in symbols:
+            sym = info.get("symbol")
+            if not sym:
+                continue
+            infos[sym] = info
+            filters[sym] = SymbolFilters.from_info(info)
+
+        with self._lock:
+            self._infos = infos
+            self._filters = filters
+            self._rate_limits = list(rate_limits)
+            self._fetched_at = fetched_at
+            listeners = list(self._listeners)
+
+        for fn in listeners:
+            try:
+                fn()
+            except Exception as e:
+                self._log(f"[ERROR] exchange info listener: {e}")
+
+    def _save(self, data: dict, fetched_at: float) -> None:
+        payload = {
+            "fetched_at": fetched_at,
+            "rateLimits": data.get("rateLimits", []),
+            "symbols": data.get("symbols", []),
+        }
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as fh:
+                json.dump(payload, fh, separators=(",", ":"))
+            os.replace(tmp, self.path)
+        except OSError as e:
+            self._log(f"[ERROR] Cannot write exchange info cache: {e}")
+
+    # ---- lookups ----
+    def info(self, symbol: str) -> dict:
+        self.ensure_loaded()
+        info = self._infos.get(symbol)
+        if info is None:
+            # maybe listed after our snapshot: ask once for this symbol only
+            info = self.client.get_symbol_info(symbol)
+            if not info:
+                raise ValueError(f"Symbol not found: {symbol}")
+            with self._lock:
+                self._infos[symbol] = info
+                self._filters[symbol] = SymbolFilters.from_info(info)
+        return info
+
+    def filters(self, symbol: str) -> SymbolFilters:
+        f = self._filters.get(symbol)
+        if f is None:
+            self.info(symbol)
+            f = self._filters[symbol]
+        elif self.is_stale():
+            self.refresh_async()
+        return f
+
+    def symbols(self, quote: str | None = None, trading_only: bool = True) -> list[str]:
+        """
+        Sorted symbol names, optionally restricted to one quote asset.
+        Never waits for the network: empty until the first load finished.
+        """
+        self.ensure_loaded(block=False)
+        return sorted(
+            f.symbol
+            for f in self._filters.values()
+            if (quote is None or f.quote_asset == quote)
+            and (not trading_only or f.status == "TRADING")
+        )
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._filters
+
+    @property
+    def rate_limits(self) -> list[dict]:
+        return list(self._rate_limits)
+
+    def add_listener(self, fn: Callable[[], None]) -> None:
+        """
+        fn() is called after every (re)index, e.g. to rebuild search indexes.
+        """
+        with self._lock:
+            self._listeners.append(fn)
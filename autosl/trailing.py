@@ -0,0 +1,471 @@
+"""
+Client-side trailing stop: follows the live price per protected position
+and ratchets its STOP_LOSS_LIMIT up through the cancel-replace endpoint
+(one request, the old order is only gone if the new one is accepted).
+
+Order churn is bounded three ways: hysteresis (the stop must move by a
+minimum distance), a minimum re-price interval per position and a global
+re-price budget that keeps well inside the ORDERS rate limits.
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from decimal import Decimal
+from typing import Callable
+
+from . import fixedpoint as fx
+from .config import app_path
+from .scheduler import TokenBucket
+from .symbols import SymbolFilters, SymbolInfoCache
+
+MIN_REPRICE_INTERVAL = 5.0      # seconds between two re-prices of one position
+HYSTERESIS_TICKS = 2            # move the stop by at least this many ticks ...
+HYSTERESIS_PCT = Decimal("0.1")  # ... and at least this % of the stop price
+# global budget: 60 re-prices per minute (~86k/day, under half the daily ORDERS limit)
+REPRICE_BUDGET = 60
+REPRICE_BUDGET_PERIOD = 60.0
+FLUSH_INTERVAL = 0.2
+MAX_WORKERS = 4
+
+# order states after which the position is gone (SL filled / ended);
+# PARTIALLY_FILLED is still open, with the rest of the quantity
+DONE_STATES = {"FILLED", "EXPIRED", "REJECTED"}
+OPEN_STATES = {"NEW", "PARTIALLY_FILLED"}
+
+
+@dataclass
+class TrailingPosition:
+    symbol: str
+    qty: Decimal
+    trigger_pct: Decimal
+    limit_pct: Decimal
+    order_id: int
+    stop_price: Decimal
+    limit_price: Decimal
+    high: Decimal            # highest price seen since protection started
+    last_reprice: float = 0.0
+    in_flight: bool = False
+    last: Decimal | None = None  # last price seen, a new stop must stay below it
+    working: bool = False    # stop triggered / partly filled: never re-priced again
+    dipped: bool = False     # price seen at or below the stop: check the order first
+    # fixed-point (trigger, limit, stop) for target(), keyed on the stop_price object
+    _fixed: tuple | None = field(default=None, repr=False, compare=False)
+
+    def to_json(self) -> dict:
+        d = asdict(self)
+        for k in ("in_flight", "last_reprice", "last", "dipped", "_fixed"):
+            d.pop(k)
+        return {k: str(v) if isinstance(v, Decimal) else v for k, v in d.items()}
+
+    @classmethod
+    def from_json(cls, d: dict) -> "TrailingPosition":
+        return cls(
+            symbol=d["symbol"], qty=Decimal(d["qty"]),
+            trigger_pct=Decimal(d["trigger_pct"]), limit_pct=Decimal(d["limit_pct"]),
+            order_id=int(d["order_id"]), stop_price=Decimal(d["stop_price"]),
+            limit_price=Decimal(d["limit_price"]), high=Decimal(d["high"]),
+            working=bool(d.get("working", False)),
+        )
+
+
+class TrailingStopManager:
+    """
+    Feed prices with on_price(symbol, price) (e.g. a MarketStream price
+    listener) and order updates with on_execution_report (user data stream);
+    re-prices run on a small worker pool, never on the caller.
+    `clock` is injectable so the logic can be driven by a fake exchange;
+    `submit(fn, *args)` replaces the pool (e.g. inline re-prices in a replay).
+    An OpenOrderStore, if given, learns about every replaced order at once;
+    a TradeJournal records each replacement.
+    """
+
+    def __init__(self, client, symbols: SymbolInfoCache,
+                 log: Callable[[str], None] | None = None,
+                 path: str | None = None,
+                 min_interval: float = MIN_REPRICE_INTERVAL,
+                 hysteresis_ticks: int = HYSTERESIS_TICKS,
+                 hysteresis_pct: Decimal = HYSTERESIS_PCT,
+                 budget: int = REPRICE_BUDGET, budget_period: float = REPRICE_BUDGET_PERIOD,
+                 clock: Callable[[], float] = time.monotonic,
+                 submit: Callable[..., object] | None = None, open_orders=None, journal=None):
+        self.client = client
+        self.symbols = symbols
+        self._log = log or (lambda msg: None)
+        self.path = path or app_path("trailing.json")
+        self.min_interval = min_interval
+        self.hysteresis_ticks = hysteresis_ticks
+        self.hysteresis_pct = hysteresis_pct
+        self._hysteresis_fx = fx.from_decimal(hysteresis_pct)
+        self._budget = TokenBucket(budget, budget_period, clock)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._positions: dict[str, TrailingPosition] = {}
+        self._fixed: dict[str, tuple[SymbolFilters, fx.FixedSymbol]] = {}
+        self._pool = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="trailing")
+        self._submit = submit or self._pool.submit
+        self.open_orders = open_orders
+        self.journal = journal
+        self._listeners: list[Callable[[set[str]], None]] = []
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.reprice_count = 0
+
+    # ---- positions ----
+    def add_listener(self, fn: Callable[[set[str]], None]) -> None:
+        """
+        fn(trailed_symbols) when a position is added or removed, e.g. to
+        subscribe its price stream.
+        """
+        self._listeners.append(fn)
+
+    def protect(self, symbol: str, qty: Decimal, trigger_pct: Decimal, limit_pct: Decimal,
+                order_id: int, stop_price: Decimal, limit_price: Decimal,
+                basis: Decimal) -> TrailingPosition:
+        """
+        Start trailing an existing STOP_LOSS_LIMIT order (e.g. the result of
+        TradingEngine.add_sl_for_free / buy_spot_with_sl).
+        """
+        pos = TrailingPosition(symbol, qty, trigger_pct, limit_pct, int(order_id),
+                               stop_price, limit_price, basis, last_reprice=self._clock())
+        with self._lock:
+            self._positions[symbol] = pos
+        self._log(f"[INFO] Trailing {symbol}: stop {stop_price}, -{trigger_pct}% / -{limit_pct}% of high.")
+        self._changed()
+        return pos
+
+    def protect_result(self, result, trigger_pct, limit_pct) -> TrailingPosition:
+        """
+        protect() for an engine OrderResult that carries an SL order.
+        """
+        return self.protect(result.symbol, result.qty, Decimal(str(trigger_pct)),
+                            Decimal(str(limit_pct)), result.sl_order["orderId"],
+                            result.stop_price, result.limit_price, result.basis_price)
+
+    def release(self, symbol: str, sl_open: bool = True) -> None:
+        """
+        Stop trailing; the last stop order stays on the exchange
+        (sl_open=False: there is none left).
+        """
+        with self._lock:
+            pos = self._positions.pop(symbol, None)
+        if pos is not None:
+            if sl_open:
+                self._log(f"[INFO] Trailing {symbol} stopped (SL stays at {pos.stop_price}).")
+            else:
+                self._log(f"[INFO] Trailing {symbol} stopped, no SL order left.")
+            self._changed()
+
+    def positions(self) -> list[TrailingPosition]:
+        with self._lock:
+            return list(self._positions.values())
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._positions
+
+    def _changed(self) -> None:
+        self.save()
+        symbols = set(self._positions)
+        for fn in self._listeners:
+            try:
+                fn(symbols)
+            except Exception as e:
+                self._log(f"[ERROR] trailing listener: {e}")
+
+    # ---- persistence ----
+    def save(self) -> None:
+        with self._lock:
+            data = [p.to_json() for p in self._positions.values()]
+        tmp = self.path + ".tmp"
+        with self._save_lock:
+            try:
+                with open(tmp, "w", encoding="utf-8") as fh:
+                    json.dump(data, fh)
+                os.replace(tmp, self.path)
+            except OSError as e:
+                self._log(f"[ERROR] Cannot write trailing state: {e}")
+
+    def load(self) -> int:
+        """
+        Re-adopt positions from the last run; stale order ids are detected
+        on the first re-price.
+        """
+        try:
+            with open(self.path, "r", encoding="utf-8") as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            return 0
+        with self._lock:
+            for d in data:
+                pos = TrailingPosition.from_json(d)
+                pos.last_reprice = self._clock()
+                self._positions[pos.symbol] = pos
+        if data:
+            self._log(f"[INFO] Trailing {len(data)} position(s) from last session.")
+            self._changed()
+        return len(data)
+
+    # ---- price handling ----
+    def _fixed_symbol(self, symbol: str) -> fx.FixedSymbol:
+        f = self.symbols.filters(symbol)
+        cached = self._fixed.get(symbol)
+        if cached is None or cached[0] is not f:  # rebuilt after an exchangeInfo refresh
+            cached = self._fixed[symbol] = (f, fx.FixedSymbol.from_filters(f))
+        return cached[1]
+
+    def target(self, pos: TrailingPosition) -> tuple[Decimal, Decimal] | None:
+        """
+        (stop, limit) the position should move to, or None if the move is
+        below the hysteresis threshold. Evaluated on every price tick, so the
+        math is integer fixed-point (same results as engine.sl_prices).
+        The stop stays at least one tick below the last price: if the price
+        fell back from the high since, it is derived from the last price
+        instead (a stop at or above the market is rejected, and
+        cancel-replace has already canceled the old one by then).
+        """
+        if pos.last is None or pos.working:
+            return None  # no price seen yet in this session / stop already triggered
+        fs = self._fixed_symbol(pos.symbol)
+        tick = fs.tick
+        cached = pos._fixed
+        if cached is None or cached[2] is not pos.stop_price:
+            cached = pos._fixed = (fx.from_decimal(pos.trigger_pct), fx.from_decimal(pos.limit_pct),
+                                   pos.stop_price, fx.from_decimal(pos.stop_price))
+        trigger, limit_pct, _, (cur, cur_scale) = cached
+        last = fx.from_decimal(pos.last)
+        (stop, scale), limit = fs.sl_prices(fx.from_decimal(pos.high), trigger, limit_pct)
+        if fx.compare((stop + tick.units, scale), last) > 0:
+            (stop, scale), limit = fs.sl_prices(last, trigger, limit_pct)
+            if fx.compare((stop + tick.units, scale), last) > 0:
+                return None
+        pct, pct_scale = self._hysteresis_fx
+        min_pct, _ = fx.round_down(cur * pct, cur_scale + pct_scale + 2, tick)
+        min_move = max(tick.units * self.hysteresis_ticks, min_pct)
+        s = max(scale, cur_scale)  # compare exactly, the stored stop may carry more decimals
+        if fx.rescale(stop - min_move, scale, s) < fx.rescale(cur, cur_scale, s):
+            return None
+        return fx.to_decimal(stop, scale), fx.to_decimal(*limit)
+
+    def on_price(self, symbol: str, price: Decimal | None) -> None:
+        pos = self._positions.get(symbol)
+        if pos is None or price is None:
+            return
+        with self._lock:
+            pos.last = price
+            if price <= pos.stop_price:
+                pos.dipped = True  # the stop may have triggered
+            if price <= pos.high:
+                return
+            pos.high = price
+        self._maybe_reprice(pos)
+
+    def _maybe_reprice(self, pos: TrailingPosition) -> None:
+        now = self._clock()
+        with self._lock:
+            if pos.in_flight or now - pos.last_reprice < self.min_interval:
+                return  # the flush loop picks it up once the interval is over
+            target = self.target(pos)
+            if target is None:
+                return
+            if self._budget.available() < 1:
+                return
+            self._budget.take(1)
+            pos.in_flight = True
+            pos.last_reprice = now
+        self._submit(self._reprice, pos, *target)
+
+    def flush(self) -> None:
+        """
+        Re-price positions whose interval ran out while the price moved,
+        biggest pending move first when the budget is short.
+        """
+        pending = []
+        for pos in self.positions():
+            if pos.in_flight:
+                continue
+            target = self.target(pos)
+            if target is not None:
+                pending.append(((target[0] - pos.stop_price) / pos.stop_price, pos))
+        pending.sort(key=lambda item: item[0], reverse=True)
+        for _, pos in pending:
+            self._maybe_reprice(pos)
+
+    # ---- order state ----
+    def on_execution_report(self, event: dict) -> None:
+        """
+        user data stream handler: a trailed stop that triggered or (partly)
+        filled is not re-priced any more; a filled one ends the trailing.
+        """
+        pos = self._positions.get(event["s"])
+        if pos is None or int(event["i"]) != pos.order_id:
+            return
+        if event["X"] == "CANCELED":
+            if not pos.in_flight:  # not our cancel-replace: canceled elsewhere
+                self.release(pos.symbol, sl_open=False)
+            return
+        self._order_state(pos, {"status": event["X"], "isWorking": event.get("w"),
+                                "origQty": event.get("q"), "executedQty": event.get("z")})
+
+    def _order_state(self, pos: TrailingPosition, order: dict) -> str:
+        """
+        Apply an order update of the position's stop; returns "resting",
+        "working", "done" or "canceled".
+        """
+        status = order.get("status")
+        if status in DONE_STATES:
+            if status == "FILLED":
+                self._log(f"[INFO] Trailing stop {pos.symbol} executed.")
+            else:
+                self._log(f"[INFO] Trailing stop {pos.symbol} ended ({status}).")
+            self.release(pos.symbol, sl_open=False)
+            return "done"
+        if status not in OPEN_STATES:
+            return "canceled"
+        executed = Decimal(str(order.get("executedQty") or "0"))
+        if not order.get("isWorking") and executed <= 0:
+            pos.dipped = False
+            return "resting"
+        with self._lock:
+            first = not pos.working
+            pos.working = True
+            if order.get("origQty") is not None:
+                pos.qty = Decimal(str(order["origQty"])) - executed
+        if first:
+            self._log(f"[INFO] Trailing {pos.symbol}: stop triggered"
+                      f"{f', {executed} filled' if executed > 0 else ''}, no more re-prices.")
+            self.save()
+        return "working"
+
+    # ---- orders ----
+    def _reprice(self, pos: TrailingPosition, stop: Decimal, limit: Decimal) -> None:
+        if pos.dipped:
+            # the price touched the stop since the last check: a triggered or
+            # partly filled stop must not be cancel-replaced
+            try:
+                order = self.client.get_order(symbol=pos.symbol, orderId=pos.order_id)
+            except Exception as e:
+                self._log(f"[ERROR] get_order {pos.symbol} {pos.order_id}: {e}")
+                pos.in_flight = False
+                return
+            if self._order_state(pos, order) != "resting":
+                if pos.symbol in self and not pos.working:
+                    self._recover(pos, order)  # canceled meanwhile
+                pos.in_flight = False
+                return
+        try:
+            resp = self.client.cancel_replace_order(
+                symbol=pos.symbol,
+                side="SELL",
+                type="STOP_LOSS_LIMIT",
+                cancelReplaceMode="STOP_ON_FAILURE",
+                cancelOrderId=pos.order_id,
+                timeInForce="GTC",
+                quantity=float(pos.qty),
+                price=str(limit),
+                stopPrice=str(stop),
+            )
+            new_id = resp["newOrderResponse"]["orderId"]
+            with self._lock:
+                old, old_id = pos.stop_price, pos.order_id
+                pos.order_id, pos.stop_price, pos.limit_price = int(new_id), stop, limit
+                self.reprice_count += 1
+            if self.open_orders is not None:
+                self.open_orders.on_canceled(pos.symbol, [old_id])
+            if self.journal is not None:
+                self.journal.record_cancel(pos.symbol, old_id, "STOP_LOSS_LIMIT")
+            self._track(pos, resp["newOrderResponse"], stop, limit)
+            self._log(f"[OK] Trailing {pos.symbol}: stop {old} -> {stop} (limit {limit}), OrderId={new_id}")
+            self.save()
+        except Exception as e:
+            self._log(f"[ERROR] cancel_replace {pos.symbol}: {e}")
+            self._recover(pos)
+        finally:
+            pos.in_flight = False
+
+    def _recover(self, pos: TrailingPosition, order: dict | None = None) -> None:
+        """
+        Find out what a failed cancel-replace left behind. If the old stop
+        is gone, the part of it that did not fill (at most the free balance)
+        is put back at the last accepted prices (the refused ones would most
+        likely be refused again). If that stop is at or above the last price
+        it would trigger at once: the rest is sold at market instead.
+        """
+        if order is None:
+            try:
+                order = self.client.get_order(symbol=pos.symbol, orderId=pos.order_id)
+            except Exception as e:
+                self._log(f"[ERROR] get_order {pos.symbol} {pos.order_id}: {e}")
+                return  # unknown: keep the position, the next re-price tries again
+            if self._order_state(pos, order) != "canceled":
+                return  # old stop still in place, or done
+        symbol = pos.symbol
+        f = self.symbols.filters(symbol)
+        qty = Decimal(str(order.get("origQty", pos.qty))) - Decimal(str(order.get("executedQty") or "0"))
+        try:
+            free = Decimal(str(self.client.get_asset_balance(asset=f.base_asset)["free"]))
+            qty = min(qty, free)
+        except Exception as e:
+            self._log(f"[ERROR] get_asset_balance {f.base_asset}: {e}")
+        qty = fx.to_decimal(*self._fixed_symbol(symbol).round_qty(fx.from_decimal(qty)))
+        stop, limit = pos.stop_price, pos.limit_price
+        if qty <= 0 or qty * (pos.last or stop) < f.min_notional:
+            self._log(f"[INFO] Trailing {symbol}: nothing left to protect.")
+            self.release(symbol, sl_open=False)
+            return
+        if pos.last is not None and stop >= pos.last:
+            # the stop would already have triggered: do what it would have done
+            try:
+                resp = self.client.create_order(symbol=symbol, side="SELL", type="MARKET", quantity=float(qty))
+                if self.journal is not None:
+                    self.journal.record_order(resp, symbol=symbol, side="SELL", type="MARKET", quantity=qty)
+                self._log(f"[OK] Trailing {symbol}: price {pos.last} below the stop {stop}, "
+                          f"sold {qty} at market, OrderId={resp.get('orderId')}")
+            except Exception as e:
+                self._log(f"[ERROR] {symbol} is UNPROTECTED, stop {stop} is above the price "
+                          f"and the market sell failed: {e}")
+            self.release(symbol, sl_open=False)
+            return
+        # canceled but the replacement was refused: put a stop back right away
+        try:
+            new = self.client.create_order(
+                symbol=symbol, side="SELL", type="STOP_LOSS_LIMIT", timeInForce="GTC",
+                quantity=float(qty), price=str(limit), stopPrice=str(stop),
+            )
+        except Exception as e:
+            self._log(f"[ERROR] {symbol} is UNPROTECTED, new SL failed: {e}")
+            self.release(symbol, sl_open=False)
+            return
+        with self._lock:
+            pos.order_id, pos.qty, pos.dipped = int(new["orderId"]), qty, False
+        self._track(pos, new, stop, limit)
+        self._log(f"[OK] Trailing {symbol}: SL re-placed at {stop} for {qty}, OrderId={new['orderId']}")
+        self.save()
+
+    def _track(self, pos: TrailingPosition, response: dict, stop: Decimal, limit: Decimal) -> None:
+        request = dict(symbol=pos.symbol, side="SELL", type="STOP_LOSS_LIMIT",
+                       quantity=pos.qty, price=limit, stopPrice=stop)
+        if self.open_orders is not None:
+            self.open_orders.on_order_response(response, **request)
+        if self.journal is not None:
+            self.journal.record_order(response, **request)
+
+    # ---- background loop ----
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="trailing-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.wait(FLUSH_INTERVAL):
+            try:
+                self.flush()
+            except Exception as e:
+                self._log(f"[ERROR] trailing: {e}")
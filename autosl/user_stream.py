@@ -0,0 +1,237 @@
+"""
+User data stream: listenKey handling plus a local balance table fed by
+`outboundAccountPosition` / `balanceUpdate` events. REST is only used to
+resync after (re)connecting.
+"""
+import json
+import random
+import threading
+import time
+from decimal import Decimal
+from typing import Callable
+
+from websockets.exceptions import ConnectionClosed
+from websockets.sync.client import connect
+
+from .config import WS_URL
+
+# Binance closes a listenKey after 60 min without keepalive
+KEEPALIVE_INTERVAL = 30 * 60
+RECV_TIMEOUT = 1.0
+BACKOFF_MAX = 60.0
+
+
+class BalanceBook:
+    """
+    Thread-safe {asset: (free, locked)} table.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._balances: dict[str, tuple[Decimal, Decimal]] = {}
+        self._updated_ms: dict[str, int] = {}
+        self._listeners: list[Callable[[set[str]], None]] = []
+        self.synced = False
+
+    def add_listener(self, fn: Callable[[set[str]], None]) -> None:
+        """
+        fn(changed_assets) after every change (called on the stream thread).
+        """
+        self._listeners.append(fn)
+
+    def reset(self, balances: list[dict], update_ms: int = 0) -> None:
+        """
+        Replace everything with a REST snapshot (get_account()["balances"]).
+        """
+        table = {}
+        for b in balances:
+            free_amt = Decimal(b.get("free", "0"))
+            locked_amt = Decimal(b.get("locked", "0"))
+            if free_amt or locked_amt:
+                table[b["asset"]] = (free_amt, locked_amt)
+
+        with self._lock:
+            changed = set(table) | set(self._balances)
+            self._balances = table
+            self._updated_ms = {asset: update_ms for asset in table}
+            self.synced = True
+        self._notify(changed)
+
+    def apply_position(self, balances: list[dict], update_ms: int) -> None:
+        """
+        outboundAccountPosition: absolute free/locked values per asset.
+        """
+        changed = set()
+        with self._lock:
+            for b in balances:
+                asset = b["a"]
+                if update_ms < self._updated_ms.get(asset, 0):
+                    continue
+                self._balances[asset] = (Decimal(b["f"]), Decimal(b["l"]))
+                self._updated_ms[asset] = update_ms
+                changed.add(asset)
+        self._notify(changed)
+
+    def apply_delta(self, asset: str, delta: Decimal, clear_ms: int) -> None:
+        """
+        balanceUpdate: delta on free (deposits, withdrawals, transfers).
+        Skipped if a newer absolute position already includes it.
+        """
+        with self._lock:
+            if clear_ms <= self._updated_ms.get(asset, 0):
+                return
+            free_amt, locked_amt = self._balances.get(asset, (Decimal("0"), Decimal("0")))
+            self._balances[asset] = (free_amt + delta, locked_amt)
+            self._updated_ms[asset] = clear_ms
+        self._notify({asset})
+
+    def free(self, asset: str) -> Decimal:
+        return self._balances.get(asset, (Decimal("0"), Decimal("0")))[0]
+
+    def total(self, asset: str) -> Decimal:
+        free_amt, locked_amt = self._balances.get(asset, (Decimal("0"), Decimal("0")))
+        return free_amt + locked_amt
+
+    def snapshot(self) -> dict[str, tuple[Decimal, Decimal]]:
+        with self._lock:
+            return dict(self._balances)
+
+    def _notify(self, changed: set[str]) -> None:
+        if not changed:
+            return
+        for fn in self._listeners:
+            try:
+                fn(changed)
+            except Exception:
+                pass
+
+
+class UserDataStream:
+    """
+    Owns the listenKey (create, keepalive, renew on expiry) and the socket.
+    Extra event types can be consumed via add_handler("executionReport", fn).
+    """
+
+    def __init__(self, client, balances: BalanceBook, base_url: str = WS_URL,
+                 log: Callable[[str], None] | None = None):
+        self.client = client
+        self.balances = balances
+        self.base_url = base_url.rstrip("/")
+        self._log = log or (lambda msg: None)
+        self._handlers: dict[str, list[Callable[[dict], None]]] = {}
+        self._resync_listeners: list[Callable[[], None]] = []
+        self._disconnect_listeners: list[Callable[[], None]] = []
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.connected = False
+
+        self.add_handler("outboundAccountPosition", self._on_account_position)
+        self.add_handler("balanceUpdate", self._on_balance_update)
+
+    def add_handler(self, event_type: str, fn: Callable[[dict], None]) -> None:
+        self._handlers.setdefault(event_type, []).append(fn)
+
+    def add_resync_listener(self, fn: Callable[[], None]) -> None:
+        """
+        fn() after each REST resync (i.e. after every (re)connect).
+        """
+        self._resync_listeners.append(fn)
+
+    def add_disconnect_listener(self, fn: Callable[[], None]) -> None:
+        """
+        fn() when the socket is lost: events may be missed until the next resync.
+        """
+        self._disconnect_listeners.append(fn)
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="user-stream", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def resync(self) -> None:
+        """
+        Reload balances from REST (one get_account call).
+        """
+        account = self.client.get_account()
+        self.balances.reset(account.get("balances", []), int(account.get("updateTime", 0)))
+        for fn in self._resync_listeners:
+            try:
+                fn()
+            except Exception as e:
+                self._log(f"[ERROR] resync listener: {e}")
+
+    # ---- events ----
+    def dispatch(self, event: dict) -> None:
+        """
+        Run the handlers of one event (socket thread, or a paper exchange).
+        """
+        etype = event.get("e")
+        for fn in self._handlers.get(etype, ()):
+            try:
+                fn(event)
+            except Exception as e:
+                self._log(f"[ERROR] {etype} handler: {e}")
+
+    def _on_account_position(self, event: dict) -> None:
+        self.balances.apply_position(event.get("B", []), int(event.get("u", event.get("E", 0))))
+
+    def _on_balance_update(self, event: dict) -> None:
+        self.balances.apply_delta(event["a"], Decimal(event["d"]), int(event.get("T", event.get("E", 0))))
+
+    # ---- connection ----
+    def _run(self) -> None:
+        attempt = 0
+        while not self._stop.is_set():
+            try:
+                listen_key = self.client.stream_get_listen_key()
+                with connect(f"{self.base_url}/ws/{listen_key}", open_timeout=10) as ws:
+                    self.connected = True
+                    # socket first, then snapshot: events queued meanwhile are
+                    # applied on top of it
+                    self.resync()
+                    if attempt:
+                        self._log("[INFO] User data stream reconnected, balances resynced.")
+                    attempt = 0
+                    self._session(ws, listen_key)
+            except (OSError, ConnectionClosed, TimeoutError) as e:
+                if not self._stop.is_set():
+                    self._log(f"[ERROR] User data stream: {e}")
+            except Exception as e:
+                self._log(f"[ERROR] User data stream: {e}")
+            finally:
+                if self.connected:
+                    self.connected = False
+                    for fn in self._disconnect_listeners:
+                        try:
+                            fn()
+                        except Exception as e:
+                            self._log(f"[ERROR] disconnect listener: {e}")
+
+            if self._stop.is_set():
+                break
+            delay = min(BACKOFF_MAX, 2 ** attempt) * random.uniform(0.5, 1.0)
+            attempt += 1
+            self._stop.wait(delay)
+
+    def _session(self, ws, listen_key: str) -> None:
+        last_keepalive = time.monotonic()
+        while not self._stop.is_set():
+            if time.monotonic() - last_keepalive > KEEPALIVE_INTERVAL:
+                self.client.stream_keepalive(listen_key)
+                last_keepalive = time.monotonic()
+
+            try:
+                raw = ws.recv(timeout=RECV_TIMEOUT)
+            except TimeoutError:
+                continue
+
+            event = json.loads(raw)
+            if event.get("e") == "listenKeyExpired":
+                self._log("[INFO] listenKey expired -> reconnecting.")
+                return
+            self.dispatch(event)
@@ -0,0 +1,196 @@
+"""
+Incremental portfolio valuation: tracks only the assets the account holds
+and updates the total in O(1) per price or balance change.
+"""
+import json
+import threading
+from decimal import Decimal
+from typing import Callable
+
+ZERO = Decimal("0")
+
+
+def full_rebuild_total(balances: list[dict], tickers: list[dict], quote: str = "USDT") -> Decimal:
+    """
+    The original valuation: build a price map from all tickers, then sum
+    free + locked of every asset priced in `quote`.
+    """
+    price_map = {t["symbol"]: Decimal(t["price"]) for t in tickers}
+    total = ZERO
+
+    for b in balances:
+        asset = b.get("asset")
+        amount = Decimal(b.get("free", "0")) + Decimal(b.get("locked", "0"))
+        if amount <= 0:
+            continue
+
+        if asset == quote:
+            total += amount
+            continue
+
+        symbol = f"{asset}{quote}"
+        if symbol in price_map:
+            total += amount * price_map[symbol]
+
+    return total
+
+
+class PortfolioValuation:
+    """
+    amount * price per held asset, summed incrementally. Assets without a
+    `quote` pair contribute 0 (same as the full rebuild).
+    """
+
+    def __init__(self, quote: str = "USDT"):
+        self.quote = quote
+        self._lock = threading.Lock()
+        self._amounts: dict[str, Decimal] = {}
+        self._prices: dict[str, Decimal] = {}
+        self._contrib: dict[str, Decimal] = {}
+        self._symbol_to_asset: dict[str, str] = {}
+        self._total = ZERO
+        self._total_listeners: list[Callable[[Decimal], None]] = []
+        self._holdings_listeners: list[Callable[[set[str]], None]] = []
+
+    # ---- listeners ----
+    def add_total_listener(self, fn: Callable[[Decimal], None]) -> None:
+        self._total_listeners.append(fn)
+
+    def add_holdings_listener(self, fn: Callable[[set[str]], None]) -> None:
+        """
+        fn(held_symbols) whenever an asset is added or removed, e.g. to
+        resubscribe price streams.
+        """
+        self._holdings_listeners.append(fn)
+
+    # ---- updates ----
+    def set_balance(self, asset: str, amount: Decimal) -> None:
+        self.set_balances({asset: amount}, replace=False)
+
+    def set_balances(self, amounts: dict[str, Decimal], replace: bool = True) -> None:
+        """
+        Apply several balances at once. replace=True drops assets not listed.
+        """
+        with self._lock:
+            before = set(self._amounts)
+            total = self._total
+            if replace:
+                for asset in list(self._amounts):
+                    if asset not in amounts:
+                        total -= self._drop(asset)
+            for asset, amount in amounts.items():
+                if amount <= 0:
+                    total -= self._drop(asset)
+                    continue
+                self._amounts[asset] = amount
+                if asset != self.quote:
+                    self._symbol_to_asset[f"{asset}{self.quote}"] = asset
+                total += self._recalc(asset)
+            changed_holdings = set(self._amounts) != before
+            self._total = total
+            held = self._held_symbols()
+
+        self._emit_total(total)
+        if changed_holdings:
+            for fn in self._holdings_listeners:
+                fn(held)
+
+    def set_price(self, symbol: str, price: Decimal | None) -> bool:
+        """
+        Returns True if the symbol is held (i.e. the total may have changed).
+        """
+        asset = self._symbol_to_asset.get(symbol)
+        if asset is None or price is None:
+            return False
+        with self._lock:
+            if asset not in self._amounts or self._prices.get(asset) == price:
+                return True
+            self._prices[asset] = price
+            self._total += self._recalc(asset)
+            total = self._total
+        self._emit_total(total)
+        return True
+
+    def _recalc(self, asset: str) -> Decimal:
+        """
+        Recompute one contribution; returns the delta for the total.
+        """
+        amount = self._amounts.get(asset, ZERO)
+        if asset == self.quote:
+            value = amount
+        else:
+            price = self._prices.get(asset)
+            value = amount * price if price is not None else ZERO
+        delta = value - self._contrib.get(asset, ZERO)
+        self._contrib[asset] = value
+        return delta
+
+    def _drop(self, asset: str) -> Decimal:
+        self._amounts.pop(asset, None)
+        self._symbol_to_asset.pop(f"{asset}{self.quote}", None)
+        self._prices.pop(asset, None)
+        return self._contrib.pop(asset, ZERO)
+
+    def _emit_total(self, total: Decimal) -> None:
+        for fn in self._total_listeners:
+            try:
+                fn(total)
+            except Exception:
+                pass
+
+    # ---- reads ----
+    @property
+    def total(self) -> Decimal:
+        return self._total
+
+    def _held_symbols(self) -> set[str]:
+        return {f"{a}{self.quote}" for a in self._amounts if a != self.quote}
+
+    def held_symbols(self) -> set[str]:
+        with self._lock:
+            return self._held_symbols()
+
+    def contributions(self) -> list[tuple[str, Decimal]]:
+        """
+        (asset, value in quote) sorted by value, largest first.
+        """
+        with self._lock:
+            return sorted(self._contrib.items(), key=lambda kv: kv[1], reverse=True)
+
+
+def follow_account(valuation: PortfolioValuation, balances, market_stream, user_stream,
+                   symbols, client, log: Callable[[str], None] | None = None,
+                   submit: Callable[..., object] | None = None) -> None:
+    """
+    Keep `valuation` current: amounts from the BalanceBook, prices for the
+    held pairs only from the MarketStream (miniTicker), seeded with one
+    ticker request after every user-stream resync. submit(fn) moves that
+    request off the stream thread.
+    """
+    log = log or (lambda msg: None)
+    submit = submit or (lambda fn: fn())
+
+    def on_balance_change(changed_assets: set[str]) -> None:
+        valuation.set_balances({a: balances.total(a) for a in changed_assets}, replace=False)
+
+    def on_holdings_changed(held_symbols: set[str]) -> None:
+        # last price once a second is enough for the total
+        market_stream.watch_prices("valuation", [s for s in held_symbols if s in symbols],
+                                   channels=("miniTicker",))
+
+    def seed_prices() -> None:
+        held = sorted(s for s in valuation.held_symbols() if s in symbols)
+        if not held:
+            return
+        try:
+            tickers = client.get_symbol_ticker(symbols=json.dumps(held, separators=(",", ":")))
+        except Exception as e:
+            log(f"[ERROR] get_symbol_ticker(held): {e}")
+            return
+        for t in tickers:
+            valuation.set_price(t["symbol"], Decimal(t["price"]))
+
+    balances.add_listener(on_balance_change)
+    valuation.add_holdings_listener(on_holdings_changed)
+    market_stream.add_price_listener(lambda tick: valuation.set_price(tick.symbol, tick.price))
+    user_stream.add_resync_listener(lambda: submit(seed_prices))
@@ -0,0 +1,144 @@
+"""
+Decimal vs. integer fixed-point SL math (autosl.fixedpoint).
+
+First a randomized property check: for random prices, quantities, tick /
+step sizes (as Binance sends them, e.g. "0.01000000") and SL percentages
+every fixed-point result must equal the Decimal helpers in autosl.engine.
+Then micro-benchmarks of the hot operations.
+
+    python benchmarks/bench_fixedpoint.py
+    python benchmarks/bench_fixedpoint.py --cases 200000 --ops 50000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from autosl import fixedpoint as fx  # noqa: E402
+from autosl.engine import fmt_decimal, round_down_step, sl_prices  # noqa: E402
+
+# tick / step sizes seen on Binance spot, raw exchange-info strings
+QUANTA = [
+    "1.00000000", "0.10000000", "0.01000000", "0.00100000", "0.00010000",
+    "0.00001000", "0.00000100", "0.00000010", "0.00000001", "0.05000000",
+    "0.00500000", "10.00000000", "0.01", "0.5",
+]
+EDGE_NUMBERS = ["0", "100", "1000.00", "0.00000001", "99999999.99999999", "596.4", "1E+2", "1.0"]
+
+
+def random_number(rnd: random.Random) -> str:
+    digits = rnd.randint(1, 16)
+    scale = rnd.randint(0, min(digits, 10))
+    units = rnd.randrange(10 ** (digits - 1), 10 ** digits)
+    s = str(units)
+    if scale:
+        s = s[:-scale].rjust(1, "0") + "." + s[-scale:].rjust(scale, "0")
+    return s
+
+
+def random_pct(rnd: random.Random) -> str:
+    return str(Decimal(rnd.randint(1, 5000)).scaleb(-rnd.randint(0, 3)))
+
+
+def check(cases: int, seed: int) -> None:
+    rnd = random.Random(seed)
+    numbers = EDGE_NUMBERS + [random_number(rnd) for _ in range(cases)]
+    for i, text in enumerate(numbers):
+        q_text = rnd.choice(QUANTA)
+        d, q = Decimal(text), Decimal(q_text)
+        units, scale = fx.parse(text)
+        quantum = fx.Quantum.parse(q_text)
+
+        # parse / from_decimal / formatting
+        assert (units, scale) == fx.from_decimal(d), text
+        assert fx.format_plain(units, scale) == format(d, "f"), text
+        assert fx.format_trimmed(units, scale) == fmt_decimal(d), (text, fmt_decimal(d))
+
+        # rounding, including the exponent Decimal keeps
+        r_units, r_scale = fx.round_down(units, scale, quantum)
+        expected = round_down_step(d, q)
+        assert fx.format_plain(r_units, r_scale) == format(expected, "f"), (text, q_text)
+
+        # SL prices (positive basis only, as in the app)
+        if units > 0 and i % 2 == 0:
+            t_text, l_text = random_pct(rnd), random_pct(rnd)
+            if Decimal(t_text) >= 100 or Decimal(l_text) >= 100:
+                continue
+            (su, ss), (lu, ls) = fx.sl_prices((units, scale), fx.parse(t_text), fx.parse(l_text), quantum)
+            stop, limit = sl_prices(d, Decimal(t_text), Decimal(l_text), q)
+            assert fx.format_plain(su, ss) == format(stop, "f"), (text, t_text, l_text, q_text)
+            assert fx.format_plain(lu, ls) == format(limit, "f"), (text, t_text, l_text, q_text)
+            assert str(limit) == str(fx.to_decimal(lu, ls)) or Decimal(str(limit)) == fx.to_decimal(lu, ls)
+    print(f"property check: {len(numbers)} cases OK (seed {seed})")
+
+
+def timed(fn, ops: int, repeat: int) -> float:
+    """
+    Median microseconds per operation.
+    """
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - t0)
+    return statistics.median(runs) / ops * 1e6
+
+
+def bench(ops: int, repeat: int, seed: int) -> None:
+    rnd = random.Random(seed)
+    texts = [random_number(rnd) for _ in range(ops)]
+    pcts = [(random_pct(rnd), random_pct(rnd)) for _ in range(ops)]
+    pcts = [(t, l) if Decimal(t) < 100 and Decimal(l) < 100 else ("1", "1.2") for t, l in pcts]
+    q_text = "0.01000000"
+
+    dec_vals = [Decimal(t) for t in texts]
+    dec_pcts = [(Decimal(t), Decimal(l)) for t, l in pcts]
+    q = Decimal(q_text)
+    fx_vals = [fx.parse(t) for t in texts]
+    fx_pcts = [(fx.parse(t), fx.parse(l)) for t, l in pcts]
+    quantum = fx.Quantum.parse(q_text)
+
+    rows = [
+        ("round down to step",
+         lambda: [round_down_step(v, q) for v in dec_vals],
+         lambda: [fx.round_down(u, s, quantum) for u, s in fx_vals]),
+        ("SL prices (stop, limit)",
+         lambda: [sl_prices(v, t, l, q) for v, (t, l) in zip(dec_vals, dec_pcts)],
+         lambda: [fx.sl_prices(v, t, l, quantum) for v, (t, l) in zip(fx_vals, fx_pcts)]),
+        ("format trimmed",
+         lambda: [fmt_decimal(v) for v in dec_vals],
+         lambda: [fx.format_trimmed(u, s) for u, s in fx_vals]),
+        ("parse + SL prices + format",
+         lambda: [[format(p, "f") for p in sl_prices(Decimal(x), t, l, q)]
+                  for x, (t, l) in zip(texts, dec_pcts)],
+         lambda: [[fx.format_plain(*p) for p in fx.sl_prices(fx.parse(x), t, l, quantum)]
+                  for x, (t, l) in zip(texts, fx_pcts)]),
+    ]
+    print(f"{'operation':<28} {'Decimal':>10} {'fixed':>10} {'speed-up':>9}")
+    for name, dec_fn, fx_fn in rows:
+        d_us = timed(dec_fn, ops, repeat)
+        f_us = timed(fx_fn, ops, repeat)
+        print(f"{name:<28} {d_us:>8.3f}us {f_us:>8.3f}us {d_us / f_us:>8.1f}x")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--cases", type=int, default=50000, help="random cases for the property check")
+    ap.add_argument("--ops", type=int, default=20000, help="operations per benchmark run")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--no-bench", action="store_true", help="property check only")
+    args = ap.parse_args()
+
+    check(args.cases, args.seed)
+    if not args.no_bench:
+        bench(args.ops, args.repeat, args.seed)
+
+
+if __name__ == "__main__":
+    main()
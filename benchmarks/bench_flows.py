@@ -0,0 +1,335 @@
+"""
+End-to-end latency of the trading flows against the local mock exchange
+(benchmarks/mock_binance.py). The real client stack (python-binance,
+scheduler, connection manager, symbol cache, user data stream) drives
+TradingEngine the same way the GUI and the CLI do.
+
+Per flow: click -> return, click -> fill (market orders), fill -> SL
+(engine side and as seen by the exchange), throughput, and request weight /
+requests / orders per call as counted by the mock. Every run is appended
+to benchmarks/results/flows.jsonl and compared with the last run of the
+same configuration.
+
+    python benchmarks/bench_flows.py --latency 25 --rounds 10
+    python benchmarks/bench_flows.py --latency 25 --balance-lookup   # +SL without the fast path
+    python benchmarks/bench_flows.py --latency 25 --check            # exit 1 on a regression
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from decimal import Decimal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mock_binance import MockBinanceServer, MockConfig, MockExchange  # noqa: E402
+
+FLOWS = ("buy_spot", "add_sl_for_free", "buy_spot_with_sl", "cancel_sl_orders", "sell_all")
+RESULTS_FILE = os.path.join(ROOT, "benchmarks", "results", "flows.jsonl")
+# a p50 counts as regressed above previous * (1 + tolerance) and previous + this
+MIN_REGRESSION_MS = 2.0
+
+_local = threading.local()
+
+
+def time_fills(raw_client) -> None:
+    """
+    Remember when the market order response (the fill) arrived.
+    """
+    for name in ("order_market_buy", "order_market_sell"):
+        method = getattr(raw_client, name)
+
+        def timed(*args, _method=method, **kwargs):
+            resp = _method(*args, **kwargs)
+            _local.t_fill = time.perf_counter()
+            return resp
+
+        setattr(raw_client, name, timed)
+
+
+def percentile(samples: list[float], q: float) -> float | None:
+    samples = sorted(samples)
+    if not samples:
+        return None
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+class Bench:
+    def __init__(self, server: MockBinanceServer, args):
+        # import after the mock URLs are in the environment (read by autosl.config)
+        from autosl.client import build_client
+        from autosl.connection import ConnectionManager
+        from autosl.engine import TradingEngine
+        from autosl.metrics import ClientMetrics
+        from autosl.scheduler import RequestScheduler
+        from autosl.symbols import SymbolInfoCache
+        from autosl.user_stream import BalanceBook, UserDataStream
+
+        self.server = server
+        self.exchange = server.exchange
+        self.args = args
+        log = print if args.verbose else None
+        self.scheduler = RequestScheduler(log=log)
+        self.client = build_client("bench", "bench", ClientMetrics(), self.scheduler)
+        self.connection = ConnectionManager(self.client, log=log)
+        self.client.param_hook = self.connection.apply_recv_window
+        time_fills(self.client.raw)
+        self.connection.warm_up()
+
+        self.symbols = SymbolInfoCache(self.client, log=log)
+        self.symbols.ensure_loaded()
+        self.scheduler.configure(self.symbols.rate_limits)
+        self.balances = BalanceBook()
+        self.user_stream = UserDataStream(self.client, self.balances, log=log)
+        self.user_stream.start()
+        deadline = time.monotonic() + 10
+        while not self.balances.synced and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        self._pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="bench-bg")
+        self._pending = []
+        self.engine = TradingEngine(self.client, self.symbols, self.balances,
+                                    scheduler=self.scheduler, log=log, background=self._background,
+                                    sl_fast_path=not args.balance_lookup)
+        self.exchange.reset_tallies()
+
+    def _background(self, fn, *args) -> None:
+        self._pending.append(self._pool.submit(fn, *args))
+
+    def qty(self, symbol: str) -> str:
+        from autosl.engine import fmt_decimal, round_down_step
+
+        price = self.exchange.prices[symbol]
+        step = self.symbols.filters(symbol).step_size
+        return fmt_decimal(round_down_step(Decimal(self.args.notional) / price, step))
+
+    def call(self, name: str, symbol: str):
+        e, a = self.engine, self.args
+        if name == "buy_spot":
+            return e.buy_spot(symbol, self.qty(symbol))
+        if name == "add_sl_for_free":
+            return e.add_sl_for_free(symbol, a.trigger, a.limit)
+        if name == "buy_spot_with_sl":
+            return e.buy_spot_with_sl(symbol, self.qty(symbol), a.trigger, a.limit)
+        if name == "cancel_sl_orders":
+            return e.cancel_sl_orders(symbol)
+        return e.sell_all(symbol)
+
+    def one(self, name: str, symbol: str) -> dict:
+        from autosl.engine import EngineError
+
+        sample = {"error": None}
+        _local.t_fill = None
+        t0 = time.perf_counter()
+        try:
+            result = self.call(name, symbol)
+        except EngineError as err:
+            result, sample["error"] = None, str(err)
+        t1 = time.perf_counter()
+        sample["ms"] = (t1 - t0) * 1000
+        if _local.t_fill is not None:
+            sample["fill_ms"] = (_local.t_fill - t0) * 1000
+        if getattr(result, "fill_to_sl_ms", None) is not None:
+            sample["fill_to_sl_ms"] = result.fill_to_sl_ms
+            times = self.exchange.exec_times
+            buy_id, sl_id = result.order.get("orderId"), result.sl_order.get("orderId")
+            if buy_id in times and sl_id in times:
+                sample["exchange_fill_to_sl_ms"] = (times[sl_id] - times[buy_id]) * 1000
+        return sample
+
+    def phase(self, name: str, symbols: list[str]) -> tuple[float, list[dict]]:
+        """
+        Run one flow for every symbol. Phases never overlap, so everything the
+        mock sees meanwhile (parallel cancels, reconciliation) counts for it.
+        """
+        self.exchange.label = name
+        with ThreadPoolExecutor(max_workers=self.args.concurrency) as ex:
+            t0 = time.perf_counter()
+            samples = list(ex.map(lambda s: self.one(name, s), symbols))
+            wall = time.perf_counter() - t0
+        wait(self._pending)  # follow-ups (reconciliation) belong to this phase
+        self._pending.clear()
+        self.exchange.label = ""
+        return wall, samples
+
+    def run(self) -> dict:
+        symbols = list(self.exchange.markets)[:self.args.symbols]
+        walls = {name: 0.0 for name in FLOWS}
+        samples = {name: [] for name in FLOWS}
+        for i in range(self.args.rounds):
+            if i:
+                time.sleep(self.args.pause)
+            for name in FLOWS:
+                wall, out = self.phase(name, symbols)
+                walls[name] += wall
+                samples[name].extend(out)
+
+        flows = {}
+        for name in FLOWS:
+            ok = [s for s in samples[name] if s["error"] is None]
+            n = len(samples[name])
+            tally = self.exchange.tally(name)
+
+            def p50(key):
+                value = percentile([s[key] for s in ok if key in s], 0.5)
+                return None if value is None else round(value, 2)
+
+            latencies = [s["ms"] for s in ok]
+            flows[name] = {
+                "n": n,
+                "errors": n - len(ok),
+                "p50_ms": p50("ms"),
+                "p95_ms": round(percentile(latencies, 0.95) or 0, 2),
+                "max_ms": round(max(latencies, default=0), 2),
+                "fill_p50_ms": p50("fill_ms"),
+                "fill_to_sl_p50_ms": p50("fill_to_sl_ms"),
+                "exchange_fill_to_sl_p50_ms": p50("exchange_fill_to_sl_ms"),
+                "ops_per_s": round(n / walls[name], 2) if walls[name] else None,
+                "weight": round(tally["weight"] / n, 2),
+                "requests": round(tally["requests"] / n, 2),
+                "orders": round(tally["orders"] / n, 2),
+            }
+        return flows
+
+    def close(self) -> None:
+        self.user_stream.stop()
+        self._pool.shutdown(wait=False)
+
+
+# ---- results ----
+def git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                             capture_output=True, text=True, timeout=10)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                               capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    if out.returncode != 0:
+        return None
+    return out.stdout.strip() + ("-dirty" if dirty.stdout.strip() else "")
+
+
+def load_previous(path: str, config: dict) -> dict | None:
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            records = [json.loads(line) for line in fh if line.strip()]
+    except (OSError, ValueError):
+        return None
+    same = [r for r in records if r.get("config") == config]
+    return same[-1] if same else None
+
+
+def compare(previous: dict, flows: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for name, now in flows.items():
+        before = previous["flows"].get(name)
+        if not before:
+            continue
+        for key in ("p50_ms", "p95_ms", "fill_to_sl_p50_ms"):
+            b, a = before.get(key), now.get(key)
+            if b is not None and a is not None and a > b * (1 + tolerance) and a - b > MIN_REGRESSION_MS:
+                regressions.append(f"{name} {key}: {b:.1f} -> {a:.1f} ms (+{(a / b - 1) * 100:.0f}%)")
+        for key in ("weight", "requests", "orders"):
+            if now[key] > before[key] + 0.01:
+                regressions.append(f"{name} {key} per call: {before[key]} -> {now[key]}")
+    return regressions
+
+
+def print_table(flows: dict, previous: dict | None) -> None:
+    def ms(v):
+        return f"{v:8.1f}" if v is not None else f"{'-':>8}"
+
+    print(f"{'flow':<18} {'n':>4} {'err':>3} {'p50':>8} {'p95':>8} {'fill':>8} "
+          f"{'fill>SL':>8} {'ex.f>SL':>8} {'ops/s':>7} {'weight':>6} {'req':>5} {'ord':>4} {'p50 prev':>9}")
+    for name, f in flows.items():
+        prev = (previous or {}).get("flows", {}).get(name, {}).get("p50_ms")
+        print(f"{name:<18} {f['n']:>4} {f['errors']:>3} {ms(f['p50_ms'])} {ms(f['p95_ms'])} "
+              f"{ms(f['fill_p50_ms'])} {ms(f['fill_to_sl_p50_ms'])} {ms(f['exchange_fill_to_sl_p50_ms'])} "
+              f"{f['ops_per_s'] or 0:>7.1f} {f['weight']:>6.1f} {f['requests']:>5.1f} {f['orders']:>4.1f} "
+              f"{ms(prev)} ")
+    print("(ms; fill = click -> market fill, fill>SL = engine, ex.f>SL = as seen by the exchange;"
+          " weight / req / ord per call)")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--latency", type=float, default=25.0, help="mock REST latency in ms")
+    ap.add_argument("--jitter", type=float, default=0.0, help="+/- ms on top of --latency")
+    ap.add_argument("--ws-latency", type=float, default=0.0, help="mock stream event delay in ms")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="share of failing requests")
+    ap.add_argument("--symbols", type=int, default=4, help="pairs traded per phase (max 8)")
+    ap.add_argument("--rounds", type=int, default=10, help="buy / SL / cancel / sell cycles per pair")
+    ap.add_argument("--concurrency", type=int, default=1, help="flows running at the same time")
+    ap.add_argument("--pause", type=float, default=1.0,
+                    help="seconds between rounds; keeps the ORDERS rate below 100 / 10 s so the "
+                         "scheduler does not throttle (0 = measure with throttling)")
+    ap.add_argument("--notional", default="20", help="USDT per buy")
+    ap.add_argument("--trigger", default="0.5", help="SL trigger %%")
+    ap.add_argument("--limit", default="0.6", help="SL limit %%")
+    ap.add_argument("--balance-lookup", action="store_true",
+                    help="+SL asks for the balance instead of using the fills")
+    ap.add_argument("--results", default=RESULTS_FILE, help="JSONL history of runs")
+    ap.add_argument("--no-save", action="store_true", help="do not append this run")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="allowed latency increase (0.2 = 20%%)")
+    ap.add_argument("--check", action="store_true", help="exit 1 if a regression is found")
+    ap.add_argument("-v", "--verbose", action="store_true", help="print the engine log")
+    args = ap.parse_args()
+
+    exchange = MockExchange(MockConfig(latency_ms=args.latency, jitter_ms=args.jitter,
+                                       ws_latency_ms=args.ws_latency, seed=1),
+                            balances={"USDT": "1000000"})
+    server = MockBinanceServer(exchange).start()
+    os.environ["BINANCE_API_URL"] = server.api_url
+    os.environ["BINANCE_WS_URL"] = server.ws_url
+    os.environ["BINANCE_AUTOSL_HOME"] = tempfile.mkdtemp(prefix="autosl-bench-")
+
+    bench = Bench(server, args)
+    exchange.config.error_rate = args.error_rate  # errors only in the measured flows, not the setup
+    try:
+        flows = bench.run()
+    finally:
+        bench.close()
+        server.stop()
+
+    config = {
+        "latency_ms": args.latency, "jitter_ms": args.jitter, "ws_latency_ms": args.ws_latency,
+        "error_rate": args.error_rate, "symbols": args.symbols, "concurrency": args.concurrency,
+        "pause": args.pause,
+        "sl_fast_path": not args.balance_lookup,
+    }
+    previous = load_previous(args.results, config)
+    print_table(flows, previous)
+
+    regressions = compare(previous, flows, args.tolerance) if previous else []
+    if previous:
+        print(f"compared with {previous.get('commit') or '?'} ({previous['ts']}):")
+        for line in regressions or ["no regressions"]:
+            print(f"  {'[REGRESSION] ' if regressions else ''}{line}")
+
+    if not args.no_save:
+        record = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(terse=True),
+            "rounds": args.rounds,
+            "config": config,
+            "flows": flows,
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(args.results)), exist_ok=True)
+        with open(args.results, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(record) + "\n")
+        print(f"saved -> {args.results}")
+    return 1 if args.check and regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+Full-rebuild vs. incremental portfolio valuation on a recorded snapshot.
+
+Record a snapshot (needs BINANCE_API_KEY / BINANCE_API_SECRET):
+    python benchmarks/bench_valuation.py --record snapshot.json
+Run the benchmark:
+    python benchmarks/bench_valuation.py --snapshot snapshot.json
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from autosl.valuation import PortfolioValuation, full_rebuild_total  # noqa: E402
+
+
+def record(path: str) -> None:
+    from binance.client import Client
+
+    client = Client(os.environ["BINANCE_API_KEY"], os.environ["BINANCE_API_SECRET"])
+    snapshot = {
+        "balances": client.get_account().get("balances", []),
+        "tickers": client.get_all_tickers(),
+    }
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(snapshot, fh)
+    print(f"Recorded {len(snapshot['tickers'])} tickers, "
+          f"{len(snapshot['balances'])} balances -> {path}")
+
+
+def timed(fn, repeat: int) -> list[float]:
+    out = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - t0)
+    return out
+
+
+def run(path: str, updates: int, repeat: int) -> None:
+    with open(path, "r", encoding="utf-8") as fh:
+        snapshot = json.load(fh)
+    balances = snapshot["balances"]
+    tickers = snapshot["tickers"]
+
+    # incremental engine seeded from the same data
+    val = PortfolioValuation("USDT")
+    val.set_balances({
+        b["asset"]: Decimal(b["free"]) + Decimal(b["locked"]) for b in balances
+    })
+    held = val.held_symbols()
+    for t in tickers:
+        if t["symbol"] in held:
+            val.set_price(t["symbol"], Decimal(t["price"]))
+
+    expected = full_rebuild_total(balances, tickers)
+    assert val.total == expected, (val.total, expected)
+
+    # replay random price moves of held pairs (plus noise from non-held pairs)
+    rnd = random.Random(42)
+    price_of = {t["symbol"]: Decimal(t["price"]) for t in tickers}
+    symbols = list(price_of)
+    held_priced = [s for s in held if s in price_of] or symbols[:1]
+    moves = []
+    for _ in range(updates):
+        sym = rnd.choice(held_priced if rnd.random() < 0.5 else symbols)
+        factor = Decimal(1 + rnd.uniform(-0.002, 0.002)).quantize(Decimal("0.000001"))
+        moves.append((sym, price_of[sym] * factor))
+
+    rebuild = timed(lambda: full_rebuild_total(balances, tickers), repeat)
+
+    def apply_moves():
+        for sym, price in moves:
+            val.set_price(sym, price)
+    incremental = timed(apply_moves, repeat)
+
+    # correctness after the replay
+    for sym, price in moves:
+        price_of[sym] = price
+    final_tickers = [{"symbol": s, "price": str(p)} for s, p in price_of.items()]
+    assert val.total == full_rebuild_total(balances, final_tickers)
+
+    rb = statistics.median(rebuild) * 1e6
+    inc = statistics.median(incremental) / updates * 1e6
+    print(f"tickers: {len(tickers)}, held pairs: {len(held)}")
+    print(f"full rebuild      : {rb:10.1f} us per valuation")
+    print(f"incremental update: {inc:10.3f} us per price change")
+    print(f"speed-up          : {rb / inc:10.0f}x")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--record", metavar="FILE", help="record a snapshot from the live API")
+    ap.add_argument("--snapshot", metavar="FILE", help="recorded snapshot to benchmark on")
+    ap.add_argument("--updates", type=int, default=10000)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    if args.record:
+        record(args.record)
+    elif args.snapshot:
+        run(args.snapshot, args.updates, args.repeat)
+    else:
+        ap.error("use --record FILE or --snapshot FILE")
+
+
+if __name__ == "__main__":
+    main()
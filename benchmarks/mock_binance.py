@@ -0,0 +1,924 @@
+"""
+Local stand-in for the Binance spot REST API and WebSocket streams the app
+uses, so trading flows can be measured and tried without a live account.
+
+REST (any API key / signature is accepted):
+    ping, time, exchangeInfo, ticker/price, account, order (POST/GET/DELETE),
+    order/cancelReplace, openOrders (GET/DELETE), myTrades, userDataStream
+WebSocket:
+    /stream?streams=...   combined bookTicker / miniTicker, SUBSCRIBE / UNSUBSCRIBE
+    /ws/<listenKey>       executionReport / outboundAccountPosition
+
+Latency, fills (fee, slippage, partial fills, price levels) and errors are
+configurable through MockConfig, fail_next() injects a specific error.
+Responses carry X-MBX-USED-WEIGHT / X-MBX-ORDER-COUNT headers; requests,
+weight and orders are also tallied under the current `label` (one per
+benchmarked flow).
+
+    python benchmarks/mock_binance.py --latency 30 --balance USDT=10000
+    set BINANCE_API_URL=http://127.0.0.1:8765/api
+    set BINANCE_WS_URL=ws://127.0.0.1:8766
+"""
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from decimal import ROUND_DOWN, Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from queue import Queue
+from typing import Callable
+from urllib.parse import parse_qsl, urlsplit
+
+EIGHT = Decimal("0.00000001")
+
+# symbol, base, quote, price, tick size, step size, min notional
+DEFAULT_MARKETS = [
+    ("BNBUSDT", "BNB", "USDT", "600.00", "0.01", "0.001", "5"),
+    ("ETHUSDT", "ETH", "USDT", "3000.00", "0.01", "0.0001", "5"),
+    ("BTCUSDT", "BTC", "USDT", "60000.00", "0.01", "0.00001", "5"),
+    ("SOLUSDT", "SOL", "USDT", "150.00", "0.01", "0.001", "5"),
+    ("XRPUSDT", "XRP", "USDT", "0.5000", "0.0001", "1", "5"),
+    ("DOGEUSDT", "DOGE", "USDT", "0.15000", "0.00001", "1", "1"),
+    ("ADAUSDT", "ADA", "USDT", "0.4000", "0.0001", "0.1", "5"),
+    ("LTCUSDT", "LTC", "USDT", "80.00", "0.01", "0.001", "5"),
+]
+
+RATE_LIMITS = [
+    {"rateLimitType": "REQUEST_WEIGHT", "interval": "MINUTE", "intervalNum": 1, "limit": 6000},
+    {"rateLimitType": "ORDERS", "interval": "SECOND", "intervalNum": 10, "limit": 100},
+    {"rateLimitType": "ORDERS", "interval": "DAY", "intervalNum": 1, "limit": 200000},
+]
+
+
+def _ticker_weight(p: dict) -> int:
+    return 2 if "symbol" in p else 4
+
+
+def _open_orders_weight(p: dict) -> int:
+    return 6 if "symbol" in p else 80
+
+
+# (method, path below /api/v3/) -> weight or weight(params); unknown paths are 404
+WEIGHTS: dict[tuple[str, str], object] = {
+    ("GET", "ping"): 1,
+    ("GET", "time"): 1,
+    ("GET", "exchangeInfo"): 20,
+    ("GET", "ticker/price"): _ticker_weight,
+    ("GET", "account"): 20,
+    ("POST", "order"): 1,
+    ("GET", "order"): 4,
+    ("DELETE", "order"): 1,
+    ("POST", "order/cancelReplace"): 1,
+    ("GET", "openOrders"): _open_orders_weight,
+    ("DELETE", "openOrders"): 1,
+    ("GET", "myTrades"): 20,
+    ("POST", "userDataStream"): 2,
+    ("PUT", "userDataStream"): 2,
+    ("DELETE", "userDataStream"): 2,
+}
+ORDER_ENDPOINTS = {("POST", "order"), ("POST", "order/cancelReplace")}
+
+
+def _s(d: Decimal) -> str:
+    return format(d.quantize(EIGHT), "f")
+
+
+def _ms() -> int:
+    return int(time.time() * 1000)
+
+
+class MockError(Exception):
+    def __init__(self, code: int, msg: str, status: int = 400, data: dict | None = None,
+                 retry_after: int | None = None):
+        super().__init__(msg)
+        self.code, self.msg, self.status, self.data = code, msg, status, data
+        self.retry_after = retry_after
+
+    def body(self) -> dict:
+        out = {"code": self.code, "msg": self.msg}
+        if self.data is not None:
+            out["data"] = self.data
+        return out
+
+
+@dataclass
+class MockConfig:
+    latency_ms: float = 0.0        # added to every REST response
+    jitter_ms: float = 0.0         # +/- uniform on top of latency_ms
+    ws_latency_ms: float = 0.0     # delay of every stream event
+    fee_rate: Decimal = Decimal("0.001")      # commission, paid in the received asset
+    slippage_pct: Decimal = Decimal("0")      # market fills this % worse than the price
+    fill_levels: int = 1           # market orders fill across this many price levels (1 tick apart)
+    fill_ratio: Decimal = Decimal("1")        # < 1: market orders fill partially (EXPIRED)
+    error_rate: float = 0.0        # share of requests failing with -1001 (HTTP 503)
+    weight_limit: int = 6000       # REQUEST_WEIGHT per minute before 429
+    seed: int | None = None
+
+
+@dataclass
+class _Order:
+    symbol: str
+    order_id: int
+    client_id: str
+    side: str
+    type: str
+    qty: Decimal
+    price: Decimal = Decimal("0")
+    stop: Decimal = Decimal("0")
+    tif: str = "GTC"
+    status: str = "NEW"
+    executed: Decimal = Decimal("0")
+    quote: Decimal = Decimal("0")
+    working: bool = True
+    time: int = 0
+    update: int = 0
+    fills: list[dict] = field(default_factory=list)
+
+    def view(self) -> dict:
+        return {
+            "symbol": self.symbol, "orderId": self.order_id, "orderListId": -1,
+            "clientOrderId": self.client_id, "price": _s(self.price), "origQty": _s(self.qty),
+            "executedQty": _s(self.executed), "cummulativeQuoteQty": _s(self.quote),
+            "status": self.status, "timeInForce": self.tif, "type": self.type, "side": self.side,
+            "stopPrice": _s(self.stop), "icebergQty": "0.00000000", "time": self.time,
+            "updateTime": self.update, "isWorking": self.working, "workingTime": self.time,
+            "origQuoteOrderQty": "0.00000000", "selfTradePreventionMode": "EXPIRE_MAKER",
+        }
+
+    def response(self, resp_type: str) -> dict:
+        out = {"symbol": self.symbol, "orderId": self.order_id, "orderListId": -1,
+               "clientOrderId": self.client_id, "transactTime": self.update}
+        if resp_type in ("RESULT", "FULL"):
+            view = self.view()
+            for k in ("time", "updateTime", "isWorking", "icebergQty", "origQuoteOrderQty"):
+                view.pop(k)
+            out.update(view)
+            if self.type not in ("STOP_LOSS_LIMIT", "TAKE_PROFIT_LIMIT"):
+                out.pop("stopPrice")
+        if resp_type == "FULL":
+            out["fills"] = list(self.fills)
+        return out
+
+
+class MockExchange:
+    """
+    Balances, prices, orders and a price-driven matcher: market orders fill
+    at the current price, STOP_LOSS_LIMIT / TAKE_PROFIT_LIMIT trigger on
+    set_price() and their limit fills only if the price is at or through
+    it (a gap through the limit leaves the order open).
+    """
+
+    def __init__(self, config: MockConfig | None = None,
+                 markets=DEFAULT_MARKETS, balances: dict[str, str] | None = None):
+        self.config = config or MockConfig()
+        self._rnd = random.Random(self.config.seed)
+        self._lock = threading.RLock()
+        self._ids = itertools.count(1)
+        self._trade_ids = itertools.count(1)
+        self._book_ids = itertools.count(1)
+        self.markets: dict[str, dict] = {}
+        self.prices: dict[str, Decimal] = {}
+        self.balances: dict[str, list[Decimal]] = {}
+        self.orders: dict[int, _Order] = {}
+        self.trades: list[dict] = []
+        self.listen_keys: set[str] = set()
+        self.exec_times: dict[int, float] = {}   # orderId -> perf_counter when accepted / filled
+        self._weights: deque[tuple[float, int]] = deque()
+        self._order_times: deque[float] = deque()
+        self._tallies: dict[str, Counter] = {}
+        self.label = ""                           # tally key for the following requests
+        self._fail: list[list] = []               # [key, count, MockError]
+        self._listeners: list[Callable[[str, object], None]] = []
+        for m in markets:
+            self.add_market(*m)
+        for asset, amount in (balances or {"USDT": "10000"}).items():
+            self.balances[asset] = [Decimal(amount), Decimal("0")]
+
+    # ---- setup ----
+    def add_market(self, symbol: str, base: str, quote: str, price: str,
+                   tick: str, step: str, min_notional: str) -> None:
+        self.markets[symbol] = {
+            "symbol": symbol, "status": "TRADING", "baseAsset": base, "baseAssetPrecision": 8,
+            "quoteAsset": quote, "quotePrecision": 8, "quoteAssetPrecision": 8,
+            "orderTypes": ["LIMIT", "LIMIT_MAKER", "MARKET", "STOP_LOSS_LIMIT", "TAKE_PROFIT_LIMIT"],
+            "isSpotTradingAllowed": True, "permissions": ["SPOT"],
+            "filters": [
+                {"filterType": "PRICE_FILTER", "minPrice": tick, "maxPrice": "1000000.00000000", "tickSize": tick},
+                {"filterType": "LOT_SIZE", "minQty": step, "maxQty": "9000000.00000000", "stepSize": step},
+                {"filterType": "NOTIONAL", "minNotional": min_notional, "applyMinToMarket": True,
+                 "maxNotional": "9000000.00000000", "applyMaxToMarket": False, "avgPriceMins": 5},
+            ],
+        }
+        self.prices[symbol] = Decimal(price)
+
+    def add_listener(self, fn: Callable[[str, object], None]) -> None:
+        """
+        fn("market", (stream, data)) / fn("user", event) after every change.
+        """
+        self._listeners.append(fn)
+
+    def fail_next(self, endpoint: str, code: int = -1001,
+                  msg: str = "Internal error; unable to process your request. Please try again.",
+                  status: int = 400, count: int = 1) -> None:
+        """
+        Let the next `count` requests to e.g. "POST order" fail.
+        """
+        self._fail.append([endpoint, count, MockError(code, msg, status)])
+
+    def _filters(self, symbol: str) -> tuple[Decimal, Decimal, Decimal]:
+        f = {x["filterType"]: x for x in self.markets[symbol]["filters"]}
+        return (Decimal(f["PRICE_FILTER"]["tickSize"]), Decimal(f["LOT_SIZE"]["stepSize"]),
+                Decimal(f["NOTIONAL"]["minNotional"]))
+
+    def _market(self, symbol: str | None) -> dict:
+        if not symbol or symbol not in self.markets:
+            raise MockError(-1121, "Invalid symbol.")
+        return self.markets[symbol]
+
+    def _balance(self, asset: str) -> list[Decimal]:
+        return self.balances.setdefault(asset, [Decimal("0"), Decimal("0")])
+
+    # ---- accounting ----
+    def admit(self, method: str, path: str, params: dict) -> dict[str, str]:
+        """
+        Weight / order accounting and injected errors for one request;
+        returns the X-MBX headers for the response.
+        """
+        weight = WEIGHTS[(method, path)]
+        weight = weight(params) if callable(weight) else weight
+        is_order = (method, path) in ORDER_ENDPOINTS
+        now = time.monotonic()
+        with self._lock:
+            while self._weights and now - self._weights[0][0] > 60:
+                self._weights.popleft()
+            while self._order_times and now - self._order_times[0] > 86400:
+                self._order_times.popleft()
+            used = sum(w for _, w in self._weights) + weight
+            tally = self._tallies.setdefault(self.label, Counter())
+            tally["requests"] += 1
+            tally["weight"] += weight
+            tally[f"{method} {path}"] += 1
+            if used > self.config.weight_limit:
+                retry = int(60 - (now - self._weights[0][0])) + 1 if self._weights else 60
+                raise MockError(-1003, "Too much request weight used; please use the websocket "
+                                       "for live updates to avoid polling the API.", 429,
+                                retry_after=retry)
+            self._weights.append((now, weight))
+            if is_order:
+                self._order_times.append(now)
+                tally["orders"] += 1
+            headers = {
+                "X-MBX-USED-WEIGHT-1M": str(used),
+                "X-MBX-ORDER-COUNT-10S": str(sum(1 for t in self._order_times if now - t <= 10)),
+                "X-MBX-ORDER-COUNT-1D": str(len(self._order_times)),
+            }
+            for item in self._fail:
+                if item[0] == f"{method} {path}" and item[1] > 0:
+                    item[1] -= 1
+                    tally["errors"] += 1
+                    raise item[2]
+            if self.config.error_rate and self._rnd.random() < self.config.error_rate:
+                tally["errors"] += 1
+                raise MockError(-1001, "Internal error; unable to process your request. "
+                                       "Please try again.", 503)
+        return headers
+
+    def tally(self, label: str) -> Counter:
+        with self._lock:
+            return Counter(self._tallies.get(label, Counter()))
+
+    def reset_tallies(self) -> None:
+        with self._lock:
+            self._tallies.clear()
+
+    # ---- market data ----
+    def set_price(self, symbol: str, price) -> None:
+        """
+        New last price: streams it and runs the trigger / fill checks.
+        """
+        price = Decimal(str(price))
+        with self._lock:
+            self._market(symbol)
+            self.prices[symbol] = price
+            events = self._match(symbol)
+        tick = self._filters(symbol)[0]
+        s = symbol.lower()
+        self._emit("market", (f"{s}@bookTicker", {
+            "u": next(self._book_ids), "s": symbol, "b": _s(price - tick), "B": "10.00000000",
+            "a": _s(price), "A": "10.00000000"}))
+        self._emit("market", (f"{s}@miniTicker", {
+            "e": "24hrMiniTicker", "E": _ms(), "s": symbol, "c": _s(price), "o": _s(price),
+            "h": _s(price), "l": _s(price), "v": "0", "q": "0"}))
+        for event in events:
+            self._emit("user", event)
+
+    def random_walk(self, interval: float = 1.0, pct: float = 0.05,
+                    stop: threading.Event | None = None) -> threading.Event:
+        """
+        Move every price by up to +/- pct % each interval (background thread).
+        """
+        stop = stop or threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                for symbol, price in list(self.prices.items()):
+                    tick = self._filters(symbol)[0]
+                    move = Decimal(str(1 + self._rnd.uniform(-pct, pct) / 100))
+                    self.set_price(symbol, max(tick, (price * move // tick) * tick))
+
+        threading.Thread(target=run, name="mock-walk", daemon=True).start()
+        return stop
+
+    def snapshot_streams(self, streams: set[str]) -> list[tuple[str, dict]]:
+        """
+        Current bookTicker / miniTicker for newly subscribed streams.
+        """
+        out = []
+        for symbol, price in list(self.prices.items()):
+            s = symbol.lower()
+            if f"{s}@bookTicker" in streams:
+                tick = self._filters(symbol)[0]
+                out.append((f"{s}@bookTicker", {"u": 0, "s": symbol, "b": _s(price - tick),
+                                                "B": "10.00000000", "a": _s(price), "A": "10.00000000"}))
+            if f"{s}@miniTicker" in streams:
+                out.append((f"{s}@miniTicker", {"e": "24hrMiniTicker", "E": _ms(), "s": symbol,
+                                                "c": _s(price), "o": _s(price), "h": _s(price),
+                                                "l": _s(price), "v": "0", "q": "0"}))
+        return out
+
+    def _emit(self, kind: str, payload) -> None:
+        for fn in self._listeners:
+            fn(kind, payload)
+
+    # ---- REST endpoints ----
+    def handle(self, method: str, path: str, p: dict):
+        if path == "ping":
+            return {}
+        if path == "time":
+            return {"serverTime": _ms()}
+        if path == "exchangeInfo":
+            symbols = list(self.markets.values())
+            if "symbol" in p:
+                symbols = [self._market(p["symbol"])]
+            return {"timezone": "UTC", "serverTime": _ms(), "rateLimits": RATE_LIMITS,
+                    "exchangeFilters": [], "symbols": symbols}
+        if path == "ticker/price":
+            return self._ticker(p)
+        if path == "account":
+            return self._account()
+        if path == "order":
+            if method == "POST":
+                return self._new_order(p)
+            if method == "DELETE":
+                return self._cancel(p)
+            return self._get_order(p)
+        if path == "order/cancelReplace":
+            return self._cancel_replace(p)
+        if path == "openOrders":
+            if method == "DELETE":
+                return self._cancel_all(p)
+            return [o.view() for o in self._open(p.get("symbol"))]
+        if path == "myTrades":
+            return self._my_trades(p)
+        if path == "userDataStream":
+            if method == "POST":
+                key = f"mock{next(self._ids):060d}"
+                self.listen_keys.add(key)
+                return {"listenKey": key}
+            return {}
+        raise MockError(-1000, f"Unsupported endpoint {method} {path}", 404)
+
+    def _ticker(self, p: dict):
+        if "symbol" in p:
+            self._market(p["symbol"])
+            return {"symbol": p["symbol"], "price": _s(self.prices[p["symbol"]])}
+        wanted = json.loads(p["symbols"]) if "symbols" in p else list(self.prices)
+        for s in wanted:
+            self._market(s)
+        return [{"symbol": s, "price": _s(self.prices[s])} for s in wanted]
+
+    def _account(self) -> dict:
+        with self._lock:
+            balances = [{"asset": a, "free": _s(f), "locked": _s(lk)}
+                        for a, (f, lk) in sorted(self.balances.items())]
+        return {"makerCommission": 10, "takerCommission": 10, "canTrade": True,
+                "canWithdraw": True, "canDeposit": True, "updateTime": _ms(),
+                "accountType": "SPOT", "balances": balances, "permissions": ["SPOT"]}
+
+    def _open(self, symbol: str | None) -> list[_Order]:
+        with self._lock:
+            return [o for o in self.orders.values() if o.status in ("NEW", "PARTIALLY_FILLED")
+                    and (symbol is None or o.symbol == symbol)]
+
+    def _find(self, p: dict) -> _Order:
+        self._market(p.get("symbol"))
+        order = None
+        if "orderId" in p:
+            order = self.orders.get(int(p["orderId"]))
+        elif "origClientOrderId" in p:
+            order = next((o for o in self.orders.values() if o.client_id == p["origClientOrderId"]), None)
+        if order is None or order.symbol != p["symbol"]:
+            raise MockError(-2013, "Order does not exist.")
+        return order
+
+    def _get_order(self, p: dict) -> dict:
+        with self._lock:
+            return self._find(p).view()
+
+    def _decimal(self, p: dict, name: str, required: bool = True) -> Decimal:
+        if name not in p:
+            if required:
+                raise MockError(-1102, f"Mandatory parameter '{name}' was not sent, was empty/null, or malformed.")
+            return Decimal("0")
+        try:
+            return Decimal(p[name])
+        except Exception:
+            raise MockError(-1100, f"Illegal characters found in parameter '{name}'.") from None
+
+    def _new_order(self, p: dict, events: list | None = None) -> dict:
+        own_events = events is None
+        events = [] if own_events else events
+        with self._lock:
+            order = self._place(p, events)
+        if own_events:
+            for event in events:
+                self._emit("user", event)
+        return order.response(p.get("newOrderRespType") or
+                              ("FULL" if order.type in ("MARKET", "LIMIT") else "ACK"))
+
+    def _place(self, p: dict, events: list) -> _Order:
+        symbol = p.get("symbol")
+        market = self._market(symbol)
+        base, quote = market["baseAsset"], market["quoteAsset"]
+        tick, step, min_notional = self._filters(symbol)
+        side, otype = p.get("side"), p.get("type")
+        if side not in ("BUY", "SELL"):
+            raise MockError(-1102, "Mandatory parameter 'side' was not sent, was empty/null, or malformed.")
+        if otype not in market["orderTypes"]:
+            raise MockError(-1116, "Invalid orderType.")
+        price_now = self.prices[symbol]
+        if otype == "MARKET" and "quoteOrderQty" in p and "quantity" not in p:
+            qty = (self._decimal(p, "quoteOrderQty") / price_now // step) * step
+        else:
+            qty = self._decimal(p, "quantity")
+        if qty <= 0 or qty % step:
+            raise MockError(-1013, "Filter failure: LOT_SIZE")
+        price = self._decimal(p, "price", required=otype != "MARKET")
+        stop = self._decimal(p, "stopPrice", required=otype in ("STOP_LOSS_LIMIT", "TAKE_PROFIT_LIMIT"))
+        if otype != "MARKET" and (price <= 0 or price % tick or stop % tick):
+            raise MockError(-1013, "Filter failure: PRICE_FILTER")
+        if qty * (price if otype != "MARKET" else price_now) < min_notional:
+            raise MockError(-1013, "Filter failure: NOTIONAL")
+
+        now = _ms()
+        order = _Order(symbol, next(self._ids), p.get("newClientOrderId") or f"mock{self._rnd.getrandbits(64):x}",
+                       side, otype, qty, price, stop, p.get("timeInForce", "GTC"), time=now, update=now)
+        if otype == "MARKET":
+            self._fill_market(order, base, quote, tick, step, events)
+        else:
+            if otype in ("STOP_LOSS_LIMIT", "TAKE_PROFIT_LIMIT"):
+                below = (otype == "STOP_LOSS_LIMIT") == (side == "SELL")
+                if (price_now <= stop) if below else (price_now >= stop):
+                    raise MockError(-2010, "Stop price would trigger immediately.")
+                order.working = False
+            asset, amount = (base, qty) if side == "SELL" else (quote, qty * price)
+            bal = self._balance(asset)
+            if bal[0] < amount:
+                raise MockError(-2010, "Account has insufficient balance for requested action.")
+            bal[0] -= amount
+            bal[1] += amount
+            self.orders[order.order_id] = order
+            events.append(self._execution_report(order, "NEW"))
+            events.append(self._position(asset))
+            events.extend(self._match(symbol))
+        self.exec_times[order.order_id] = time.perf_counter()
+        return order
+
+    def _fill_market(self, order: _Order, base: str, quote: str, tick: Decimal, step: Decimal,
+                     events: list) -> None:
+        cfg = self.config
+        sign = 1 if order.side == "BUY" else -1
+        price = self.prices[order.symbol] * (1 + sign * cfg.slippage_pct / 100)
+        price = price.quantize(tick, rounding=ROUND_DOWN)
+        target = ((order.qty * cfg.fill_ratio) // step) * step
+        levels = max(1, min(cfg.fill_levels, int(target / step) or 1))
+        chunk = ((target / levels) // step) * step
+        parts = [chunk] * (levels - 1) + [target - chunk * (levels - 1)]
+        fills = []
+        cost = Decimal("0")
+        for i, qty in enumerate(parts):
+            if qty <= 0:
+                continue
+            fill_price = price + sign * tick * i
+            fills.append((qty, fill_price))
+            cost += qty * fill_price
+        if order.side == "BUY" and self._balance(quote)[0] < cost:
+            raise MockError(-2010, "Account has insufficient balance for requested action.")
+        if order.side == "SELL" and self._balance(base)[0] < order.qty:
+            raise MockError(-2010, "Account has insufficient balance for requested action.")
+        for qty, fill_price in fills:
+            self._trade(order, qty, fill_price, base, quote, False)
+        order.status = "FILLED" if order.executed == order.qty else "EXPIRED"
+        events.append(self._execution_report(order, "TRADE" if fills else "EXPIRED"))
+        events.append(self._position(base, quote))
+        self.orders[order.order_id] = order
+
+    def _trade(self, order: _Order, qty: Decimal, price: Decimal, base: str, quote: str,
+               from_locked: bool) -> None:
+        fee_rate = self.config.fee_rate
+        trade_id = next(self._trade_ids)
+        value = qty * price
+        if order.side == "BUY":
+            fee, fee_asset = (qty * fee_rate).quantize(EIGHT, rounding=ROUND_DOWN), base
+            self._balance(quote)[1 if from_locked else 0] -= value  # limits fill at their price
+            self._balance(base)[0] += qty - fee
+        else:
+            fee, fee_asset = (value * fee_rate).quantize(EIGHT, rounding=ROUND_DOWN), quote
+            self._balance(base)[1 if from_locked else 0] -= qty
+            self._balance(quote)[0] += value - fee
+        order.executed += qty
+        order.quote += value
+        order.update = _ms()
+        fill = {"price": _s(price), "qty": _s(qty), "commission": _s(fee),
+                "commissionAsset": fee_asset, "tradeId": trade_id}
+        order.fills.append(fill)
+        self.trades.append({
+            "symbol": order.symbol, "id": trade_id, "orderId": order.order_id, "orderListId": -1,
+            "price": _s(price), "qty": _s(qty), "quoteQty": _s(value), "commission": _s(fee),
+            "commissionAsset": fee_asset, "time": order.update, "isBuyer": order.side == "BUY",
+            "isMaker": order.type != "MARKET", "isBestMatch": True,
+        })
+
+    def _match(self, symbol: str) -> list[dict]:
+        """
+        Trigger stops and fill working limits at the current price (lock held).
+        """
+        events = []
+        price = self.prices[symbol]
+        market = self.markets[symbol]
+        for order in self._open(symbol):
+            if not order.working:
+                below = (order.type == "STOP_LOSS_LIMIT") == (order.side == "SELL")
+                if (price <= order.stop) if below else (price >= order.stop):
+                    order.working = True
+                    order.update = _ms()
+            if not order.working:
+                continue
+            if (price >= order.price) if order.side == "SELL" else (price <= order.price):
+                self._trade(order, order.qty - order.executed, order.price,
+                            market["baseAsset"], market["quoteAsset"], True)
+                order.status = "FILLED"
+                self.exec_times[order.order_id] = time.perf_counter()
+                events.append(self._execution_report(order, "TRADE"))
+                events.append(self._position(market["baseAsset"], market["quoteAsset"]))
+        return events
+
+    def _release(self, order: _Order) -> str:
+        market = self.markets[order.symbol]
+        rest = order.qty - order.executed
+        asset, amount = (market["baseAsset"], rest) if order.side == "SELL" else \
+            (market["quoteAsset"], rest * order.price)
+        bal = self._balance(asset)
+        bal[1] -= amount
+        bal[0] += amount
+        order.status = "CANCELED"
+        order.update = _ms()
+        return asset
+
+    def _cancel_locked(self, p: dict, events: list) -> dict:
+        order = self._find(p)
+        if order.status not in ("NEW", "PARTIALLY_FILLED"):
+            raise MockError(-2011, "Unknown order sent.")
+        asset = self._release(order)
+        events.append(self._execution_report(order, "CANCELED"))
+        events.append(self._position(asset))
+        view = order.view()
+        return {"symbol": order.symbol, "origClientOrderId": order.client_id,
+                "orderId": order.order_id, "orderListId": -1,
+                "clientOrderId": f"cancel{order.order_id}", "transactTime": order.update,
+                **{k: view[k] for k in ("price", "origQty", "executedQty", "cummulativeQuoteQty",
+                                        "status", "timeInForce", "type", "side", "stopPrice",
+                                        "selfTradePreventionMode")}}
+
+    def _cancel(self, p: dict) -> dict:
+        events = []
+        with self._lock:
+            out = self._cancel_locked(p, events)
+        for event in events:
+            self._emit("user", event)
+        return out
+
+    def _cancel_all(self, p: dict) -> list[dict]:
+        self._market(p.get("symbol"))
+        events = []
+        with self._lock:
+            open_orders = self._open(p["symbol"])
+            if not open_orders:
+                raise MockError(-2011, "Unknown order sent.")
+            out = [self._cancel_locked({"symbol": o.symbol, "orderId": o.order_id}, events)
+                   for o in open_orders]
+        for event in events:
+            self._emit("user", event)
+        return out
+
+    def _cancel_replace(self, p: dict) -> dict:
+        mode = p.get("cancelReplaceMode")
+        if mode not in ("STOP_ON_FAILURE", "ALLOW_FAILURE"):
+            raise MockError(-1102, "Mandatory parameter 'cancelReplaceMode' was not sent, "
+                                   "was empty/null, or malformed.")
+        cancel_p = {"symbol": p.get("symbol")}
+        if "cancelOrderId" in p:
+            cancel_p["orderId"] = p["cancelOrderId"]
+        if "cancelOrigClientOrderId" in p:
+            cancel_p["origClientOrderId"] = p["cancelOrigClientOrderId"]
+        new_p = {k: v for k, v in p.items() if not k.startswith("cancel")}
+        events = []
+        with self._lock:
+            try:
+                cancel_resp = self._cancel_locked(cancel_p, events)
+            except MockError as e:
+                cancel_resp = e.body()
+                if mode == "STOP_ON_FAILURE":
+                    raise MockError(-2022, "Order cancel-replace failed.", 400, {
+                        "cancelResult": "FAILURE", "newOrderResult": "NOT_ATTEMPTED",
+                        "cancelResponse": cancel_resp, "newOrderResponse": None}) from None
+            try:
+                new_resp = self._place(new_p, events).response(p.get("newOrderRespType", "ACK"))
+                new_result = "SUCCESS"
+            except MockError as e:
+                new_resp, new_result = e.body(), "FAILURE"
+        for event in events:
+            self._emit("user", event)
+        cancel_result = "SUCCESS" if "orderId" in cancel_resp else "FAILURE"
+        body = {"cancelResult": cancel_result, "newOrderResult": new_result,
+                "cancelResponse": cancel_resp, "newOrderResponse": new_resp}
+        if new_result == "FAILURE" or cancel_result == "FAILURE":
+            code = -2021 if cancel_result == "SUCCESS" else -2022
+            raise MockError(code, "Order cancel-replace partially failed.", 400, body)
+        return body
+
+    def _my_trades(self, p: dict) -> list[dict]:
+        self._market(p.get("symbol"))
+        from_id = int(p.get("fromId", 0))
+        limit = min(1000, int(p.get("limit", 500)))
+        with self._lock:
+            out = [t for t in self.trades if t["symbol"] == p["symbol"] and t["id"] >= from_id]
+        return out[:limit] if "fromId" in p else out[-limit:]
+
+    # ---- user data events ----
+    def _execution_report(self, order: _Order, exec_type: str) -> dict:
+        last = order.fills[-1] if order.fills and exec_type == "TRADE" else None
+        return {
+            "e": "executionReport", "E": _ms(), "s": order.symbol, "c": order.client_id,
+            "S": order.side, "o": order.type, "f": order.tif, "q": _s(order.qty),
+            "p": _s(order.price), "P": _s(order.stop), "F": "0.00000000", "g": -1,
+            "C": order.client_id if exec_type == "CANCELED" else "", "x": exec_type,
+            "X": order.status, "r": "NONE", "i": order.order_id,
+            "l": last["qty"] if last else "0.00000000", "z": _s(order.executed),
+            "L": last["price"] if last else "0.00000000",
+            "n": last["commission"] if last else "0", "N": last["commissionAsset"] if last else None,
+            "T": order.update, "t": last["tradeId"] if last else -1, "w": order.working,
+            "m": False, "O": order.time, "Z": _s(order.quote),
+            "Y": _s(Decimal(last["qty"]) * Decimal(last["price"])) if last else "0.00000000",
+            "Q": "0.00000000",
+        }
+
+    def _position(self, *assets: str) -> dict:
+        return {"e": "outboundAccountPosition", "E": _ms(), "u": _ms(),
+                "B": [{"a": a, "f": _s(self._balance(a)[0]), "l": _s(self._balance(a)[1])}
+                      for a in assets]}
+
+
+class _Subscriber:
+    """
+    One WebSocket client: the handler thread reads control messages, a
+    sender thread delivers queued events (after the configured delay).
+    """
+
+    def __init__(self, conn, streams: set[str], delay: float):
+        self.conn = conn
+        self.streams = streams
+        self.delay = delay
+        self.queue: Queue = Queue()
+        threading.Thread(target=self._send_loop, daemon=True).start()
+
+    def put(self, text: str) -> None:
+        self.queue.put((time.monotonic() + self.delay, text))
+
+    def close(self) -> None:
+        self.queue.put(None)
+
+    def _send_loop(self) -> None:
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            due, text = item
+            wait = due - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                self.conn.send(text)
+            except Exception:
+                return
+
+
+class MockBinanceServer:
+    """
+    REST (http://host:port/api/v3/...) and WebSocket (ws://host:ws_port)
+    front-ends of one MockExchange. Port 0 picks free ports.
+    """
+
+    def __init__(self, exchange: MockExchange | None = None, host: str = "127.0.0.1",
+                 port: int = 0, ws_port: int = 0):
+        self.exchange = exchange or MockExchange()
+        self.host = host
+        self._subs: list[_Subscriber] = []
+        self._subs_lock = threading.Lock()
+        self.exchange.add_listener(self._on_event)
+        self._http = ThreadingHTTPServer((host, port), self._handler_class())
+        self._http.daemon_threads = True
+        from websockets.sync.server import serve
+        self._ws = serve(self._ws_handler, host, ws_port)
+
+    @property
+    def api_url(self) -> str:
+        return f"http://{self.host}:{self._http.server_address[1]}/api"
+
+    @property
+    def ws_url(self) -> str:
+        return f"ws://{self.host}:{self._ws.socket.getsockname()[1]}"
+
+    def start(self) -> "MockBinanceServer":
+        threading.Thread(target=self._http.serve_forever, name="mock-rest", daemon=True).start()
+        threading.Thread(target=self._ws.serve_forever, name="mock-ws", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._http.shutdown()
+        self._ws.shutdown()
+        with self._subs_lock:
+            for sub in self._subs:
+                sub.close()
+
+    # ---- REST ----
+    def _handler_class(self):
+        exchange = self.exchange
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"   # keep-alive, like the real API
+            disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+            def _serve(self, method: str):
+                url = urlsplit(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length).decode() if length else ""
+                params = dict(parse_qsl(url.query))
+                params.update(parse_qsl(body))
+                params.pop("signature", None)
+                path = url.path.removeprefix("/api/v3/")
+                cfg = exchange.config
+                delay = cfg.latency_ms + random.uniform(-cfg.jitter_ms, cfg.jitter_ms)
+                if delay > 0:
+                    time.sleep(delay / 1000)
+                headers = {}
+                try:
+                    if (method, path) not in WEIGHTS:
+                        raise MockError(-1000, f"Unsupported endpoint {method} {url.path}", 404)
+                    headers = exchange.admit(method, path, params)
+                    status, out = 200, exchange.handle(method, path, params)
+                except MockError as e:
+                    status, out = e.status, e.body()
+                    if e.retry_after:
+                        headers["Retry-After"] = str(e.retry_after)
+                data = json.dumps(out).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json;charset=UTF-8")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._serve("GET")
+
+            def do_POST(self):
+                self._serve("POST")
+
+            def do_PUT(self):
+                self._serve("PUT")
+
+            def do_DELETE(self):
+                self._serve("DELETE")
+
+            def log_message(self, fmt, *args):
+                pass
+
+        return Handler
+
+    # ---- WebSocket ----
+    def _on_event(self, kind: str, payload) -> None:
+        with self._subs_lock:
+            subs = list(self._subs)
+        if kind == "user":
+            text = json.dumps(payload)
+            for sub in subs:
+                if "user" in sub.streams:
+                    sub.put(text)
+            return
+        stream, data = payload
+        text = json.dumps({"stream": stream, "data": data})
+        for sub in subs:
+            if stream in sub.streams:
+                sub.put(text)
+
+    def _ws_handler(self, conn) -> None:
+        url = urlsplit(conn.request.path)
+        delay = self.exchange.config.ws_latency_ms / 1000
+        if url.path.startswith("/ws/"):
+            if url.path[4:] not in self.exchange.listen_keys:
+                conn.close(1008, "invalid listenKey")
+                return
+            sub = _Subscriber(conn, {"user"}, delay)
+        elif url.path == "/stream":
+            streams = set(dict(parse_qsl(url.query)).get("streams", "").split("/")) - {""}
+            sub = _Subscriber(conn, streams, delay)
+            self._send_snapshot(sub, streams)
+        else:
+            conn.close(1008, "unknown path")
+            return
+        with self._subs_lock:
+            self._subs.append(sub)
+        try:
+            for raw in conn:
+                self._control(sub, raw)
+        except Exception:
+            pass
+        finally:
+            with self._subs_lock:
+                self._subs.remove(sub)
+            sub.close()
+
+    def _control(self, sub: _Subscriber, raw) -> None:
+        try:
+            msg = json.loads(raw)
+        except ValueError:
+            return
+        params = set(msg.get("params") or [])
+        if msg.get("method") == "SUBSCRIBE":
+            new = params - sub.streams
+            sub.streams |= params
+            self._send_snapshot(sub, new)
+        elif msg.get("method") == "UNSUBSCRIBE":
+            sub.streams -= params
+        sub.put(json.dumps({"result": None, "id": msg.get("id")}))
+
+    def _send_snapshot(self, sub: _Subscriber, streams: set[str]) -> None:
+        for stream, data in self.exchange.snapshot_streams(streams):
+            sub.put(json.dumps({"stream": stream, "data": data}))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765, help="REST port")
+    ap.add_argument("--ws-port", type=int, default=8766, help="WebSocket port")
+    ap.add_argument("--latency", type=float, default=0.0, help="ms added to every REST response")
+    ap.add_argument("--jitter", type=float, default=0.0, help="+/- ms on top of --latency")
+    ap.add_argument("--ws-latency", type=float, default=0.0, help="ms delay of stream events")
+    ap.add_argument("--fee", default="0.001", help="commission rate")
+    ap.add_argument("--slippage", default="0", help="market fill slippage in %%")
+    ap.add_argument("--fill-levels", type=int, default=1, help="price levels per market fill")
+    ap.add_argument("--fill-ratio", default="1", help="filled share of market orders")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="share of failing requests")
+    ap.add_argument("--balance", action="append", default=[], metavar="ASSET=AMOUNT",
+                    help="starting balance (repeatable, default USDT=10000)")
+    ap.add_argument("--walk", type=float, default=0.0, metavar="SECONDS",
+                    help="random-walk all prices every SECONDS")
+    args = ap.parse_args()
+
+    config = MockConfig(
+        latency_ms=args.latency, jitter_ms=args.jitter, ws_latency_ms=args.ws_latency,
+        fee_rate=Decimal(args.fee), slippage_pct=Decimal(args.slippage),
+        fill_levels=args.fill_levels, fill_ratio=Decimal(args.fill_ratio), error_rate=args.error_rate,
+    )
+    balances = dict(b.split("=", 1) for b in args.balance) or None
+    exchange = MockExchange(config, balances=balances)
+    server = MockBinanceServer(exchange, args.host, args.port, args.ws_port).start()
+    if args.walk:
+        exchange.random_walk(args.walk)
+    print(f"Mock Binance running:\n  BINANCE_API_URL={server.api_url}\n  BINANCE_WS_URL={server.ws_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,46 @@
+import time
+T_START = time.perf_counter()  # startup timing reference, taken before the heavy imports
 import os
+import queue
 import sys
 from decimal import Decimal
 import tkinter as tk
 from tkinter import messagebox
 import customtkinter as ctk
-from binance.client import Client
 from binance.exceptions import BinanceAPIException, BinanceRequestException
 
+from autosl.client import build_client, build_paper_client
+from autosl.config import PAPER_BALANCES, app_path
+from autosl.connection import ConnectionManager
+from autosl.cost_basis import CostBasisBook
+from autosl.engine import ConfirmationRequired, EngineError, NothingToDo, TradingEngine, fmt_decimal
+from autosl.executor import CommandExecutor
+from autosl.journal import TradeJournal, default_path as journal_path
+from autosl.logbuffer import JsonlSink, LogPipeline
+from autosl.metrics import ClientMetrics, serve_metrics
+from autosl.open_orders import OpenOrderStore
+from autosl.orderbook import OrderBookMirror
+from autosl.paper import attach_streams
+from autosl.market_stream import MarketStream, PriceTick
+from autosl.scheduler import PRIORITY_ORDER, RequestScheduler, ScheduledClient
+from autosl.sizing import PercentSizer, SizeQuote
+from autosl.sl_defaults import SlDefaults
+from autosl.startup import StartupTimer
+from autosl.symbol_search import SymbolIndex
+from autosl.symbols import SymbolInfoCache
+from autosl.trailing import TrailingStopManager
+from autosl.user_stream import BalanceBook, UserDataStream
+from autosl.valuation import PortfolioValuation, follow_account, full_rebuild_total
+
+# =========================
+# STARTUP TIMING
+# =========================
+# report once the window is up and the first price and balances arrived
+startup = StartupTimer(T_START, expect=("first paint", "first price", "balances"),
+                       on_report=lambda line: log(line))
+startup.mark("imports")
+STARTUP_REPORT_TIMEOUT_MS = 30000
+
 # =========================
 # SIMPLE TOOLTIP HELPER
 # =========================
@@ -70,26 +104,32 @@ def add_tooltip(widget, text: str):
     ToolTip(widget, text)
 
 # =========================
-# TOP-SYMBOLE (Dropdown)
+# UI THREAD HELPERS
 # =========================
-def get_all_usdt_symbols() -> list[str]:
-    """
-    Liefert alle Binance Handelspaare, die mit 'USDT' enden.
-    Sortiert alphabetisch.
-    """
+# Background threads (streams) must not touch widgets; they post callables
+# here and the Tk mainloop runs them via root.after.
+UI_PUMP_MS = 30
+_ui_queue: queue.SimpleQueue = queue.SimpleQueue()
+def post_to_ui(fn, *args) -> None:
+    _ui_queue.put((fn, args))
+# blocking Binance calls never run on the Tk thread: reads (coalesced by key)
+# go to io_executor, trading actions to the single-threaded order_executor so
+# they execute in click order
+io_executor = CommandExecutor(workers=4, post=post_to_ui, name="io", log=lambda msg: log(msg))
+order_executor = CommandExecutor(workers=1, post=post_to_ui, name="order", log=lambda msg: log(msg))
+def pump_ui_queue():
     try:
-        tickers = client.get_all_tickers()
-    except Exception as e:
-        log(f"[ERROR] get_all_tickers: {e}")
-        return []
-
-    symbols = sorted([
-        t["symbol"]
-        for t in tickers
-        if t["symbol"].endswith("USDT")
-    ])
-
-    return symbols
+        while True:
+            try:
+                fn, args = _ui_queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                fn(*args)
+            except Exception as e:
+                log(f"[ERROR] UI callback: {e}")
+    finally:
+        root.after(UI_PUMP_MS, pump_ui_queue)
 
 # =========================
 # ENV / CLIENT
@@ -104,631 +144,236 @@ def get_env_or_die(name: str) -> str:
         )
         sys.exit(1)
     return value
-def create_client() -> Client: 
-    api_key = get_env_or_die("BINANCE_API_KEY") 
-    api_secret = get_env_or_die("BINANCE_API_SECRET") 
-    return Client(api_key, api_secret) 
-client: Client | None = None # will be set later
-
-# =========================
-# HELPER: ROUNDING / FILTERS
-# =========================
-def round_down_step(value: Decimal, step: Decimal) -> Decimal:
-    """
-    Round value down to the next multiple of step.
-    Example: value=1.234, step=0.01 -> 1.23
-    """
-    if step <= 0:
-        return value
-    return (value // step) * step
-def fmt_decimal(val: Decimal) -> str:
-    """
-    Render a Decimal without unnecessary trailing zeros (e.g. 0.01000000 -> 0.01).
-    """
-    q = val.normalize()
-    s = format(q, "f")
-    s = s.rstrip("0").rstrip(".")
-    return s or "0"
-def get_symbol_info_cached(symbol: str) -> dict:
-    info = client.get_symbol_info(symbol)
-    if not info:
-        raise ValueError(f"Symbol not found: {symbol}")
-    return info
-def get_filters(symbol: str):
-    """
-    Return (tick_size, step_size, min_notional) as Decimals.
-    """
-    info = get_symbol_info_cached(symbol)
-    filters = info.get("filters", [])
-
-    tick_size = Decimal("0.01")
-    step_size = Decimal("0.00000001")
-    min_notional = Decimal("0")
-
-    for f in filters:
-        ftype = f.get("filterType")
-        if ftype == "PRICE_FILTER":
-            tick_size = Decimal(f["tickSize"])
-        elif ftype == "LOT_SIZE":
-            step_size = Decimal(f["stepSize"])
-        elif ftype == "MIN_NOTIONAL":
-            min_notional = Decimal(f["minNotional"])
-
-    return tick_size, step_size, min_notional
+client_metrics = ClientMetrics()
+scheduler = RequestScheduler(log=lambda msg: log(msg))
+paper_exchange = None # PaperExchange when BINANCE_AUTOSL_PAPER is set
+def create_client() -> ScheduledClient:
+    global paper_exchange
+    if PAPER_BALANCES:
+        try:
+            paper_client, paper_exchange = build_paper_client(PAPER_BALANCES, scheduler, log=lambda msg: log(msg))
+        except ValueError as e:
+            messagebox.showerror("Paper Trading", f"BINANCE_AUTOSL_PAPER: {e}")
+            sys.exit(1)
+        return paper_client
+    api_key = get_env_or_die("BINANCE_API_KEY")
+    api_secret = get_env_or_die("BINANCE_API_SECRET")
+    return build_client(api_key, api_secret, client_metrics, scheduler)
+client: ScheduledClient | None = None # will be set later
+symbol_cache: SymbolInfoCache | None = None # will be set later
+balance_book = BalanceBook()
+valuation = PortfolioValuation("USDT")
+user_stream: UserDataStream | None = None # will be set later
+market_stream: MarketStream | None = None # will be set later
+engine: TradingEngine | None = None # will be set later
+order_books: OrderBookMirror | None = None # will be set later
+open_orders = OpenOrderStore(log=lambda msg: log(msg))
+journal: TradeJournal | None = None # will be set later
+cost_basis: CostBasisBook | None = None # will be set later
+trailing: TrailingStopManager | None = None # will be set later
 
 # =========================
 # LOG & ACCOUNT
 # =========================
+LOG_MAX_LINES = 2000   # lines kept in memory and in the textbox
+LOG_FLUSH_MS = 100     # textbox refresh rate cap (10 fps)
+log_sink = JsonlSink(app_path("binance_auto_sl.log.jsonl"))
+log_pipeline = LogPipeline(max_lines=LOG_MAX_LINES, sink=log_sink)
 def log(msg: str) -> None:
-    log_text.configure(state="normal")
-    log_text.insert("end", msg + "\n")
-    log_text.see("end")
-    log_text.configure(state="disabled")
-def get_usdt_balance() -> Decimal:
-    try:
-        bal = client.get_asset_balance(asset="USDT")
-    except (BinanceAPIException, BinanceRequestException) as e:
-        log(f"[ERROR] get_asset_balance(USDT): {e}")
-        return Decimal("0")
-    free_str = bal.get("free", "0")
+    """
+    Thread-safe and cheap: the line goes to the ring buffer / JSONL sink,
+    the textbox picks it up with the next batch.
+    """
+    log_pipeline.write(msg)
+def flush_log_widget():
     try:
-        return Decimal(free_str)
-    except Exception:
-        return Decimal("0")
+        lines = log_pipeline.drain()
+        if lines:
+            log_text.configure(state="normal")
+            log_text.insert("end", "\n".join(lines) + "\n")
+            # trim old lines so the widget does not grow without bound
+            line_count = int(log_text.index("end-1c").split(".")[0]) - 1
+            excess = line_count - LOG_MAX_LINES
+            if excess > 0:
+                log_text.delete("1.0", f"{excess + 1}.0")
+            log_text.see("end")
+            log_text.configure(state="disabled")
+    finally:
+        root.after(LOG_FLUSH_MS, flush_log_widget)
+def get_usdt_balance() -> Decimal:
+    return engine.usdt_balance()
 def get_total_usdt_value() -> Decimal:
     """
     Rough estimate of total account value in USDT.
+    Served from the incremental valuation once the user data stream is
+    synced; otherwise a full rebuild from all tickers.
     """
+    if balance_book.synced:
+        return valuation.total
     try:
         account = client.get_account()
         tickers = client.get_all_tickers()
     except (BinanceAPIException, BinanceRequestException) as e:
         log(f"[ERROR] get_account/get_all_tickers: {e}")
         return Decimal("0")
-
-    price_map = {t["symbol"]: Decimal(t["price"]) for t in tickers}
-    total = Decimal("0")
-
-    for b in account.get("balances", []):
-        asset = b.get("asset")
-        free_amt = Decimal(b.get("free", "0"))
-        locked_amt = Decimal(b.get("locked", "0"))
-        amount = free_amt + locked_amt
-        if amount <= 0:
-            continue
-
-        if asset == "USDT":
-            total += amount
-            continue
-
-        symbol = f"{asset}USDT"
-        if symbol in price_map:
-            total += amount * price_map[symbol]
-
-    return total
+    return full_rebuild_total(account.get("balances", []), tickers)
 def refresh_account_labels():
-    usdt = get_usdt_balance()
-    total = get_total_usdt_value()
-    label_usdt.configure(text=f"free: {usdt:.0f}")
-    label_total.configure(text=f"total: {total:.0f} USDT")
-
-# =========================
-# TRADING FUNCTIONS
-# =========================
-def buy_spot(symbol: str, qty_str: str) -> None:
-    try:
-        qty = Decimal(qty_str)
-    except Exception:
-        messagebox.showerror("Error", f"Invalid quantity: {qty_str}")
-        return
-
-    if qty <= 0:
-        messagebox.showerror("Error", "Quantity must be > 0.")
-        return
-
-    # Filter holen und Menge auf stepSize runden
-    try:
-        _, step_size, _ = get_filters(symbol)
-    except Exception as e:
-        log(f"[ERROR] Symbol info: {e}")
-        messagebox.showerror("Error", str(e))
-        return
-
-    qty_rounded = round_down_step(qty, step_size)
-    if qty_rounded <= 0:
-        messagebox.showerror("Error", "Rounded quantity is 0. Increase quantity.")
-        return
-
-    log(f"[INFO] Market BUY {symbol}, qty {qty_rounded} ...")
-
-    try:
-        order = client.order_market_buy(
-            symbol=symbol,
-            quantity=float(qty_rounded)
-        )
-        log(f"[OK] BUY OrderId={order.get('orderId')} Status={order.get('status')}")
-    except (BinanceAPIException, BinanceRequestException) as e:
-        log(f"[ERROR] Market-Buy failed: {e}")
-        messagebox.showerror("API Error", str(e))
-def buy_spot_with_sl(symbol: str, qty_str: str,
-                     sl_trigger_percent_str: str,
-                     sl_limit_percent_str: str) -> None:
-    # parse quantity
-    try:
-        qty = Decimal(qty_str)
-    except Exception:
-        messagebox.showerror("Error", f"Invalid quantity: {qty_str}")
-        return
-
-    if qty <= 0:
-        messagebox.showerror("Error", "Quantity must be > 0.")
-        return
-
-    # parse trigger %
-    try:
-        sl_trigger_percent = Decimal(sl_trigger_percent_str)
-    except Exception:
-        messagebox.showerror("Error", f"Invalid SL trigger %: {sl_trigger_percent_str}")
-        return
-
-    if sl_trigger_percent <= 0:
-        messagebox.showerror("Error", "SL trigger % must be > 0.")
-        return
-
-    # parse limit %
-    try:
-        sl_limit_percent = Decimal(sl_limit_percent_str)
-    except Exception:
-        messagebox.showerror("Error", f"Invalid SL limit %: {sl_limit_percent_str}")
-        return
-
-    if sl_limit_percent <= 0:
-        messagebox.showerror("Error", "SL limit % must be > 0.")
-        return
-
-    # optional: ensure limit deeper than trigger
-    if sl_limit_percent < sl_trigger_percent:
-        if not messagebox.askyesno(
-            "Warning",
-            "SL limit % is smaller than SL trigger %.\n"
-            "Usually the limit should be >= trigger (deeper).\n\nContinue anyway?"
-        ):
-            return
-
-    sl_trigger_factor = sl_trigger_percent / Decimal("100")
-    sl_limit_factor = sl_limit_percent / Decimal("100")
-
-    log(f"[INFO] Market BUY {symbol}, qty {qty}, "
-        f"SL trigger -{sl_trigger_percent}%, SL limit -{sl_limit_percent}% ...")
-
-    # filters
-    try:
-        tick_size, step_size, min_notional = get_filters(symbol)
-    except Exception as e:
-        log(f"[ERROR] Symbol info: {e}")
-        messagebox.showerror("Error", str(e))
-        return
-
-    qty_rounded = round_down_step(qty, step_size)
-    if qty_rounded <= 0:
-        messagebox.showerror("Error", "Rounded quantity is 0. Increase quantity.")
-        return
-
-    # 1) Market BUY
-    try:
-        buy_order = client.order_market_buy(
-            symbol=symbol,
-            quantity=float(qty_rounded)
-        )
-        log(f"[OK] BUY OrderId={buy_order.get('orderId')} Status={buy_order.get('status')}")
-    except (BinanceAPIException, BinanceRequestException) as e:
-        log(f"[ERROR] Market-Buy failed: {e}")
-        messagebox.showerror("API Error", str(e))
-        return
-
-    fills = buy_order.get("fills", [])
-    if not fills:
-        log("[ERROR] No fills -> cannot determine execution price.")
-        messagebox.showerror("Error", "No fills in buy order.")
-        return
-
-    # weighted avg price
-    total_amount = Decimal("0")
-    total_quote = Decimal("0")
-    for f in fills:
-        price = Decimal(f["price"])
-        q = Decimal(f["qty"])
-        total_amount += q
-        total_quote += price * q
-
-    if total_amount == 0:
-        log("[ERROR] total_amount == 0 – something went wrong.")
-        messagebox.showerror("Error", "total_amount == 0.")
-        return
-
-    avg_price = total_quote / total_amount
-    log(f"[INFO] Avg execution price: {avg_price}")
-
-    # 2) SL prices
-    raw_stop = avg_price * (Decimal("1") - sl_trigger_factor)
-    raw_limit = avg_price * (Decimal("1") - sl_limit_factor)
-
-    raw_stop = round_down_step(raw_stop, tick_size)
-    raw_limit = round_down_step(raw_limit, tick_size)
-
-    # Stop = näher am Markt, Limit = weiter unten
-    sl_stop_price = max(raw_stop, raw_limit)
-    sl_limit_price = min(raw_stop, raw_limit)
-
-    # 3) SL-MENGE: echten freien Bestand nach dem Buy nehmen
-    try:
-        info = get_symbol_info_cached(symbol)
-        base_asset = info.get("baseAsset")
-        if not base_asset:
-            messagebox.showerror("Error", f"baseAsset not found for {symbol}.")
-            return
-        balance = client.get_asset_balance(asset=base_asset)
-        free_amount = Decimal(balance.get("free", "0"))
-    except (BinanceAPIException, BinanceRequestException) as e:
-        log(f"[ERROR] get_asset_balance for SL qty: {e}")
-        messagebox.showerror("API Error", str(e))
-        return
-    except Exception as e:
-        messagebox.showerror("Error", str(e))
-        return
-
-    sl_qty = round_down_step(free_amount, step_size)
-    if sl_qty <= 0:
-        messagebox.showerror("Error", "Free balance for SL is 0 after fees/rounding.")
-        log("[ERROR] SL quantity after balance/fees is 0.")
-        return
-
-    log("[INFO] Place Stop-Loss-Limit:")
-    log(f"       Trigger (stopPrice): {sl_stop_price}")
-    log(f"       Limit   (price)    : {sl_limit_price}")
-    log(f"       Qty                 : {sl_qty}")
-
-    # 4) SL order
-    try:
-        sl_order = client.create_order(
-            symbol=symbol,
-            side="SELL",
-            type="STOP_LOSS_LIMIT",
-            timeInForce="GTC",
-            quantity=float(sl_qty),
-            price=str(sl_limit_price),
-            stopPrice=str(sl_stop_price),
-            newOrderRespType="FULL"
-        )
-        log(f"[OK] SL OrderId={sl_order.get('orderId')} Status={sl_order.get('status')}")
-    except (BinanceAPIException, BinanceRequestException) as e:
-        log(f"[ERROR] Stop-Loss order failed: {e}")
-        messagebox.showerror("API Error", str(e))
-def cancel_sl_orders(symbol: str) -> int:
-    """
-    Cancel SL/TP orders for a single symbol.
-    """
-    try:
-        open_orders = client.get_open_orders(symbol=symbol)
-    except (BinanceAPIException, BinanceRequestException) as e:
-        log(f"[ERROR] get_open_orders: {e}")
-        messagebox.showerror("API Error", str(e))
-        return 0
-
-    cancel_types = {"STOP_LOSS", "STOP_LOSS_LIMIT", "TAKE_PROFIT", "TAKE_PROFIT_LIMIT"}
-    count = 0
-
-    for o in open_orders:
-        if o.get("type") in cancel_types:
-            try:
-                client.cancel_order(symbol=symbol, orderId=o["orderId"])
-                log(f"[OK] Canceled SL/TP order: Id={o['orderId']} Type={o['type']}")
-                count += 1
-            except (BinanceAPIException, BinanceRequestException) as e:
-                log(f"[ERROR] cancel_order {o['orderId']}: {e}")
-
-    if count == 0:
-        log("[INFO] No SL/TP orders for this symbol.")
-    return count
-def cancel_all_sl_orders() -> int:
-    """
-    Cancel all SL/TP orders on the entire account.
-    (nicht genutzt, kann aber bleiben)
-    """
-    try:
-        open_orders = client.get_open_orders()
-    except (BinanceAPIException, BinanceRequestException) as e:
-        log(f"[ERROR] get_open_orders(all): {e}")
-        messagebox.showerror("API Error", str(e))
-        return 0
-
-    cancel_types = {"STOP_LOSS", "STOP_LOSS_LIMIT", "TAKE_PROFIT", "TAKE_PROFIT_LIMIT"}
-    count = 0
-
-    for o in open_orders:
-        if o.get("type") in cancel_types:
-            symbol = o.get("symbol")
-            try:
-                client.cancel_order(symbol=symbol, orderId=o["orderId"])
-                log(f"[OK] Canceled SL/TP order: {symbol} Id={o['orderId']} Type={o['type']}")
-                count += 1
-            except (BinanceAPIException, BinanceRequestException) as e:
-                log(f"[ERROR] cancel_order {symbol} {o['orderId']}: {e}")
-
-    if count == 0:
-        log("[INFO] No SL/TP orders on account.")
-    else:
-        log(f"[INFO] Cleared {count} SL/TP orders.")
-    return count
-def sell_all(symbol: str) -> None:
-    log(f"[INFO] Cancel SL/TP orders for {symbol} ...")
-    cancel_sl_orders(symbol)
-
-    try:
-        info = get_symbol_info_cached(symbol)
-    except Exception as e:
-        log(f"[ERROR] Symbol info: {e}")
-        messagebox.showerror("Error", str(e))
-        return
-
-    base_asset = info.get("baseAsset")
-    if not base_asset:
-        messagebox.showerror("Error", f"baseAsset not found for {symbol}.")
-        return
-
-    try:
-        balance = client.get_asset_balance(asset=base_asset)
-    except (BinanceAPIException, BinanceRequestException) as e:
-        log(f"[ERROR] get_asset_balance({base_asset}): {e}")
-        messagebox.showerror("API Error", str(e))
-        return
-
-    free_str = balance.get("free", "0")
-    try:
-        free_amount = Decimal(free_str)
-    except Exception:
-        messagebox.showerror("Error", f"Invalid balance: {free_str}")
-        return
-
-    if free_amount <= 0:
-        log(f"[INFO] No free balance of {base_asset} to sell.")
-        return
-
-    tick_size, step_size, min_notional = get_filters(symbol)
-    sell_qty = round_down_step(free_amount, step_size)
-    if sell_qty <= 0:
-        messagebox.showerror("Error", "Rounded sell quantity is 0.")
-        return
-
-    log(f"[INFO] Market SELL all: {fmt_decimal(sell_qty)} {base_asset} ...")
-
-    try:
-        order = client.order_market_sell(
-            symbol=symbol,
-            quantity=float(sell_qty)
-        )
-        log(f"[OK] SELL OrderId={order.get('orderId')} Status={order.get('status')}")
-    except (BinanceAPIException, BinanceRequestException) as e:
-        log(f"[ERROR] Market-Sell failed: {e}")
-        messagebox.showerror("API Error", str(e))
-def add_sl_for_free(symbol: str,
-                    sl_trigger_percent_str: str,
-                    sl_limit_percent_str: str) -> None:
-    """
-    Setzt eine SL-Order für den gesamten freien Bestand des Base-Coins
-    des gewählten Symbols (ohne neuen Buy).
-    """
-    # parse trigger %
-    try:
-        sl_trigger_percent = Decimal(sl_trigger_percent_str)
-    except Exception:
-        messagebox.showerror("Error", f"Invalid SL trigger %: {sl_trigger_percent_str}")
-        return
-
-    if sl_trigger_percent <= 0:
-        messagebox.showerror("Error", "SL trigger % must be > 0.")
-        return
-
-    # parse limit %
-    try:
-        sl_limit_percent = Decimal(sl_limit_percent_str)
-    except Exception:
-        messagebox.showerror("Error", f"Invalid SL limit %: {sl_limit_percent_str}")
+    if balance_book.synced:
+        # local data only, no round trip
+        usdt = balance_book.free("USDT")
+        sizer.set_balance(usdt)
+        label_usdt.configure(text=f"free: {usdt:.0f}")
+        label_total.configure(text=f"total: {valuation.total:.0f} USDT")
         return
 
-    if sl_limit_percent <= 0:
-        messagebox.showerror("Error", "SL limit % must be > 0.")
-        return
-
-    # optional: ensure limit deeper than trigger
-    if sl_limit_percent < sl_trigger_percent:
-        if not messagebox.askyesno(
-            "Warning",
-            "SL limit % is smaller than SL trigger %.\n"
-            "Usually the limit should be >= trigger (deeper).\n\nContinue anyway?"
-        ):
-            return
-
-    sl_trigger_factor = sl_trigger_percent / Decimal("100")
-    sl_limit_factor = sl_limit_percent / Decimal("100")
-
-    # Base asset & free balance
-    try:
-        info = get_symbol_info_cached(symbol)
-    except Exception as e:
-        log(f"[ERROR] Symbol info: {e}")
-        messagebox.showerror("Error", str(e))
-        return
-
-    base_asset = info.get("baseAsset")
-    if not base_asset:
-        messagebox.showerror("Error", f"baseAsset not found for {symbol}.")
-        return
-
-    try:
-        balance = client.get_asset_balance(asset=base_asset)
-    except (BinanceAPIException, BinanceRequestException) as e:
-        log(f"[ERROR] get_asset_balance({base_asset}): {e}")
-        messagebox.showerror("API Error", str(e))
-        return
-
-    free_str = balance.get("free", "0")
-    try:
-        free_amount = Decimal(free_str)
-    except Exception:
-        messagebox.showerror("Error", f"Invalid balance: {free_str}")
-        return
-
-    if free_amount <= 0:
-        log(f"[INFO] No free {base_asset} to protect with SL.")
-        messagebox.showinfo("Info", f"No free {base_asset} balance to set SL for.")
-        return
-
-    tick_size, step_size, min_notional = get_filters(symbol)
-    qty_rounded = round_down_step(free_amount, step_size)
-    if qty_rounded <= 0:
-        messagebox.showerror("Error", "Rounded quantity is 0.")
-        return
-
-    # current price as basis
-    try:
-        ticker = client.get_symbol_ticker(symbol=symbol)
-        current_price = Decimal(ticker["price"])
-    except (BinanceAPIException, BinanceRequestException) as e:
-        log(f"[ERROR] get_symbol_ticker({symbol}): {e}")
-        messagebox.showerror("API Error", str(e))
-        return
-
-    if current_price <= 0:
-        messagebox.showerror("Error", f"Invalid price for {symbol}: {current_price}")
-        return
-
-    avg_price = current_price  # Basis für SL-Prozent
-
-    raw_stop = avg_price * (Decimal("1") - sl_trigger_factor)
-    raw_limit = avg_price * (Decimal("1") - sl_limit_factor)
-
-    raw_stop = round_down_step(raw_stop, tick_size)
-    raw_limit = round_down_step(raw_limit, tick_size)
-
-    sl_stop_price = max(raw_stop, raw_limit)
-    sl_limit_price = min(raw_stop, raw_limit)
-
-    log(f"[INFO] Add SL for free {base_asset}:")
-    log(f"       Qty       : {fmt_decimal(qty_rounded)}")
-    log(f"       BasisPrice: {fmt_decimal(avg_price)}")
-    log(f"       Trigger   : {fmt_decimal(sl_stop_price)}")
-    log(f"       Limit     : {fmt_decimal(sl_limit_price)}")
-
-    try:
-        sl_order = client.create_order(
-            symbol=symbol,
-            side="SELL",
-            type="STOP_LOSS_LIMIT",
-            timeInForce="GTC",
-            quantity=float(qty_rounded),
-            price=str(sl_limit_price),
-            stopPrice=str(sl_stop_price),
-            newOrderRespType="FULL"
-        )
-        log(f"[OK] Added SL for free coins. OrderId={sl_order.get('orderId')} Status={sl_order.get('status')}")
-    except (BinanceAPIException, BinanceRequestException) as e:
-        log(f"[ERROR] Add-SL failed: {e}")
-        messagebox.showerror("API Error", str(e))
+    def on_result(res):
+        usdt, total = res
+        sizer.set_balance(usdt)
+        label_usdt.configure(text=f"free: {usdt:.0f}")
+        label_total.configure(text=f"total: {total:.0f} USDT")
+    io_executor.submit(
+        lambda: (get_usdt_balance(), get_total_usdt_value()),
+        key="account", on_result=on_result,
+    )
 
 # =========================
 # GUI CALLBACKS
 # =========================
-def on_calc_from_percent(event=None, show_error: bool = True):
+def read_percent_inputs(show_error: bool = True):
+    """
+    Validate symbol and % fields on the GUI thread. Returns (symbol, pct) or None.
+    """
     symbol = combo_symbol.get().strip().upper()
     pct_str = entry_pct.get().strip()
     if not symbol:
         if show_error:
             messagebox.showerror("Error", "Select a symbol.")
-        return
+        return None
     if not pct_str:
         if show_error:
             messagebox.showerror("Error", "Enter percentage.")
-        return
+        return None
 
     if not symbol.endswith("USDT"):
         if show_error:
             messagebox.showerror("Error", "Percent-buy is implemented only for USDT pairs.")
-        return
+        return None
 
     try:
         pct = Decimal(pct_str)
     except Exception:
         if show_error:
             messagebox.showerror("Error", f"Invalid percentage: {pct_str}")
-        return
+        return None
 
     if pct <= 0 or pct > 100:
         if show_error:
             messagebox.showerror("Error", "Percent must be between 0 and 100.")
+        return None
+    return symbol, pct
+def report_command_error(e: Exception):
+    """
+    on_error handler for executor commands (runs on the Tk thread).
+    """
+    if isinstance(e, NothingToDo):
+        messagebox.showinfo(e.title, str(e))
+    elif isinstance(e, EngineError):
+        messagebox.showerror(e.title, str(e))
+    elif isinstance(e, (BinanceAPIException, BinanceRequestException)):
+        messagebox.showerror("API Error", str(e))
+    else:
+        log(f"[ERROR] {e}")
+        messagebox.showerror("Error", str(e))
+def order_qty(symbol: str, pct: Decimal, quote: SizeQuote | None) -> str:
+    """
+    Quantity for + / +SL: the quote shown in the GUI when there is one,
+    else one REST calculation (balance / price not known locally yet).
+    """
+    if quote is not None:
+        log(f"[INFO] % buy: {quote.summary()}")
+        return fmt_decimal(quote.qty)
+    usdt_to_spend, qty, base_asset = engine.calc_qty_from_percent(symbol, pct)
+    post_to_ui(lambda: label_pct_info.configure(text=f"~ {usdt_to_spend:.2f} USDT"))
+    log(f"[INFO] % buy: {pct}% USDT -> {usdt_to_spend:.2f} USDT -> {fmt_decimal(qty)} {base_asset}")
+    return fmt_decimal(qty)
+def submit_order_command(fn, *args, **kwargs):
+    """
+    Trading actions: serial, in click order, and every request inside them
+    (including price lookups) runs with order priority. If the engine asks
+    for a confirmation, the user is asked here and the action is resubmitted.
+    """
+    def run():
+        with scheduler.boost(PRIORITY_ORDER):
+            return fn(*args, **kwargs)
+
+    def on_error(e: Exception):
+        if isinstance(e, ConfirmationRequired):
+            if messagebox.askyesno(e.title, str(e)):
+                submit_order_command(fn, *args, **kwargs, confirmed=True)
+            return
+        report_command_error(e)
+    return order_executor.submit(run, on_error=on_error)
+def on_calc_from_percent(event=None, show_error: bool = True):
+    """
+    Local only: hands symbol and % to the sizer, which recomputes from the
+    cached balance, price and filters if anything changed. No request.
+    """
+    parsed = read_percent_inputs(show_error)
+    if parsed is None:
+        sizer.set_target(combo_symbol.get().strip().upper(), None)
         return
-
-    usdt_balance = get_usdt_balance()
-    if usdt_balance <= 0:
-        if show_error:
-            messagebox.showerror("Error", "USDT balance is 0.")
-        return
-
-    usdt_to_spend = usdt_balance * pct / Decimal("100")
-
-    try:
-        ticker = client.get_symbol_ticker(symbol=symbol)
-        price = Decimal(ticker["price"])
-    except (BinanceAPIException, BinanceRequestException) as e:
-        if show_error:
-            log(f"[ERROR] get_symbol_ticker({symbol}): {e}")
-            messagebox.showerror("API Error", str(e))
-        return
-
-    if price <= 0:
-        if show_error:
-            messagebox.showerror("Error", f"Invalid price for {symbol}: {price}")
-        return
-
-    base_amount = usdt_to_spend / price
-    tick_size, step_size, min_notional = get_filters(symbol)
-    base_amount_rounded = round_down_step(base_amount, step_size)
-    rounded_str = fmt_decimal(base_amount_rounded)
-
-    info = get_symbol_info_cached(symbol)
-    base_asset = info.get("baseAsset", "BASE")
-
-    label_pct_info.configure(
-        text=f"~ {usdt_to_spend:.2f} USDT"
-    )
-    if show_error:
-        log(f"[INFO] % buy: {pct}% USDT -> {usdt_to_spend:.2f} USDT -> {fmt_decimal(base_amount_rounded)} {base_asset}")
-    return rounded_str
+    symbol, pct = parsed
+    sizer.set_target(symbol, pct)
+    tick = market_stream.price(symbol)
+    if tick is not None:
+        sizer.set_price(symbol, tick.price)
+    quote = sizer.quote_for(symbol, pct)
+    if show_error and quote is not None:
+        log(f"[INFO] % buy: {quote.summary()}")
 def on_buy_spot():
-    # immer zuerst kalkulieren
-    qty = on_calc_from_percent()
-    symbol = combo_symbol.get().strip().upper()
-    if not symbol or not qty:
-        messagebox.showerror("Error", "Symbol and quantity required.")
+    # Menge aus der aktuellen Kalkulation (Fallback: REST)
+    parsed = read_percent_inputs()
+    if parsed is None:
         return
-    buy_spot(symbol, qty)
+    symbol, pct = parsed
+    quote = sizer.quote_for(symbol, pct)
+
+    def run():
+        qty = order_qty(symbol, pct, quote)
+        engine.buy_spot(symbol, qty)
+    submit_order_command(run)
 def on_buy_spot_sl():
-    # auch hier immer zuerst Calc ausführen
-    qty = on_calc_from_percent()
-    symbol = combo_symbol.get().strip().upper()
+    # auch hier die Menge aus der aktuellen Kalkulation
+    parsed = read_percent_inputs()
     sl_trig = entry_sl_trigger.get().strip()
     sl_lim = entry_sl_limit.get().strip()
+    if parsed is None:
+        return
+    symbol, pct = parsed
 
-    if not symbol or not qty or not sl_trig or not sl_lim:
+    if not sl_trig or not sl_lim:
         messagebox.showerror("Error", "Symbol, quantity, SL trigger % and SL limit % required.")
         return
-    buy_spot_with_sl(symbol, qty, sl_trig, sl_lim)
+
+    trail = bool(trail_var.get())
+    quote = sizer.quote_for(symbol, pct)
+
+    def run(confirmed: bool = False):
+        qty = order_qty(symbol, pct, quote)
+        res = engine.buy_spot_with_sl(symbol, qty, sl_trig, sl_lim, confirmed=confirmed)
+        if trail:
+            trailing.protect_result(res, sl_trig, sl_lim)
+    submit_order_command(run)
 def on_sell_all():
     symbol = combo_symbol.get().strip().upper()
     if not symbol:
         messagebox.showerror("Error", "Symbol required.")
         return
-    sell_all(symbol)
+
+    def run():
+        trailing.release(symbol)
+        engine.sell_all(symbol)
+    submit_order_command(run)
 def on_add_sl_for_free():
     symbol = combo_symbol.get().strip().upper()
     sl_trig = entry_sl_trigger.get().strip()
@@ -737,15 +382,52 @@ def on_add_sl_for_free():
     if not symbol or not sl_trig or not sl_lim:
         messagebox.showerror("Error", "Symbol, SL trigger % and SL limit % required.")
         return
-    add_sl_for_free(symbol, sl_trig, sl_lim)
+    trail = bool(trail_var.get())
+    anchor = "entry" if entry_var.get() else "price"
+
+    def run(confirmed: bool = False):
+        # a trailed SL is replaced by the new one
+        trailing.release(symbol)
+        res = engine.add_sl_for_free(symbol, sl_trig, sl_lim, confirmed=confirmed, anchor=anchor)
+        if trail:
+            trailing.protect_result(res, sl_trig, sl_lim)
+    submit_order_command(run)
+def on_protect_all():
+    sl_trig = entry_sl_trigger.get().strip()
+    sl_lim = entry_sl_limit.get().strip()
+    if not sl_trig or not sl_lim:
+        messagebox.showerror("Error", "SL trigger % and SL limit % required.")
+        return
+    if not messagebox.askyesno(
+        "Protect all",
+        f"Place a stop-loss (-{sl_trig}% / -{sl_lim}%) for EVERY free balance with a USDT pair?"
+    ):
+        return
+    trail = bool(trail_var.get())
+
+    def run(confirmed: bool = False):
+        report = engine.protect_all(sl_trig, sl_lim, confirmed=confirmed)
+        if trail:
+            for res in report.placed:
+                trailing.protect_result(res, sl_trig, sl_lim)
+    submit_order_command(run)
 def on_clear_all_sl():
     symbol = combo_symbol.get().strip().upper()
     if not symbol:
         messagebox.showerror("Error", "Select a symbol.")
         return
-    cancel_sl_orders(symbol)
+
+    def run():
+        trailing.release(symbol)
+        engine.cancel_sl_orders(symbol)
+    submit_order_command(run)
 def on_refresh_balance():
-    refresh_account_labels()
+    def run():
+        try:
+            user_stream.resync()
+        except (BinanceAPIException, BinanceRequestException) as e:
+            log(f"[ERROR] get_account: {e}")
+    io_executor.submit(run, key="resync", on_result=lambda _: refresh_account_labels())
 def on_sl_trigger_change(event=None):
     text = entry_sl_trigger.get().strip()
     if not text:
@@ -755,33 +437,124 @@ def on_sl_trigger_change(event=None):
     except Exception:
         return
 
-    new_limit = trig + Decimal("0.1")
+    new_limit = sl_defaults.limit_for(trig, combo_symbol.get().strip().upper())
     entry_sl_limit.delete(0, "end")
-    entry_sl_limit.insert(0, str(new_limit))
-def on_symbol_type(event=None):
+    entry_sl_limit.insert(0, fmt_decimal(new_limit))
+_sl_fields_applied = ("", "")
+def apply_sl_defaults(symbol: str):
+    """
+    Put the sweep suggestion for this symbol into the SL fields, unless the
+    user has edited them since the last suggestion.
+    """
+    global _sl_fields_applied
+    if (entry_sl_trigger.get().strip(), entry_sl_limit.get().strip()) != _sl_fields_applied:
+        return
+    trig, lim = (fmt_decimal(v) for v in sl_defaults.get(symbol))
+    for entry, text in ((entry_sl_trigger, trig), (entry_sl_limit, lim)):
+        entry.delete(0, "end")
+        entry.insert(0, text)
+    _sl_fields_applied = (trig, lim)
+SYMBOL_SEARCH_DEBOUNCE_MS = 120
+_symbol_search_after_id = None
+def build_symbol_index() -> SymbolIndex:
     """
-    Filtere das Dropdown erst ab 3 Zeichen und lasse es leer darunter.
+    Index over all trading pairs (every quote asset) from the exchange-info cache.
     """
+    symbols = symbol_cache.symbols()
+    bases = {s: symbol_cache.filters(s).base_asset for s in symbols}
+    return SymbolIndex(symbols, bases)
+def usdt_symbols() -> list[str]:
+    """
+    All USDT pairs for the dropdown, from the exchange-info cache (no request).
+    """
+    return symbol_cache.symbols(quote="USDT")
+def rebuild_symbol_index():
+    # called by the exchange-info cache after each refresh (any thread)
+    global symbol_index, ALL_USDT
+    symbol_index = build_symbol_index()
+    ALL_USDT = usdt_symbols()
+    sizer.filters_changed()
+    startup.mark("symbols", "exchange info")
+    post_to_ui(_on_symbols_loaded)
+def _on_symbols_loaded():
+    global price_symbol
+    combo_symbol.configure(values=ALL_USDT)
+    # a cold start could not subscribe the selected symbol yet
+    price_symbol = ""
+def _apply_symbol_search():
+    global _symbol_search_after_id
+    _symbol_search_after_id = None
     text = combo_symbol.get().strip().upper()
-    # choose filter list
-    options = ALL_USDT if len(text) < 3 else [s for s in ALL_USDT if text in s]
-    if not text:
-        options = ALL_USDT
+    options = ALL_USDT if not text else symbol_index.search(text)
     combo_symbol.configure(values=options)
+def on_symbol_type(event=None):
+    """
+    Debounced: search runs once typing pauses for SYMBOL_SEARCH_DEBOUNCE_MS.
+    """
+    global _symbol_search_after_id
+    if _symbol_search_after_id is not None:
+        root.after_cancel(_symbol_search_after_id)
+    _symbol_search_after_id = root.after(SYMBOL_SEARCH_DEBOUNCE_MS, _apply_symbol_search)
 
 # =========================
 # region START: CLIENT & GUI (customtkinter)
 # =========================
 client = create_client()
+startup.mark("client")
+symbol_cache = SymbolInfoCache(client, log=log)
+# warm start from disk; a cold start paints first and fills in via the listener
+if symbol_cache.ensure_loaded(block=False):
+    startup.mark("symbols", "disk cache")
+scheduler.configure(symbol_cache.rate_limits)
+# warm HTTPS pool + server time offset / recvWindow, kept fresh in background
+connection = ConnectionManager(client, log=log)
+client.param_hook = connection.apply_recv_window
+connection.start()
+symbol_cache.add_listener(lambda: scheduler.configure(symbol_cache.rate_limits))
+user_stream = UserDataStream(client, balance_book, log=log)
+market_stream = MarketStream(log=log)
+# depth of the selected symbol: fill / slippage estimates before an order
+order_books = OrderBookMirror(client, market_stream, log=log)
+# orders, fills and latencies to SQLite (`python -m autosl journal` for the report)
+journal = TradeJournal(journal_path(paper=paper_exchange is not None), log=log)
+# entry price / PnL from myTrades, incremental per symbol (paper: this session only)
+cost_basis = CostBasisBook(client, symbol_cache, persist=paper_exchange is None, log=log)
+cost_basis.load()
+engine = TradingEngine(client, symbol_cache, balance_book, scheduler=scheduler, log=log,
+                       background=io_executor.submit, depth=order_books, open_orders=open_orders,
+                       journal=journal, cost_basis=cost_basis)
+trailing = TrailingStopManager(client, symbol_cache, log=log,
+                               path=app_path("trailing.paper.json") if paper_exchange else None,
+                               open_orders=open_orders, journal=journal)
+# open orders from the user data stream; REST only to reconcile
+user_stream.add_handler("executionReport", open_orders.on_execution_report)
+user_stream.add_handler("executionReport", journal.on_execution_report)
+user_stream.add_handler("executionReport", trailing.on_execution_report)
+# not trusted for cancels from a disconnect until the reconcile after the reconnect
+# (a manual balance refresh while the socket is down does not count)
+user_stream.add_resync_listener(
+    lambda: open_orders.stream_resynced() if user_stream.connected else open_orders.request_reconcile())
+user_stream.add_disconnect_listener(open_orders.mark_stale)
+user_stream.add_handler("executionReport", cost_basis.on_execution_report)
+user_stream.add_resync_listener(cost_basis.request_sync)
+# % field -> USDT / qty from cached balance, streamed price and filters
+sizer = PercentSizer(lambda s: symbol_cache.filters(s) if s in symbol_cache else None, log=log)
+# SL trigger / limit suggestions from `python -m autosl sweep --save`
+sl_defaults = SlDefaults(log=log)
+if sl_defaults.load():
+    log("[INFO] SL defaults from parameter sweep: trigger {} %, limit {} %".format(
+        *(fmt_decimal(v) for v in sl_defaults.default)))
 
 # dynamisch: alle USDT Paare
-ALL_USDT = get_all_usdt_symbols()
+ALL_USDT = usdt_symbols()
+symbol_index = build_symbol_index()
+symbol_cache.add_listener(rebuild_symbol_index)
 
 ctk.set_appearance_mode("dark")
 ctk.set_default_color_theme("dark-blue")
 
 root = ctk.CTk()
-root.title("Binance Auto SL/TP")
+root.title("Binance Auto SL/TP [PAPER]" if paper_exchange else "Binance Auto SL/TP")
 x=300
 y=500
 root.geometry(f"{x}x{y}")
@@ -797,7 +570,7 @@ main_frame.grid(row=0, column=0, sticky="nsew", padx=0, pady=0)
 # layout for 5 columns now (all even)
 for col in range(5):
     main_frame.grid_columnconfigure(col, weight=1)
-main_frame.grid_rowconfigure(7, weight=1)
+main_frame.grid_rowconfigure(8, weight=1)
 
 # Account info
 info_frame = ctk.CTkFrame(main_frame, fg_color="transparent")
@@ -810,6 +583,12 @@ label_usdt.grid(row=0, column=0, sticky="w", padx=2, pady=2)
 label_total = ctk.CTkLabel(info_frame, text="total: - USDT", font=base_font, anchor="w")
 label_total.grid(row=0, column=1, sticky="w", padx=2, pady=2)
 
+label_sl_status = ctk.CTkLabel(info_frame, text="SL: -", font=base_font, anchor="e")
+label_sl_status.grid(row=0, column=2, sticky="e", padx=2, pady=2)
+
+label_pnl = ctk.CTkLabel(info_frame, text="PnL: -", font=("Segoe UI", 12), anchor="w")
+label_pnl.grid(row=1, column=0, columnspan=3, sticky="w", padx=2, pady=0)
+
 # Symbol dropdown + Quantity in one row (1/2/1/1)
 label_symbol = ctk.CTkLabel(main_frame, text="Coin:", font=base_font, anchor="w")
 label_symbol.grid(row=1, column=0, sticky="ew", padx=2, pady=2)
@@ -830,17 +609,31 @@ label_price.grid(row=1, column=3, sticky="ew", padx=2, pady=2)
 label_price_value = ctk.CTkLabel(main_frame, text="-", font=base_font, anchor="w")
 label_price_value.grid(row=1, column=4, sticky="ew", padx=2, pady=2)
 
+# Trailing SL / protect all / SL* at entry (2/1/1/1)
+trail_var = tk.BooleanVar(value=False)
+check_trail = ctk.CTkCheckBox(main_frame, text="Trail SL", variable=trail_var, font=base_font)
+check_trail.grid(row=2, column=0, columnspan=2, sticky="w", padx=2, pady=2)
+
+btn_protect_all = ctk.CTkButton(main_frame, text="SL**", command=on_protect_all, font=base_font)
+btn_protect_all.grid(row=2, column=2, sticky="ew", padx=2, pady=2)
+
+entry_var = tk.BooleanVar(value=False)
+check_entry = ctk.CTkCheckBox(main_frame, text="@Entry", variable=entry_var, font=("Segoe UI", 12))
+check_entry.grid(row=2, column=3, sticky="w", padx=2, pady=2)
+
+label_trailing = ctk.CTkLabel(main_frame, text="trailing: 0", font=("Segoe UI", 12), anchor="w")
+label_trailing.grid(row=2, column=4, sticky="ew", padx=2, pady=2)
+
 # SL Trigger / Limit % (3/1/1)
 label_sl = ctk.CTkLabel(main_frame, text="SL Trig/Lim %", font=base_font, anchor="w")
 label_sl.grid(row=3, column=0, columnspan=3, sticky="ew", padx=2, pady=2)
 
 entry_sl_trigger = ctk.CTkEntry(main_frame, font=base_font)
-entry_sl_trigger.insert(0, "0.5")
 entry_sl_trigger.grid(row=3, column=3, sticky="ew", padx=2, pady=2)
 
 entry_sl_limit = ctk.CTkEntry(main_frame, font=base_font)
-entry_sl_limit.insert(0, "0.6")
 entry_sl_limit.grid(row=3, column=4, sticky="ew", padx=2, pady=2)
+apply_sl_defaults(combo_symbol.get())
 
 entry_sl_trigger.bind("<KeyRelease>", on_sl_trigger_change)
 entry_sl_trigger.bind("<FocusOut>", on_sl_trigger_change)
@@ -858,9 +651,13 @@ entry_pct.bind("<FocusOut>", lambda e: on_calc_from_percent(show_error=False))
 label_pct_info = ctk.CTkLabel(main_frame, text="", font=("Segoe UI", 12), anchor="w")
 label_pct_info.grid(row=4, column=2, columnspan=3, sticky="ew", padx=2, pady=2)
 
+# Pre-trade estimate from the local order book (5)
+label_book = ctk.CTkLabel(main_frame, text="book: -", font=("Segoe UI", 12), anchor="w")
+label_book.grid(row=5, column=0, columnspan=5, sticky="ew", padx=2, pady=0)
+
 # Buttons (1/1/1/1/1)
 btn_frame = ctk.CTkFrame(main_frame, fg_color="transparent")
-btn_frame.grid(row=5, column=0, columnspan=5, padx=2, pady=2, sticky="ew")
+btn_frame.grid(row=6, column=0, columnspan=5, padx=2, pady=2, sticky="ew")
 for col in range(5):
     btn_frame.grid_columnconfigure(col, weight=1)
 
@@ -881,14 +678,17 @@ btn_clear_sl.grid(row=0, column=4, padx=2, pady=2, sticky="ew")
 
 # Log
 label_log = ctk.CTkLabel(main_frame, text="Log:", font=base_font, anchor="w")
-label_log.grid(row=6, column=0, columnspan=5, sticky="w", padx=2, pady=2)
+label_log.grid(row=7, column=0, columnspan=4, sticky="w", padx=2, pady=2)
+
+btn_stats = ctk.CTkButton(main_frame, text="Stats", command=lambda: open_stats_panel(), font=base_font)
+btn_stats.grid(row=7, column=4, padx=2, pady=2, sticky="ew")
 
 log_text = ctk.CTkTextbox(
     main_frame,
     height=260,
     font=mono_font
 )
-log_text.grid(row=7, column=0, columnspan=5, sticky="nsew", padx=2, pady=2)
+log_text.grid(row=8, column=0, columnspan=5, sticky="nsew", padx=2, pady=2)
 log_text.configure(state="disabled")
 
 # endregion
@@ -927,34 +727,285 @@ def schedule_resize(event=None):
 
 root.bind("<Configure>", schedule_resize)
 schedule_resize()
+flush_log_widget()
 log("[INFO] Binance Auto SL/TP started.")
-on_calc_from_percent()
+startup.mark("window")
+root.after_idle(lambda: startup.mark("first paint"))
+root.after(STARTUP_REPORT_TIMEOUT_MS, startup.finish)
+on_calc_from_percent(show_error=False)
 # =========================
-# AUTO REFRESH
+# % SIZING (local inputs)
 # =========================
-def auto_refresh():
-    try:
-        refresh_account_labels()
-    finally:
-        root.after(5000, auto_refresh)
-auto_refresh()
+_pct_info_pending = False
+def _flush_pct_info():
+    global _pct_info_pending
+    _pct_info_pending = False
+    quote = sizer.quote
+    if quote is not None:
+        label_pct_info.configure(text=f"~ {quote.usdt_to_spend:.2f} USDT")
+        return
+    missing = sizer.missing()
+    label_pct_info.configure(text=f"~ - (no {missing} yet)" if missing not in ("", "input") else "")
+def on_size_quote(quote: SizeQuote | None):
+    # balance / price updates come from the stream threads: coalesce
+    global _pct_info_pending
+    if _pct_info_pending:
+        return
+    _pct_info_pending = True
+    post_to_ui(_flush_pct_info)
+
+sizer.add_listener(on_size_quote)
+_flush_pct_info()
+# =========================
+# ACCOUNT LABELS (user data stream)
+# =========================
+_account_labels_pending = False
+def _flush_account_labels():
+    global _account_labels_pending
+    _account_labels_pending = False
+    refresh_account_labels()
+def on_balances_changed(changed_assets: set[str]):
+    # runs on the stream thread: coalesce bursts into one label update
+    global _account_labels_pending
+    if _account_labels_pending:
+        return
+    _account_labels_pending = True
+    post_to_ui(_flush_account_labels)
+
+follow_account(valuation, balance_book, market_stream, user_stream, symbol_cache, client,
+               log=log, submit=lambda fn: io_executor.submit(fn, key="seed"))
+balance_book.add_listener(on_balances_changed)
+valuation.add_total_listener(lambda total: on_balances_changed(set()))
+user_stream.add_resync_listener(lambda: startup.mark("balances"))
+
+# =========================
+# API STATS PANEL
+# =========================
+STATS_REFRESH_MS = 1000
+stats_window = None
+def open_stats_panel():
+    """
+    Per-endpoint latency / errors and the last rate-limit header values.
+    """
+    global stats_window
+    if stats_window is not None and stats_window.winfo_exists():
+        stats_window.lift()
+        return
+    stats_window = ctk.CTkToplevel(root)
+    stats_window.title("API Stats")
+    stats_window.geometry("520x300")
+    stats_window.wm_attributes("-topmost", True)
+    text = ctk.CTkTextbox(stats_window, font=mono_font)
+    text.pack(fill="both", expand=True, padx=2, pady=2)
+
+    def refresh():
+        if not stats_window.winfo_exists():
+            return
+        text.configure(state="normal")
+        text.delete("1.0", "end")
+        lines = client_metrics.summary_lines()
+        lines.append("")
+        for name, free in sorted(scheduler.status().items()):
+            lines.append(f"budget {name}: {free:.0f} free")
+        lines.append(f"shed requests: {scheduler.shed_count}")
+        lines.append(f"orders {connection.latency_report()}")
+        lines.append(f"clock offset {connection.offset_ms} ms, rtt {connection.rtt_ms:.0f} ms, "
+                     f"recvWindow {connection.recv_window}")
+        text.insert("end", "\n".join(lines))
+        text.configure(state="disabled")
+        stats_window.after(STATS_REFRESH_MS, refresh)
+    refresh()
+
+metrics_port = os.getenv("BINANCE_AUTOSL_METRICS_PORT")
+if metrics_port:
+    serve_metrics(client_metrics, int(metrics_port))
+    log(f"[INFO] Prometheus metrics on http://127.0.0.1:{metrics_port}/metrics")
 
+# =========================
+# LIVE PRICE (WebSocket)
+# =========================
+PRICE_REST_FALLBACK_S = 5.0  # use REST if the stream has no tick this long
+price_symbol = ""
+_price_label_pending = False
+_last_rest_price = 0.0
+def set_price_label(price) -> None:
+    if price is None:
+        label_price_value.configure(text="n/a")
+    else:
+        startup.mark("first price")
+        label_price_value.configure(text=format(price, ".5g"))  # show 5 significant digits
+    update_pnl_label(price)
+def _flush_price_label():
+    global _price_label_pending
+    _price_label_pending = False
+    tick = market_stream.price(price_symbol)
+    if tick is not None:
+        set_price_label(tick.price)
+def on_price_tick(tick: PriceTick):
+    # runs on the stream thread: only schedule one label update at a time
+    global _price_label_pending
+    if tick.symbol != price_symbol:
+        return
+    sizer.set_price(tick.symbol, tick.price)
+    if _price_label_pending:
+        return
+    _price_label_pending = True
+    post_to_ui(_flush_price_label)
 def refresh_symbol_value():
+    """
+    Keep the stream subscribed to the selected symbol. Falls back to one
+    REST ticker call per second only while the stream has no fresh tick.
+    """
+    global price_symbol, _last_rest_price
     symbol = combo_symbol.get().strip().upper()
-    if not symbol:
-        label_price_value.configure(text="-")
-        root.after(1000, refresh_symbol_value)
-        return
     try:
-        ticker = client.get_symbol_ticker(symbol=symbol)
-        price = Decimal(ticker["price"])
-        price_str = format(price, ".5g")  # show 5 significant digits
-        label_price_value.configure(text=price_str)
-    except (BinanceAPIException, BinanceRequestException):
-        label_price_value.configure(text="n/a")
-    except Exception:
-        label_price_value.configure(text="n/a")
-    root.after(1000, refresh_symbol_value)
+        if symbol != price_symbol:
+            price_symbol = symbol
+            label_price_value.configure(text="-")
+            known = symbol in symbol_cache
+            market_stream.watch_prices("gui", [symbol] if known else [])
+            order_books.watch("gui", [symbol] if known else [])
+            refresh_sl_status()
+            on_calc_from_percent(show_error=False)
+            update_pnl_label(None)
+            if known:
+                apply_sl_defaults(symbol)
+                cost_basis.track([symbol])
+        if not symbol:
+            return
+        update_book_label(symbol)
+
+        tick = market_stream.price(symbol)
+        now = time.time()
+        if tick is not None and now - tick.ts < PRICE_REST_FALLBACK_S:
+            return
+        if now - _last_rest_price < 1.0:
+            return
+        _last_rest_price = now
+
+        def on_result(price):
+            if price is not None:
+                sizer.set_price(symbol, price)
+            if symbol == price_symbol:
+                set_price_label(price)
+        io_executor.submit(
+            lambda: Decimal(client.get_symbol_ticker(symbol=symbol)["price"]),
+            key="price", on_result=on_result,
+            on_error=lambda e: on_result(None),
+        )
+    finally:
+        root.after(250, refresh_symbol_value)
+
+market_stream.add_price_listener(on_price_tick)
+
+def update_book_label(symbol: str):
+    """
+    Expected fills of "+" (the % quantity) and "-*" (the free balance) and
+    the SL limit % the bids can absorb, all from the local book.
+    """
+    book = order_books.book(symbol)
+    if book is None:
+        label_book.configure(text="book: syncing ..." if symbol in symbol_cache else "book: -")
+        return
+    parts = []
+    quote = sizer.quote
+    if quote is not None and quote.symbol == symbol and quote.qty > 0:
+        qty = quote.qty
+        est = order_books.estimate(symbol, "BUY", qty)
+        if est is not None:
+            parts.append(f"buy ~{est.avg_price:.5g} {est.slippage_pct:+.2f}%" + ("" if est.complete else "!"))
+        try:
+            lim = order_books.suggest_limit_pct(symbol, qty, Decimal(entry_sl_trigger.get().strip()))
+        except Exception:
+            lim = None
+        if lim is not None:
+            parts.append(f"SL lim >= {lim}%")
+    base = symbol_cache.filters(symbol).base_asset
+    free_base = balance_book.free(base) if balance_book.synced and base else Decimal("0")
+    if free_base > 0:
+        est = order_books.estimate(symbol, "SELL", free_base)
+        if est is not None:
+            parts.append(f"sell ~{est.avg_price:.5g} {-est.slippage_pct:+.2f}%" + ("" if est.complete else "!"))
+    label_book.configure(text="book: " + (" | ".join(parts) if parts else "synced"))
+
+# =========================
+# SL STATUS (local open orders)
+# =========================
+_sl_status_pending = False
+_sl_status_synced = False
+def refresh_sl_status():
+    global _sl_status_pending, _sl_status_synced
+    _sl_status_pending = False
+    _sl_status_synced = open_orders.synced
+    status = open_orders.sl_status(price_symbol) if _sl_status_synced else "?"
+    label_sl_status.configure(text=f"SL: {status}",
+                              text_color="orange" if status == "triggered" else label_total.cget("text_color"))
+def on_open_orders_changed(symbols: set[str]):
+    # stream thread: one label update per burst, only for the shown symbol
+    global _sl_status_pending
+    if _sl_status_pending or (price_symbol not in symbols and open_orders.synced == _sl_status_synced):
+        return
+    _sl_status_pending = True
+    post_to_ui(refresh_sl_status)
+
+open_orders.add_listener(on_open_orders_changed)
+
+# =========================
+# POSITION PnL (cost basis)
+# =========================
+def update_pnl_label(price) -> None:
+    """
+    Unrealized PnL of the selected coin against its average entry price,
+    plus what was realized on the pair; local data only.
+    """
+    pos = cost_basis.position(price_symbol) if price_symbol else None
+    if pos is None:
+        label_pnl.configure(text="PnL: -" if price_symbol in symbol_cache else "")
+        return
+    text = f"realized {pos.realized:+.2f}"
+    entry = pos.avg_price
+    if entry is None:
+        text = "PnL: no position, " + text
+    else:
+        if price is None:
+            tick = market_stream.price(price_symbol)
+            price = tick.price if tick is not None else None
+        if price is not None:
+            pnl = pos.unrealized(price)
+            text = (f"PnL: {pnl:+.2f} ({(price / entry - 1) * 100:+.2f}%) "
+                    f"@ {format(entry, '.5g')}, " + text)
+        else:
+            text = f"entry {format(entry, '.5g')}, " + text
+    label_pnl.configure(text=text)
+def on_cost_basis_changed(symbols: set[str]):
+    if price_symbol in symbols:
+        post_to_ui(update_pnl_label, None)
+
+cost_basis.add_listener(on_cost_basis_changed)
+
+# =========================
+# TRAILING STOPS
+# =========================
+def on_trailing_changed(symbols: set[str]):
+    # trailed pairs get the fast book ticker, not only the 1s miniTicker
+    market_stream.watch_prices("trailing", symbols)
+    post_to_ui(lambda: label_trailing.configure(text=f"trailing: {len(symbols)}"))
+
+trailing.add_listener(on_trailing_changed)
+market_stream.add_price_listener(lambda tick: trailing.on_price(tick.symbol, tick.price))
+trailing.load()
+trailing.start()
+
+market_stream.start()
+if paper_exchange is not None:
+    # simulated fills from the live prices, events instead of the user socket
+    attach_streams(paper_exchange, market_stream, user_stream, depth=order_books)
+    log(f"[INFO] PAPER trading ({PAPER_BALANCES}): orders never reach Binance.")
+else:
+    user_stream.start()
+open_orders.start(client)
+cost_basis.start()
+pump_ui_queue()
 refresh_symbol_value()
 
 # =========================
@@ -962,25 +1013,36 @@ refresh_symbol_value()
 # =========================
 add_tooltip(label_usdt, "Free USDT balance on your spot account.")
 add_tooltip(label_total, "Approximate total value of your spot account in USDT.")
-add_tooltip(label_price_value, "Live price of the selected symbol in USDT (updates every second).")
+add_tooltip(label_price_value, "Live price of the selected symbol in USDT (streamed via WebSocket).")
 
 add_tooltip(label_symbol, "Trading pair, e.g. BNBUSDT (base / quote).")
 add_tooltip(combo_symbol, "Pick a USDT pair. This selection drives all actions (+, +SL, -*, SL*, !SL*).")
 
+add_tooltip(check_trail, "Trail SL : SLs placed by +SL / SL* follow the price up (cancel-replace, rate limited). -* and !SL* stop trailing.")
+add_tooltip(btn_protect_all, "SL** : Stop-loss for EVERY free balance with a USDT pair in one pass (current price as basis). Dust below min notional is skipped.")
+add_tooltip(label_pnl, "Selected coin vs its average entry price from your trade history (myTrades, fetched incrementally): unrealized PnL in quote and %, the entry price, and the PnL realized on this pair. Fees in BNB are not included.")
+add_tooltip(check_entry, "@Entry : SL* places the stop-loss the SL % below your average entry price instead of the current price (falls back to the current price if unknown or if that stop would trigger at once). With Trail SL it then follows the highest price as usual.")
+add_tooltip(label_sl_status, "Stop-loss of the selected coin from the live order events: stop price, number of SL orders, or 'triggered' when the stop was hit but the limit has not filled yet. '?' until the open orders are loaded.")
+add_tooltip(label_book, "Pre-trade estimates from the live order book: average fill and slippage vs the best price for + (the % quantity) and -* (the free balance), and the smallest SL limit % at which the current bids would absorb twice the SL quantity below the stop. ! = the book depth does not cover the quantity.")
+add_tooltip(label_trailing, "Number of positions whose stop-loss is currently trailed.")
+
 add_tooltip(label_sl, "Stop-loss percentages: Trigger becomes stopPrice, Limit becomes price (usually a bit lower).")
-add_tooltip(entry_sl_trigger, "SL trigger % below entry/current price where stopPrice should fire (e.g. 1 = -1%).")
-add_tooltip(entry_sl_limit, "SL limit % sets the limit price; typically slightly deeper than the trigger (e.g. 1.2%).")
+add_tooltip(entry_sl_trigger, "SL trigger % below entry/current price where stopPrice should fire (e.g. 1 = -1%). Prefilled per coin from `python -m autosl sweep --save` if available.")
+add_tooltip(entry_sl_limit, "SL limit % sets the limit price; typically slightly deeper than the trigger (e.g. 1.2%). Follows the trigger with the suggested gap.")
 
 add_tooltip(label_pct, "Percent of your free USDT balance you want to allocate to this symbol.")
 add_tooltip(entry_pct, "Enter % of free USDT to spend (e.g. 10 = 10% of your free USDT).")
 add_tooltip(label_pct_info, "Shows the converted USDT amount and resulting base-asset quantity.")
 
-add_tooltip(btn_buy, "+ : Market buy without SL. Recalculates qty from % and buys that amount.")
+add_tooltip(btn_buy, "+ : Market buy without SL. Buys the qty of the current % calculation (computed locally from balance, price and filters).")
 add_tooltip(btn_buy_sl, "+SL : Market buy then place SL. Uses % calc + qty + SL Trigger/Limit % in one flow.")
 add_tooltip(btn_sell_all, "-* : Market sell the entire FREE balance of this base asset. Existing SL/TP orders for this symbol are canceled first.")
 add_tooltip(btn_add_sl, "SL* : Set/refresh a stop-loss for all FREE coins of this symbol without buying. Uses current SL Trigger/Limit % fields.")
 add_tooltip(btn_clear_sl, "!SL* : Cancel all SL/TP orders for the currently selected symbol only.")
+add_tooltip(btn_stats, "Stats : Latency, errors and rate-limit usage per Binance endpoint.")
 
 # endregion
 
 root.mainloop()
+journal.close()
+log_sink.close()  # last lines, incl. shutdown errors, reach the file